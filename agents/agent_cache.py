@@ -0,0 +1,97 @@
+"""
+agent_cache.py
+Caché LRU de instancias de agentes vivas, por id.
+
+Cada entrada guarda la versión del registro con la que está al día (ver
+RegistryStore.get_versioned); si el registro cambió (p. ej. otro worker usó el
+agente) la entrada se descarta y el router vuelve a instanciar desde el registro.
+
+Límites: número de agentes (AGENT_CACHE_SIZE) y memoria aproximada
+(AGENT_CACHE_MAX_BYTES, estimada por el tamaño de la historia en el anillo).
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from services.metrics import LatencyStats
+
+# costo fijo estimado por instancia (objeto, deque, cliente de memoria)
+_BASE_BYTES = 2048
+_ENTRY_BYTES = 96
+
+
+def approx_size(agent) -> int:
+    # O(1): tamaño de la última entrada como muestra para todo el anillo
+    h = agent.history
+    if not h:
+        return _BASE_BYTES
+    return _BASE_BYTES + len(h) * (_ENTRY_BYTES + len(repr(h[-1].entry)))
+
+
+class AgentCache:
+    def __init__(self, max_entries: int = int(os.getenv("AGENT_CACHE_SIZE", 1024)),
+                 max_bytes: int = int(os.getenv("AGENT_CACHE_MAX_BYTES", 16 * 1024 * 1024))):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()  # id -> (versión, agente, bytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.invalidations = self.evictions = 0
+        self.instantiate = LatencyStats()
+
+    def get(self, agent_id: str, version: int):
+        """Instancia si está al día con 'version'; si no, None (y la descarta)."""
+        with self._lock:
+            item = self._data.get(agent_id)
+            if item is None:
+                self.misses += 1
+                return None
+            if item[0] != version:
+                self._drop(agent_id)
+                self.invalidations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(agent_id)
+            self.hits += 1
+            return item[1]
+
+    def put(self, agent_id: str, version: int, agent) -> None:
+        size = approx_size(agent)
+        with self._lock:
+            self._drop(agent_id)
+            if size > self.max_bytes:
+                return
+            self._data[agent_id] = (version, agent, size)
+            self._bytes += size
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._data)))
+                self.evictions += 1
+
+    def discard(self, agent_id: str) -> None:
+        with self._lock:
+            self._drop(agent_id)
+
+    def _drop(self, agent_id: str) -> None:
+        item = self._data.pop(agent_id, None)
+        if item is not None:
+            self._bytes -= item[2]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "approx_bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions,
+            "instantiate": self.instantiate.snapshot(),
+        }
@@ -1,20 +1,124 @@
+import json
+import time
 import uuid
-from datetime import datetime
+from collections import deque
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Iterator, List, Optional
+
+# Entradas recientes que se guardan en memoria / en el registro
+HISTORY_LIMIT = 50
+# Segmentos en disco con la historia más antigua (un .jsonl por agente)
+HISTORY_DIR = Path(__file__).parent / "history"
+
+
+class HistoryEntry:
+    """Entrada compacta de historia: epoch (float) + payload."""
+    __slots__ = ("t", "entry")
+
+    def __init__(self, t: float, entry: Any):
+        self.t = t
+        self.entry = entry
+
+    def to_raw(self) -> list:
+        return [self.t, self.entry]
+
+    @classmethod
+    def from_raw(cls, raw) -> "HistoryEntry":
+        # formato antiguo: {"t": "<iso utc>", "entry": ...}
+        if isinstance(raw, dict):
+            t = datetime.fromisoformat(raw["t"]).replace(tzinfo=timezone.utc).timestamp()
+            return cls(t, raw.get("entry"))
+        return cls(raw[0], raw[1])
+
+    def as_dict(self) -> dict:
+        return {"t": datetime.fromtimestamp(self.t, timezone.utc).isoformat(), "entry": self.entry}
+
 
 class BaseAgent:
+    history_limit = HISTORY_LIMIT
+
     def __init__(self, name, description, tools=None):
         self.id = str(uuid.uuid4())
         self.name = name
         self.description = description
         self.created_at = datetime.utcnow().isoformat()
         self.tools = tools or []
-        self.history = []
+        # anillo de entradas recientes; las que salen van al segmento en disco
+        self.history = deque(maxlen=self.history_limit)
+        self._new = 0
+        # False: lo que sale del anillo ya persistido lo manda al segmento el
+        # registro al recortar (spill_raw), con su lock; así no se duplica ni se
+        # pierde cuando varios workers usan el mismo agente
+        self.auto_spill = True
+
+    def _segment_path(self) -> Path:
+        return HISTORY_DIR / f"{self.id}.jsonl"
+
+    def _spill(self, entries) -> None:
+        self.spill_raw([e.to_raw() for e in entries])
+
+    def spill_raw(self, raw_entries: List[Any]) -> None:
+        """Añade entradas (formato guardado, también el antiguo) al segmento en disco."""
+        HISTORY_DIR.mkdir(exist_ok=True)
+        with open(self._segment_path(), "a", encoding="utf-8") as f:
+            for r in raw_entries:
+                raw = HistoryEntry.from_raw(r).to_raw()
+                f.write(json.dumps(raw, ensure_ascii=False, separators=(",", ":")) + "\n")
 
     def add_history(self, entry):
-        self.history.append({
-            "t": datetime.utcnow().isoformat(),
-            "entry": entry
-        })
+        # sin auto_spill solo se manda al segmento lo que aún no se persistió
+        if len(self.history) == self.history.maxlen and (self.auto_spill or self._new >= len(self.history)):
+            self._spill([self.history[0]])
+        self.history.append(HistoryEntry(time.time(), entry))
+        self._new += 1
+
+    def load_history(self, raw_entries: List[Any]) -> None:
+        """
+        Carga historia guardada; lo que no cabe en el anillo se manda al segmento.
+        Sin auto_spill solo se queda con la cola que cabe: lo demás sigue en el
+        registro y lo manda al segmento su recorte (on_trim), una sola vez.
+        """
+        entries = [HistoryEntry.from_raw(r) for r in raw_entries]
+        overflow = len(self.history) + len(entries) - self.history.maxlen
+        if overflow > 0 and self.auto_spill:
+            self._spill((list(self.history) + entries)[:overflow])
+        self.history.extend(entries)
+
+    def take_new_history(self) -> List[list]:
+        """Entradas añadidas desde la carga (formato compacto) para persistirlas."""
+        n = min(self._new, len(self.history))
+        self._new = 0
+        return [e.to_raw() for e in list(self.history)[len(self.history) - n:]]
+
+    def iter_history(self, since: Optional[float] = None, limit: Optional[int] = None) -> Iterator[HistoryEntry]:
+        """
+        Recorre la historia completa en orden (segmento en disco + anillo).
+        since: epoch; solo entradas posteriores. limit: máximo de entradas.
+        El segmento solo se lee si se llega a pedir.
+        """
+        if limit is not None and limit <= 0:
+            return
+        count = 0
+        ring_start = self.history[0].t if self.history else None
+        path = self._segment_path()
+        if path.exists() and (since is None or ring_start is None or since < ring_start):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    e = HistoryEntry.from_raw(json.loads(line))
+                    if since is not None and e.t <= since:
+                        continue
+                    yield e
+                    count += 1
+                    if limit is not None and count >= limit:
+                        return
+        for e in list(self.history):
+            if since is not None and e.t <= since:
+                continue
+            yield e
+            count += 1
+            if limit is not None and count >= limit:
+                return
 
     def run(self, task: str) -> str:
         raise NotImplementedError("Implementar en subclase")
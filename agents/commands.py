@@ -0,0 +1,79 @@
+"""
+commands.py
+Tabla declarativa de comandos de texto, compilada en un trie de prefijos.
+
+- register(prefix, handler, fields=None, usage=None)
+    prefix  -> 'buscar en memoria:' (sin distinguir mayúsculas)
+    fields  -> None: handler(resto) | (min, max): handler(*campos separados por '|')
+    usage   -> respuesta si faltan o sobran campos
+- dispatch(body) -> respuesta del handler, o None si no es un comando
+
+El match es por el prefijo más largo ('buscar en memoria:' gana a 'buscar:')
+y cuesta O(largo del mensaje), sin importar cuántos comandos haya: el trie se
+compila a una sola regex donde cada alternativa empieza con un carácter
+distinto, así que el motor de re nunca prueba más de una rama por posición.
+"""
+
+import re
+from typing import Callable, Dict, Optional, Pattern, Tuple
+
+_END = ""  # clave del nodo terminal en el trie
+
+
+class Command:
+    __slots__ = ("prefix", "handler", "fields", "usage")
+
+    def __init__(self, prefix: str, handler: Callable, fields: Optional[Tuple[int, int]], usage: Optional[str]):
+        self.prefix = prefix
+        self.handler = handler
+        self.fields = fields
+        self.usage = usage
+
+
+class CommandTable:
+    def __init__(self):
+        self._root: Dict[str, dict] = {}
+        self._by_prefix: Dict[str, Command] = {}
+        self._regex: Optional[Pattern] = None
+
+    def register(self, prefix: str, handler: Callable, fields: Optional[Tuple[int, int]] = None,
+                 usage: Optional[str] = None) -> None:
+        key = prefix.lower()
+        node = self._root
+        for ch in key:
+            node = node.setdefault(ch, {})
+        node[_END] = True
+        self._by_prefix[key] = Command(prefix, handler, fields, usage)
+        self._regex = None  # se recompila en el próximo match
+
+    @staticmethod
+    def _pattern(node: dict) -> str:
+        alts = [re.escape(ch) + CommandTable._pattern(child) for ch, child in node.items() if ch != _END]
+        if not alts:
+            return ""
+        body = alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+        # opcional y voraz: intenta primero el prefijo más largo
+        return f"(?:{body})?" if _END in node else body
+
+    def match(self, text: str) -> Tuple[Optional[Command], str]:
+        """(comando con el prefijo más largo, resto del texto) o (None, text)."""
+        if not self._root:
+            return None, text
+        if self._regex is None:
+            self._regex = re.compile(self._pattern(self._root), re.IGNORECASE)
+        m = self._regex.match(text)
+        if m is None:
+            return None, text
+        return self._by_prefix[m.group(0).lower()], text[m.end():]
+
+    def dispatch(self, body: str) -> Optional[str]:
+        cmd, rest = self.match(body.strip())
+        if cmd is None:
+            return None
+        if cmd.fields is None:
+            return cmd.handler(rest.strip())
+        lo, hi = cmd.fields
+        parts = [p.strip() for p in rest.split("|")]
+        if not lo <= len(parts) <= hi:
+            return cmd.usage
+        return cmd.handler(*parts)
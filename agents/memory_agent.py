@@ -1,6 +1,11 @@
+import os
+
 from .base_agent import BaseAgent
 from services.memory import MemoryClient
 
+# "index" (palabras clave), "semantic" o "hybrid" (ver services/vector_index.py)
+SEARCH_MODE = os.getenv("MEMORY_SEARCH_MODE", "index")
+
 class MemoryAgent(BaseAgent):
     def __init__(self, name="Memoria", description="Guarda y busca notas"):
         super().__init__(name, description, tools=["memory"])
@@ -18,7 +23,7 @@ class MemoryAgent(BaseAgent):
             return f"🧠 Guardado en memoria."
         if lower.startswith("buscar:"):
             q = task.split(":", 1)[1].strip()
-            results = self.mem.search(q)
+            results = self.mem.search(q, mode=SEARCH_MODE)
             self.add_history({"op":"search", "q":q})
             if not results:
                 return "Sin coincidencias en memoria."
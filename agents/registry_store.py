@@ -0,0 +1,334 @@
+"""
+registry_store.py
+Backend del registro de agentes: snapshot compactado + log append-only.
+
+- registry.json -> snapshot con el mismo formato de siempre ({id: {name, ..., history}}, más "__log__")
+- registry.log  -> una línea JSON por operación posterior al snapshot:
+      {"op": "create",  "id": ..., "agent": {...}}
+      {"op": "history", "id": ..., "entries": [...], "keep": N}
+
+Con "keep" la historia guardada se recorta a las N entradas más recientes
+(las anteriores ya las pasó el agente a su segmento en disco, ver base_agent).
+
+Generación: el snapshot guarda la suya en la clave "__log__" y el log empieza
+con {"op": "gen", "gen": N}. Un log solo se aplica sobre el snapshot de su
+misma generación; uno viejo (sin cabecera = generación 0) se ignora. Así, si
+el proceso muere entre escribir el snapshot y vaciar el log al compactar, el
+log ya volcado no se vuelve a aplicar (la historia no se duplica).
+
+Cada proceso mantiene un índice en memoria (id -> agente) y solo lee las líneas
+nuevas del log desde el último offset, así que cada llamada cuesta lo mismo
+sin importar cuántos agentes o cuánta historia haya. Las escrituras añaden una
+línea bajo lock exclusivo; cuando el log crece demasiado se compacta en el snapshot.
+El fsync del log se hace fuera del lock y compartido (GroupCommit): las
+operaciones que llegan juntas al mismo proceso pagan un solo fsync.
+
+Cada agente tiene además una versión local (cambia con cada operación que lo toca,
+de este u otro proceso) para que el router sepa si su instancia en caché sigue al día.
+Las versiones salen de un contador del proceso, no del almacén: con un registro
+por remitente (services/shards.py) un shard reabierto nunca repite una versión.
+
+Índices O(1) para no recorrer el registro: primer agente de cada tipo
+(first_of_type), agente de un tipo por dueño/remitente (find_owned) y orden
+de creación (slice(start, stop) para listar por páginas sin copiar todo).
+
+Con shards por remitente (services/shards.py) cada remitente tiene su propio
+registro; import_agents / remove_agents sirven para repartir uno existente.
+
+Migración: un registry.json antiguo ya es un snapshot válido. Para compactar a mano:
+    python -m agents.registry_store [ruta/registry.json]
+"""
+
+import itertools
+import json
+import os
+import sys
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from services.metrics import timed
+from services.storage import GroupCommit, atomic_write_text, file_lock, read_json
+
+# Compacta cuando el log supera este tamaño
+COMPACT_BYTES = 8 * 1024 * 1024
+
+# clave del snapshot con su generación (no es un agente)
+GEN_KEY = "__log__"
+
+# versiones de agente únicas en todo el proceso (compartidas entre almacenes)
+_versions_seq = itertools.count(1)
+
+
+class RegistryStore:
+    def __init__(self, snapshot: Path, compact_bytes: int = COMPACT_BYTES):
+        self.snapshot = Path(snapshot)
+        self.log = self.snapshot.with_suffix(".log")
+        self.compact_bytes = compact_bytes
+        self._agents: Dict[str, Dict[str, Any]] = {}
+        self._stamp: Optional[Tuple[int, int, int]] = None  # (ino log, ino snapshot, mtime snapshot)
+        self._offset = 0
+        # generación del snapshot; si el log es de esa generación (None: no hay log)
+        self._gen = 0
+        self._log_live: Optional[bool] = None
+        self._mu = threading.RLock()
+        # versión por agente (contador local del proceso, no se persiste)
+        self._versions: Dict[str, int] = {}
+        # índices: tipo -> primer id; (dueño, tipo) -> id
+        self._first_of_type: Dict[str, str] = {}
+        self._owned: Dict[Tuple[str, str], str] = {}
+        # ids en orden de creación (los agentes no se borran)
+        self._order: List[str] = []
+        self._commit = GroupCommit(self.log)
+
+    # ---- lectura ----
+
+    def _current_stamp(self) -> Tuple[Optional[Tuple[int, int, int]], int]:
+        try:
+            lst = os.stat(self.log)
+            log_ino, log_size = lst.st_ino, lst.st_size
+        except FileNotFoundError:
+            log_ino, log_size = 0, 0
+        try:
+            sst = os.stat(self.snapshot)
+            snap = (sst.st_ino, sst.st_mtime_ns)
+        except FileNotFoundError:
+            snap = (0, 0)
+        return (log_ino, *snap), log_size
+
+    @timed("registry.load")
+    def _refresh(self) -> None:
+        """Pone el índice al día. Llamar con el lock de archivo tomado."""
+        stamp, size = self._current_stamp()
+        if stamp != self._stamp or size < self._offset:
+            # primera carga, o alguien compactó: relee snapshot y log completo
+            self._agents = read_json(self.snapshot, {})
+            self._gen = self._agents.pop(GEN_KEY, 0)
+            self._log_live = None
+            self._offset = 0
+            self._stamp = stamp
+            self._versions = dict.fromkeys(self._agents, next(_versions_seq))
+            self._first_of_type, self._owned = {}, {}
+            self._order = list(self._agents)
+            for aid, a in self._agents.items():
+                self._index(aid, a)
+        if size == self._offset:
+            return
+        with open(self.log, "rb") as f:
+            f.seek(self._offset)
+            chunk = f.read(size - self._offset)
+        end = chunk.rfind(b"\n") + 1  # solo líneas completas
+        for line in chunk[:end].splitlines():
+            if not line.strip():
+                continue
+            rec = json.loads(line)
+            if rec.get("op") == "gen":
+                self._log_live = rec["gen"] == self._gen
+                continue
+            if self._log_live is None:
+                # log anterior a las generaciones: va con un snapshot sin generación
+                self._log_live = self._gen == 0
+            if self._log_live:
+                self._apply(rec)
+        self._offset += end
+
+    def _index(self, aid: str, agent: Dict[str, Any]) -> None:
+        a_type = agent.get("type")
+        self._first_of_type.setdefault(a_type, aid)
+        if agent.get("owner"):
+            self._owned.setdefault((agent["owner"], a_type), aid)
+
+    def _apply(self, rec: Dict[str, Any]) -> None:
+        op, aid = rec.get("op"), rec.get("id")
+        if op == "create":
+            if aid not in self._agents:
+                self._order.append(aid)
+            self._agents[aid] = rec["agent"]
+            self._index(aid, rec["agent"])
+            self._versions[aid] = next(_versions_seq)
+        elif op == "history":
+            a = self._agents.get(aid)
+            if a is not None:
+                self._versions[aid] = next(_versions_seq)
+                hist = a.setdefault("history", [])
+                hist.extend(rec["entries"])
+                keep = rec.get("keep")
+                if keep is not None and len(hist) > keep:
+                    del hist[:len(hist) - keep]
+
+    def get(self, agent_id: str) -> Optional[Dict[str, Any]]:
+        """Devuelve el registro del agente (no modificarlo; usar append_history)."""
+        with self._mu, file_lock(self.snapshot, shared=True):
+            self._refresh()
+            return self._agents.get(agent_id)
+
+    def get_versioned(self, agent_id: str) -> Tuple[Optional[Dict[str, Any]], int]:
+        """(registro, versión) del agente; la versión es 0 si no existe."""
+        with self._mu, file_lock(self.snapshot, shared=True):
+            self._refresh()
+            return self._agents.get(agent_id), self._versions.get(agent_id, 0)
+
+    def first_of_type(self, agent_type: str) -> Optional[str]:
+        """Id del primer agente creado de ese tipo (O(1))."""
+        with self._mu, file_lock(self.snapshot, shared=True):
+            self._refresh()
+            return self._first_of_type.get(agent_type)
+
+    def find_owned(self, owner: str, agent_type: str) -> Optional[str]:
+        """Id del agente de ese tipo que pertenece a 'owner' (O(1))."""
+        with self._mu, file_lock(self.snapshot, shared=True):
+            self._refresh()
+            return self._owned.get((owner, agent_type))
+
+    def items(self) -> List[Tuple[str, Dict[str, Any]]]:
+        with self._mu, file_lock(self.snapshot, shared=True):
+            self._refresh()
+            return list(self._agents.items())
+
+    def slice(self, start: int, stop: int) -> List[Tuple[str, Dict[str, Any]]]:
+        """Agentes en las posiciones [start, stop) del orden de creación (solo esos)."""
+        with self._mu, file_lock(self.snapshot, shared=True):
+            self._refresh()
+            return [(aid, self._agents[aid]) for aid in self._order[start:stop]]
+
+    def __len__(self) -> int:
+        with self._mu, file_lock(self.snapshot, shared=True):
+            self._refresh()
+            return len(self._agents)
+
+    # ---- escritura ----
+
+    def _append(self, rec: Dict[str, Any], on_trim: Optional[Callable[[List[Any]], None]] = None) -> int:
+        """
+        Escribe la operación; devuelve la versión del agente justo antes de aplicarla.
+        No espera al disco: quien llama hace self._commit.sync() sin locks tomados.
+        """
+        with self._mu, file_lock(self.snapshot):
+            self._refresh()
+            return self._append_locked(rec, on_trim)
+
+    @timed("registry.save")
+    def _append_locked(self, rec: Dict[str, Any], on_trim=None) -> int:
+        """Como _append, con el lock exclusivo ya tomado y el índice al día."""
+        line = (json.dumps(rec, ensure_ascii=False) + "\n").encode("utf-8")
+        prev = self._versions.get(rec["id"], 0)
+        if on_trim is not None and rec.get("keep") is not None:
+            # entradas que este recorte saca del registro, vistas con el lock tomado
+            hist = (self._agents.get(rec["id"]) or {}).get("history", [])
+            overflow = len(hist) + len(rec["entries"]) - rec["keep"]
+            if overflow > 0:
+                on_trim((hist + rec["entries"])[:overflow])
+        if self._log_live:
+            with open(self.log, "ab") as f:
+                f.write(line)
+            self._commit.written()
+            self._offset += len(line)
+        else:
+            # no hay log o es de otra generación (compactación interrumpida): uno nuevo
+            text = self._gen_header(self._gen) + line.decode("utf-8")
+            atomic_write_text(self.log, text)
+            self._log_live = True
+            self._offset = len(text.encode("utf-8"))
+        # el log pudo no existir hasta ahora
+        self._stamp, _ = self._current_stamp()
+        self._apply(rec)
+        if self._offset >= self.compact_bytes:
+            self._compact_locked()
+        return prev
+
+    def create(self, agent_id: str, agent: Dict[str, Any]) -> str:
+        """
+        Registra el agente y devuelve su id. Si tiene "owner" y ese dueño ya tiene
+        un agente del mismo tipo (creado por otro worker), devuelve ese sin crear otro.
+        """
+        owner = agent.get("owner")
+        if not owner:
+            self._append({"op": "create", "id": agent_id, "agent": agent})
+            self._commit.sync()
+            return agent_id
+        with self._mu, file_lock(self.snapshot):
+            self._refresh()
+            existing = self._owned.get((owner, agent.get("type")))
+            if existing:
+                return existing
+            self._append_locked({"op": "create", "id": agent_id, "agent": agent})
+        self._commit.sync()
+        return agent_id
+
+    def append_history(self, agent_id: str, entries: List[Any], keep: Optional[int] = None,
+                       base_version: Optional[int] = None,
+                       on_trim: Optional[Callable[[List[Any]], None]] = None) -> Optional[int]:
+        """
+        Añade entradas de historia. Devuelve la versión nueva del agente, o None si
+        base_version no coincidía (otro worker lo modificó desde que se leyó).
+        on_trim(entradas) recibe, bajo el lock exclusivo, lo que el recorte a 'keep'
+        saca del registro (para pasarlo al segmento en disco exactamente una vez).
+        """
+        if not entries:
+            with self._mu:
+                current = self._versions.get(agent_id, 0)
+            return current if base_version in (None, current) else None
+        with self._mu:
+            prev = self._append({"op": "history", "id": agent_id, "entries": entries, "keep": keep}, on_trim)
+            version = self._versions.get(agent_id) if base_version in (None, prev) else None
+        self._commit.sync()
+        return version
+
+    def import_agents(self, agents: List[Tuple[str, Dict[str, Any]]]) -> int:
+        """
+        Copia agentes tal cual (con su historia), en orden y sin el dedupe por
+        dueño de create(); salta los ids que ya están. Para migraciones.
+        """
+        n = 0
+        with self._mu, file_lock(self.snapshot):
+            self._refresh()
+            for aid, agent in agents:
+                if aid not in self._agents:
+                    self._append_locked({"op": "create", "id": aid, "agent": agent})
+                    n += 1
+        self._commit.sync()
+        return n
+
+    # ---- compactación / migración ----
+
+    def remove_agents(self, ids: List[str]) -> None:
+        """Saca agentes del registro (ya copiados a otro, ver services/shards.migrate)."""
+        if not ids:
+            return
+        with self._mu, file_lock(self.snapshot):
+            self._refresh()
+            for aid in ids:
+                self._agents.pop(aid, None)
+            self._compact_locked()
+            # índices y orden se rehacen desde el snapshot nuevo
+            self._stamp = None
+
+    @staticmethod
+    def _gen_header(gen: int) -> str:
+        return json.dumps({"op": "gen", "gen": gen}) + "\n"
+
+    @timed("registry.compact")
+    def _compact_locked(self) -> None:
+        self._refresh()
+        gen = self._gen + 1
+        # desde que el snapshot nuevo está en disco el log anterior ya no se aplica
+        atomic_write_text(self.snapshot, json.dumps({GEN_KEY: gen, **self._agents}, ensure_ascii=False))
+        self._gen, self._log_live = gen, False
+        # log nuevo (inode nuevo) para que los otros workers detecten la compactación
+        header = self._gen_header(gen)
+        atomic_write_text(self.log, header)
+        self._log_live = True
+        self._stamp, _ = self._current_stamp()
+        self._offset = len(header)
+
+    def compact(self) -> None:
+        """Vuelca log + snapshot a un snapshot nuevo y vacía el log."""
+        with self._mu, file_lock(self.snapshot):
+            self._compact_locked()
+
+
+if __name__ == "__main__":
+    path = Path(sys.argv[1]) if len(sys.argv) > 1 else Path(__file__).parent / "registry.json"
+    store = RegistryStore(path)
+    store.compact()
+    print(f"Registro compactado: {len(store.items())} agentes en {path}")
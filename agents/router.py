@@ -1,155 +1,268 @@
-import json
+import logging
+import threading
+import time
+import zlib
 from pathlib import Path
 from typing import Optional
+from .agent_cache import AgentCache
 from .base_agent import BaseAgent
+from .commands import CommandTable
 from .memory_agent import MemoryAgent
-from services.budget import BudgetGuard
+from .registry_store import RegistryStore
+from services.budget import LEDGER_DIR, BudgetGuard
+from services.context import current_sender
+from services.llm import LLMError, Tier, attach_budget, default_llm, tier_for
+from services import paging, shards
 from services.memory import MemoryClient
-import re
+from services.metrics import timed
+from services.sessions import default_sessions
 
 # Reusa tu buscador web existente
-import web_search_module as websearch  # debe exponer una función search(query: str) -> str
+from modules import web_search_module as websearch
+# listados de notas por páginas (registra sus pagers para «más»)
+from modules import memory_module
+
+log = logging.getLogger(__name__)
 
 REGISTRY = Path(__file__).parent / "registry.json"
-if not REGISTRY.exists():
-    REGISTRY.write_text("{}")
 
-# Presupuesto
-budget = BudgetGuard(monthly_limit=130)
+# Snapshot + log append-only: cada llamada solo lee/escribe lo nuevo
+# (los archivos se crean con el primer agente, no al importar)
+store = RegistryStore(REGISTRY)
+# con remitente, cada uno tiene su propio registro en su shard (services/shards.py)
+shards.register_store("registry", lambda path: RegistryStore(path / "registry.json"))
+
+# Presupuesto (ledger compartido entre workers, por mes)
+budget = BudgetGuard(monthly_limit=130, ledger_dir=LEDGER_DIR)
+# el LLM anota sus tokens en este mismo presupuesto (quien reemplace 'budget' vuelve a llamarlo)
+attach_budget(budget)
+
+# Instancias vivas reutilizables entre llamadas (se invalidan si el registro cambia)
+agent_cache = AgentCache()
+# una ejecución a la vez por agente dentro del proceso (locks repartidos por hash del id)
+_run_locks = [threading.Lock() for _ in range(64)]
 
-def _load():
-    return json.loads(REGISTRY.read_text())
+def registry() -> RegistryStore:
+    """Registro del remitente en curso; sin remitente (CLI) el único de siempre."""
+    return shards.resolve("registry", lambda: store)
 
-def _save(d):
-    REGISTRY.write_text(json.dumps(d, indent=2))
+def _llm_run(a: BaseAgent, llm, agent_id: str, task: str) -> str:
+    try:
+        return llm.complete(task, mode=getattr(a, "mode", None),
+                            system=f"Eres {a.name}: {a.description}", agent=agent_id, op="run_agent")
+    except LLMError:
+        # error HTTP o sin respuesta tras los reintentos: se contesta igual (eco de siempre)
+        log.warning("LLM no disponible para %s", agent_id, exc_info=True)
+        return f"{a.name} recibió la tarea: {task} (modelo no disponible ahora)"
 
-def _instantiate(agent_dict) -> BaseAgent:
+def _instantiate(agent_id: str, agent_dict) -> BaseAgent:
     # Por ahora solo MemoryAgent y BaseAgent
     if agent_dict.get("type") == "memory":
         a = MemoryAgent(agent_dict["name"], agent_dict["description"])
     else:
         a = BaseAgent(agent_dict["name"], agent_dict["description"])
-        # fallback run:
-        a.run = lambda task: f"{a.name} recibió la tarea: {task}"
-    # reconstruye historia mínima
-    for h in agent_dict.get("history", []):
-        a.history.append(h)
+        llm = default_llm()
+        if llm is not None:
+            # con LLM configurado responde el modelo del nivel del presupuesto (a.mode lo fija run_agent)
+            a.run = lambda task: _llm_run(a, llm, agent_id, task)
+        else:
+            # fallback run:
+            a.run = lambda task: f"{a.name} recibió la tarea: {task}"
+    a.id = agent_id
+    a.created_at = agent_dict.get("created_at", a.created_at)
+    # el registro pasa al segmento lo que recorta (ver append_history)
+    a.auto_spill = False
+    # reconstruye historia reciente (la antigua queda en el segmento en disco)
+    a.load_history(agent_dict.get("history", []))
     return a
 
-def create_agent(name: str, description: str, agent_type: str = "memory") -> str:
-    data = _load()
+def create_agent(name: str, description: str, agent_type: str = "memory", owner: Optional[str] = None) -> str:
+    """owner: remitente dueño del agente (uno por tipo; si ya existe devuelve ese id)."""
     if agent_type not in ("memory", "base"):
         agent_type = "base"
     if agent_type == "memory":
         agent = MemoryAgent(name, description)
     else:
         agent = BaseAgent(name, description)
-    data[agent.id] = {
+    record = {
         "name": agent.name,
         "description": agent.description,
         "type": agent_type,
         "created_at": agent.created_at,
-        "history": agent.history
+        "history": agent.take_new_history()
     }
-    _save(data)
-    return agent.id
-
-def list_agents() -> str:
-    data = _load()
-    if not data:
-        return "No hay agentes creados. Usa: 'crear agente: <nombre> | <descripcion>'"
-    lines = []
-    for i, (aid, a) in enumerate(data.items(), start=1):
-        lines.append(f"{i}. [{aid}] {a['name']} — {a['description']} (tipo: {a['type']})")
-    return "\n".join(lines)
+    if owner:
+        record["owner"] = owner
+    return registry().create(agent.id, record)
+
+def iter_agent_lines(cursor: Optional[int] = None):
+    """Agentes en orden de creación, de a tandas del registro (cursor = posición siguiente)."""
+    pos = cursor or 0
+    batch = paging.PAGE_ITEMS + 1
+    reg = registry()
+    while True:
+        chunk = reg.slice(pos, pos + batch)
+        for aid, a in chunk:
+            pos += 1
+            yield f"{pos}. [{aid}] {a['name']} — {a['description']} (tipo: {a['type']})", pos
+        if len(chunk) < batch:
+            return
+
+paging.register_pager("agentes", iter_agent_lines,
+                      "No hay agentes creados. Usa: 'crear agente: <nombre> | <descripcion>'")
+
+def list_agents(page: int = 1) -> str:
+    """Una página del listado; «más» sigue con la siguiente."""
+    return paging.show("agentes", page=page)
+
+def _run_lock(agent_id: str) -> threading.Lock:
+    return _run_locks[zlib.crc32(agent_id.encode("utf-8")) % len(_run_locks)]
 
 def run_agent(agent_id: str, task: str) -> str:
-    data = _load()
-    a = data.get(agent_id)
-    if not a:
-        return "Agente no encontrado."
-    inst = _instantiate(a)
-
-    # Política de costos: elegimos “modo” según consumo
-    mode = budget.check_mode()
-    # aquí podrías branch por modelo si integras OpenAI. De momento solo anotamos:
-    inst.add_history({"task": task, "mode": mode})
-    out = inst.run(task)
-    # persistir historia
-    a["history"] = inst.history
-    data[agent_id] = a
-    _save(data)
-    # simulamos costo bajo por operación (ajusta si integras LLM)
-    budget.add_usage(0.001)
+    with _run_lock(agent_id):
+        reg = registry()
+        a, version = reg.get_versioned(agent_id)
+        if not a:
+            return "Agente no encontrado."
+        inst = agent_cache.get(agent_id, version)
+        if inst is None:
+            start = time.perf_counter()
+            inst = _instantiate(agent_id, a)
+            agent_cache.instantiate.observe(time.perf_counter() - start)
+
+        try:
+            # Política de costos: elegimos “modo” según consumo; fija modelo, tokens y búsqueda (services/llm.py)
+            mode = budget.check_mode()
+            inst.mode = mode
+            inst.add_history({"task": task, "mode": mode})
+            out = inst.run(task)
+        except BaseException:
+            # la instancia quedó con historia sin persistir
+            agent_cache.discard(agent_id)
+            raise
+        # persistir solo las entradas nuevas de historia
+        new_version = reg.append_history(agent_id, inst.take_new_history(), keep=inst.history.maxlen,
+                                           base_version=version, on_trim=inst.spill_raw)
+        if new_version is None:
+            # otro worker escribió en medio: la próxima vez se reconstruye del registro
+            agent_cache.discard(agent_id)
+        else:
+            agent_cache.put(agent_id, new_version, inst)
+    if default_llm() is None:
+        # sin LLM simulamos costo bajo por operación (con LLM se anotan los tokens reales)
+        budget.add_usage(0.001, agent=agent_id, op="run_agent")
     return out
 
+def current_tier() -> Tier:
+    """Nivel de ejecución según el consumo del mes (modelo, tokens, profundidad de búsqueda)."""
+    return tier_for(budget.check_mode())
+
+def agent_cache_stats() -> dict:
+    return agent_cache.stats()
+
+# -------- comandos de texto --------
+
+def _cmd_crear_agente(name: str, desc: str, a_type: str = "memory") -> str:
+    aid = create_agent(name, desc, a_type)
+    return f"✅ Agente creado [{aid}]: {name} ({a_type})"
+
+def _cmd_buscar(q: str) -> str:
+    # Usa tu módulo de búsqueda web
+    try:
+        result = websearch.web_answer(q, max_results=current_tier().search_results)
+        budget.add_usage(0.002, op="web_search")
+        return f"🔎 Resultado:\n{result}"
+    except Exception as e:
+        return f"Error en búsqueda: {e}"
+
+def _cmd_resumen_diario(hora: str, tz: Optional[str] = None) -> str:
+    from modules.automation_module import programar_resumen
+    sender = current_sender.get()
+    if not sender:
+        return "El resumen diario se programa desde WhatsApp."
+    try:
+        job = programar_resumen(sender, hora, tz or None)
+    except (ValueError, KeyError):
+        return "Formato: resumen diario: HH:MM [| zona horaria, p. ej. Europe/Madrid]"
+    return f"⏰ Resumen diario a las {job.hour:02d}:{job.minute:02d} ({job.tz})"
+
+def _cmd_cancelar_resumen(rest: str) -> str:
+    from modules.automation_module import cancelar_resumen
+    sender = current_sender.get()
+    if sender and cancelar_resumen(sender):
+        return "Resumen diario cancelado."
+    return "No tenías un resumen diario programado."
+
+def _cmd_listar_notas(rest: str) -> str:
+    return memory_module.pretty_list(page=paging.parse_page(rest))
+
+def _cmd_mas(rest: str) -> Optional[str]:
+    # solo «más» a secas: «más info sobre X» sigue a la búsqueda normal
+    if rest.strip(" .!?¡¿"):
+        return None
+    return paging.more()
+
+commands = CommandTable()
+commands.register("crear agente:", _cmd_crear_agente, fields=(2, 3),
+                  usage="Formato: crear agente: <nombre> | <descripcion> [| tipo]")
+commands.register("listar agentes", lambda rest: list_agents(paging.parse_page(rest)))
+commands.register("listar notas", _cmd_listar_notas)
+commands.register("usar agente:", run_agent, fields=(2, 2),
+                  usage="Formato: usar agente: <id> | <tarea>")
+commands.register("buscar:", _cmd_buscar)
+# memoria directa: si no hay agente, se crea uno por defecto
+commands.register("recordar:", lambda text: ensure_default_memory_agent_and_run(f"recordar: {text}"))
+commands.register("buscar en memoria:", lambda q: ensure_default_memory_agent_and_run(f"buscar: {q}"))
+# resumen diario de notas nuevas (lo envía el worker líder de la web, ver modules/automation_module.py)
+commands.register("resumen diario:", _cmd_resumen_diario, fields=(1, 2),
+                  usage="Formato: resumen diario: HH:MM [| zona horaria]")
+commands.register("cancelar resumen", _cmd_cancelar_resumen)
+# página siguiente del último listado
+commands.register(paging.MORE, _cmd_mas)
+commands.register("mas", _cmd_mas)
+
+def register_command(prefix: str, handler, fields=None, usage=None) -> None:
+    """Para plugins: agrega un comando a la tabla (ver agents/commands.py)."""
+    commands.register(prefix, handler, fields, usage)
+
+@timed("router.dispatch")
 def handle_text_command(body: str) -> Optional[str]:
     """
     Detecta comandos desde WhatsApp de forma simple:
     - 'crear agente: <nombre> | <descripcion> [| tipo]'  (tipo opcional: memory | base)
-    - 'listar agentes'
+    - 'listar agentes [página]' / 'listar notas [página]'  (de a una página)
+    - 'más'                    -> página siguiente del último listado
     - 'usar agente: <id> | <tarea>'
     - 'buscar: <query>'        -> usa buscador web
     - 'recordar: <texto>'      -> manda al agent por defecto (memoria)
     - 'buscar en memoria: <q>'
+    - 'resumen diario: HH:MM [| zona]' / 'cancelar resumen'
+    Devuelve None si no es un comando conocido.
     """
-    b = body.strip()
-
-    # crear agente
-    if b.lower().startswith("crear agente:"):
-        rest = b.split(":", 1)[1].strip()
-        parts = [p.strip() for p in rest.split("|")]
-        if len(parts) >= 2:
-            name, desc = parts[0], parts[1]
-            a_type = parts[2] if len(parts) >= 3 else "memory"
-            aid = create_agent(name, desc, a_type)
-            return f"✅ Agente creado [{aid}]: {name} ({a_type})"
-        return "Formato: crear agente: <nombre> | <descripcion> [| tipo]"
-
-    if b.lower().startswith("listar agentes"):
-        return list_agents()
-
-    if b.lower().startswith("usar agente:"):
-        rest = b.split(":", 1)[1].strip()
-        parts = [p.strip() for p in rest.split("|")]
-        if len(parts) >= 2:
-            aid, task = parts[0], parts[1]
-            return run_agent(aid, task)
-        return "Formato: usar agente: <id> | <tarea>"
-
-    if b.lower().startswith("buscar:"):
-        q = b.split(":", 1)[1].strip()
-        # Usa tu módulo de búsqueda web
-        try:
-            result = websearch.search(q)
-            budget.add_usage(0.002)
-            return f"🔎 Resultado:\n{result}"
-        except Exception as e:
-            return f"Error en búsqueda: {e}"
-
-    # memoria directa
-    if b.lower().startswith("recordar:"):
-        # por conveniencia, si no hay agente, creamos uno por defecto y lo usamos
-        reply = ensure_default_memory_agent_and_run(f"recordar: {b.split(':',1)[1].strip()}")
-        return reply
-
-    if b.lower().startswith("buscar en memoria:"):
-        q = b.split(":", 1)[1].strip()
-        reply = ensure_default_memory_agent_and_run(f"buscar: {q}")
-        return reply
-
-    # No es comando conocido
-    return None
+    return commands.dispatch(body)
+
+def _default_memory_agent() -> str:
+    """
+    Agente de memoria por defecto: uno por remitente (WhatsApp), recordado en su
+    sesión; sin remitente (CLI) el primero de tipo memoria. Se crea si no existe.
+    """
+    sender = current_sender.get()
+    if not sender:
+        return registry().first_of_type("memory") or create_agent("Memoria", "Notas y búsqueda interna", "memory")
+    session = default_sessions().get_or_create(sender)
+    reg = registry()
+    if session.agent_id is not None:
+        # la sesión puede venir de un snapshot viejo (registro borrado o migrado)
+        a, _ = reg.get_versioned(session.agent_id)
+        if not a or a.get("owner") != sender or a.get("type") != "memory":
+            session.agent_id = None
+    if session.agent_id is None:
+        session.agent_id = reg.find_owned(sender, "memory") or create_agent(
+            "Memoria", "Notas y búsqueda interna", "memory", owner=sender)
+    return session.agent_id
 
 def ensure_default_memory_agent_and_run(task: str) -> str:
-    data = _load()
-    # busca uno de tipo memoria
-    for aid, a in data.items():
-        if a.get("type") == "memory":
-            return run_agent(aid, task)
-    # si no existe, crea uno
-    new_id = create_agent("Memoria", "Notas y búsqueda interna", "memory")
-    return run_agent(new_id, task)
+    return run_agent(_default_memory_agent(), task)
 
 def handle_agent_task(task: str) -> str:
     """
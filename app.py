@@ -1,20 +1,135 @@
 import os
-from flask import Flask, jsonify, request
+from flask import Flask, Response, abort, jsonify, request
+from services.ingest import default_log
+from services.metrics import REGISTRY
+from services.shards import default_shards
+from services.pipeline import WhatsAppPipeline, parse_twilio_form
 
 app = Flask(__name__)
 
+# Los mensajes se procesan en segundo plano; el webhook responde al instante
+pipeline = WhatsAppPipeline(
+    workers=int(os.getenv("PIPELINE_WORKERS", 4)),
+    queue_size=int(os.getenv("PIPELINE_QUEUE_SIZE", 100)),
+)
+
+def _agent_cache_entries():
+    from agents.router import agent_cache
+    return agent_cache.stats()["entries"]
+
+def _sessions():
+    from services.sessions import default_sessions
+    return len(default_sessions())
+
+# valores que se leen al exportar /metrics
+REGISTRY.gauge("jarvis_pipeline_queued", lambda: pipeline.stats()["queued"], "Mensajes en cola")
+REGISTRY.gauge("jarvis_pipeline_rejected", lambda: pipeline.pool.rejected, "Mensajes rechazados (503)")
+REGISTRY.gauge("jarvis_pipeline_errors", lambda: pipeline.pool.errors, "Mensajes que fallaron")
+REGISTRY.gauge("jarvis_agent_cache_entries", _agent_cache_entries, "Agentes vivos en caché")
+REGISTRY.gauge("jarvis_sessions", _sessions, "Sesiones activas")
+REGISTRY.gauge("jarvis_ingest_duplicates", lambda: default_log().duplicates, "Reintentos de webhook descartados")
+REGISTRY.gauge("jarvis_shards_open", lambda: default_shards().stats()["open"], "Shards de remitentes abiertos")
+
+# stats() de búsqueda, caché, agentes y voz (los módulos se importan al exportar)
+def _search_stats():
+    from modules.web_search_module import search_stats
+    return search_stats()
+
+def _search_cache_stats():
+    from modules.web_search_module import cache_stats
+    return cache_stats()
+
+def _agent_cache_stats():
+    from agents.router import agent_cache_stats
+    return agent_cache_stats()
+
+def _recognizer_stats():
+    from services.audio import recognizer_stats
+    return recognizer_stats()
+
+def _by_backend(stats, key):
+    return lambda: {name: st[key] for name, st in stats().items()}
+
+for _key, _help in (("calls", "Búsquedas por backend"), ("errors", "Búsquedas que fallaron"),
+                    ("timeouts", "Búsquedas que no llegaron al deadline")):
+    REGISTRY.gauge(f"jarvis_search_{_key}", _by_backend(_search_stats, _key), _help, labels=("backend",))
+REGISTRY.gauge("jarvis_search_p99_ms", lambda: {n: st["latency"]["p99_ms"] for n, st in _search_stats().items()},
+               "Latencia p99 por backend (ms)", labels=("backend",))
+for _key in ("size", "hits", "misses", "coalesced", "evictions"):
+    REGISTRY.gauge(f"jarvis_search_cache_{_key}", lambda k=_key: _search_cache_stats()[k],
+                   f"Caché de respuestas web: {_key}")
+for _key in ("approx_bytes", "hits", "misses", "invalidations", "evictions"):
+    REGISTRY.gauge(f"jarvis_agent_cache_{_key}", lambda k=_key: _agent_cache_stats()[k],
+                   f"Caché de agentes: {_key}")
+REGISTRY.gauge("jarvis_stt_calls", _by_backend(_recognizer_stats, "calls"), "Audios transcritos por backend",
+               labels=("backend",))
+REGISTRY.gauge("jarvis_stt_audio_seconds", _by_backend(_recognizer_stats, "audio_s"),
+               "Segundos de audio transcritos", labels=("backend",))
+REGISTRY.gauge("jarvis_stt_rtf", _by_backend(_recognizer_stats, "rtf"),
+               "Factor de tiempo real (proceso / audio)", labels=("backend",))
+
+def warm_up():
+    """
+    Importa de una vez los subsistemas pesados (router, búsqueda, audio, envío).
+    Sin esto se cargan con el primer mensaje que los usa. Con gunicorn --preload
+    (GUNICORN_PRELOAD=1) se llama en el master y los workers lo comparten por
+    copy-on-write. Solo importa: no abre conexiones, archivos ni threads.
+    """
+    import agents.router
+    import modules.web_search_module
+    import services.audio
+    import services.outbound
+    import services.summarizer
+    import duckduckgo_search
+    import pydub
+    import speech_recognition
+
 @app.get("/")
 def health():
-    return jsonify({"status": "ok", "app": "Jarvis-BOT"})
+    from agents.router import agent_cache_stats, current_tier
+    from services.llm import default_llm
+    from services.outbound import default_sender
+    from services.sessions import default_sessions
+    llm = default_llm()
+    return jsonify({"status": "ok", "app": "Jarvis-BOT", "pipeline": pipeline.stats(),
+                    "outbound": default_sender().stats(), "agents": agent_cache_stats(),
+                    "sessions": default_sessions().stats(), "ingest": default_log().stats(),
+                    "shards": default_shards().stats(), "tier": current_tier().as_dict(),
+                    "llm": llm.stats() if llm is not None else None})
+
+@app.get("/metrics")
+def metrics():
+    # formato de texto de Prometheus (un worker por scrape)
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+@app.get("/debug/slow")
+def slow_requests():
+    # solo con PROFILE_SLOW=1 (ver services/profiler.py)
+    from services.profiler import default_profiler
+    profiler = default_profiler()
+    if profiler is None:
+        abort(404)
+    return jsonify(profiler.report())
 
 @app.post("/whatsapp")
 def whatsapp_webhook():
+    msg = parse_twilio_form(request.form)
+    ingest = default_log()
+    if not ingest.append(msg):
+        # reintento de Twilio de un mensaje que ya entró: se confirma sin procesarlo otra vez
+        return "ok", 200
+    if not pipeline.submit(msg):
+        # cola llena: Twilio reintenta más tarde (y ese reintento tiene que entrar)
+        ingest.release(msg["sid"])
+        return "busy", 503, {"Retry-After": "5"}
     # respuesta mínima para que Twilio reciba algo válido
     return "ok", 200
 
 if __name__ == "__main__":
+    # sin gunicorn: el planificador corre en este proceso (ver gunicorn.conf.py)
+    from modules.automation_module import iniciar_en_web
+    iniciar_en_web()
     port = int(os.environ.get("PORT", 5000))
     app.run(host="0.0.0.0", port=port)
 
     app.run(host="0.0.0.0", port=int(os.getenv("PORT", 5000)))
-
@@ -0,0 +1,121 @@
+"""
+Benchmark del camino de audio: descarga (servidor HTTP local) + transcodificación
+a PCM 16 kHz mono, en memoria frente al camino anterior con temporales en disco.
+No llama al reconocedor (requiere red). El camino nuevo incluye además el
+remuestreo a 16 kHz mono que el anterior no hacía.
+
+Fixtures: un tono WAV generado; si hay ffmpeg también OGG/Opus (como WhatsApp).
+
+Con --backend también transcribe (fragmentado en paralelo) y reporta el
+factor de tiempo real del backend; 'stub' no necesita red ni modelo.
+
+    python -m benchmarks.bench_audio [--seconds 20] [--reps 10] [--backend stub]
+"""
+
+import argparse
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import speech_recognition as sr
+from pydub.generators import Sine
+
+from services import audio
+
+
+def make_fixtures(seconds: float):
+    tone = Sine(440).to_audio_segment(duration=seconds * 1000).set_frame_rate(44100).set_channels(2)
+    fixtures = {}
+    buf = io.BytesIO()
+    tone.export(buf, format="wav")
+    fixtures["wav"] = ("audio/wav", buf.getvalue())
+    if shutil.which("ffmpeg"):
+        buf = io.BytesIO()
+        tone.export(buf, format="ogg", codec="libopus")
+        fixtures["ogg"] = ("audio/ogg", buf.getvalue())
+    return fixtures
+
+
+def serve(fixtures):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            ctype, body = fixtures[self.path.strip("/")]
+            self.send_response(200)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd, f"http://127.0.0.1:{httpd.server_port}"
+
+
+def legacy_path(url: str, fmt: str):
+    """Camino anterior: .bin temporal -> pydub -> .wav temporal -> sr.AudioFile."""
+    import requests
+    from pydub import AudioSegment
+    with requests.get(url, stream=True) as r:
+        with tempfile.NamedTemporaryFile(suffix=".bin", delete=False) as tmp_in:
+            for chunk in r.iter_content(chunk_size=8192):
+                tmp_in.write(chunk)
+            in_path = tmp_in.name
+    seg = AudioSegment.from_file(in_path, format=fmt)
+    out = tempfile.NamedTemporaryFile(suffix=".wav", delete=False)
+    out.close()
+    seg.export(out.name, format="wav")
+    with sr.AudioFile(out.name) as source:
+        data = sr.Recognizer().record(source)
+    # el código original nunca los borraba; aquí sí para no llenar /tmp
+    os.unlink(in_path)
+    os.unlink(out.name)
+    return data
+
+
+def streaming_path(url: str, fmt: str):
+    buf, fmt = audio._download_media(url)
+    with buf:
+        seg = audio._to_pcm16k(buf, fmt)
+    return sr.AudioData(seg.raw_data, seg.frame_rate, seg.sample_width)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--seconds", type=float, default=20)
+    ap.add_argument("--reps", type=int, default=10)
+    ap.add_argument("--backend", default=None)
+    args = ap.parse_args()
+
+    fixtures = make_fixtures(args.seconds)
+    httpd, base = serve(fixtures)
+    try:
+        for name in fixtures:
+            url = f"{base}/{name}"
+            for label, fn in (("en memoria", streaming_path), ("anterior", legacy_path)):
+                fn(url, name)  # calentamiento
+                t0 = time.perf_counter()
+                for _ in range(args.reps):
+                    fn(url, name)
+                ms = (time.perf_counter() - t0) * 1000 / args.reps
+                print(f"{name:>4} {len(fixtures[name][1]) // 1024:>6} KiB  {label:>10}: {ms:.1f} ms")
+        if args.backend:
+            clip = audio._to_pcm16k(io.BytesIO(fixtures["wav"][1]), "wav")
+            for _ in range(args.reps):
+                audio.transcribe_audio(clip, args.backend)
+            st = audio.recognizer_stats()[args.backend]
+            print(f"{args.backend}: RTF {st['rtf']} ({st['audio_s']:.0f} s de audio)")
+    finally:
+        httpd.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Microbenchmark del despacho de comandos: trie compilado a regex (agents.commands)
+frente a la cadena anterior de 'b.lower().startswith(...)'. Solo mide el match,
+con handlers vacíos.
+
+    python -m benchmarks.bench_dispatch [--n 200000]
+"""
+
+import argparse
+import time
+
+from agents.commands import CommandTable
+
+PREFIXES = ["crear agente:", "listar agentes", "usar agente:", "buscar:", "recordar:", "buscar en memoria:"]
+MESSAGES = [
+    "crear agente: Notas | guarda cosas | memory",
+    "Listar agentes",
+    "usar agente: 1234 | recordar: comprar pan",
+    "buscar: clima en Madrid",
+    "recordar: llamar a mamá el domingo",
+    "buscar en memoria: mamá",
+    "¿qué hora es en Tokio?",
+]
+
+
+def legacy_match(body: str):
+    b = body.strip()
+    for p in PREFIXES:  # mismo orden que la cadena de ifs original
+        if b.lower().startswith(p):
+            return p
+    return None
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=200_000)
+    args = ap.parse_args()
+
+    table = CommandTable()
+    for p in PREFIXES:
+        table.register(p, lambda *a: None)
+
+    msgs = (MESSAGES * (args.n // len(MESSAGES) + 1))[:args.n]
+    for label, fn in (("tabla", lambda m: table.match(m.strip())), ("anterior", legacy_match)):
+        t0 = time.perf_counter()
+        for m in msgs:
+            fn(m)
+        print(f"{label:>9}: {(time.perf_counter() - t0) * 1e9 / args.n:.0f} ns/mensaje")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Benchmark de historia de agentes: latencia y memoria de run_agent según el
+largo de la historia guardada (la primera llamada migra el exceso al segmento).
+
+    python -m benchmarks.bench_history [--calls 200]
+"""
+
+import argparse
+import json
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from agents import router
+from agents.registry_store import RegistryStore
+from benchmarks import fixtures
+
+
+def run_case(tmp: Path, length: int, calls: int):
+    snap = tmp / f"registry-{length}.json"
+    entry = [1700000000.0, {"task": "x" * 20, "mode": "high"}]
+    snap.write_text(json.dumps({"a": {
+        "name": "Agente", "description": "sintético", "type": "base",
+        "created_at": "2024-01-01T00:00:00", "history": [entry] * length,
+    }}))
+    router.store = RegistryStore(snap)
+    router.run_agent("a", "migración")  # primera llamada: recorta al anillo
+
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    for _ in range(calls):
+        router.run_agent("a", "tarea de prueba")
+    ms = (time.perf_counter() - t0) * 1000 / calls
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return ms, peak / 1024
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--calls", type=int, default=200)
+    args = ap.parse_args()
+    with tempfile.TemporaryDirectory() as d:
+        tmp = Path(d)
+        fixtures.isolate(tmp)
+        for length in (10, 1_000, 10_000, 100_000):
+            ms, kib = run_case(tmp, length, args.calls)
+            print(f"historia={length:>7}: {ms:.3f} ms/llamada, pico {kib:.0f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark de la deduplicación por MessageSid (services/ingest.py).
+
+- SidIndex: costo de seen()+add() con el índice lleno, memoria, y tasa real de
+  falsos positivos sobre SIDs nunca vistos.
+- IngestLog con tormenta de reintentos: N procesos (workers de gunicorn)
+  reciben el mismo conjunto de SIDs en distinto orden, como cuando Twilio
+  reintenta y el reintento cae en otro worker. Cada SID debe aceptarse una
+  sola vez en total y quedar una sola vez en el log.
+
+    python -m benchmarks.bench_ingest [--sids 200000] [--procs 4] [--messages 2000]
+"""
+
+import argparse
+import multiprocessing
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from services.ingest import IngestLog, SidIndex
+
+
+def bench_index(n: int) -> None:
+    idx = SidIndex(capacity=n, window=86400, exact_window=600)
+    sids = [f"SM{i:032x}" for i in range(n)]
+    t = time.perf_counter()
+    for sid in sids:
+        if not idx.seen(sid):
+            idx.add(sid)
+    per_add = (time.perf_counter() - t) / n
+    t = time.perf_counter()
+    dup = sum(1 for sid in sids[-10000:] if idx.seen(sid))
+    per_dup = (time.perf_counter() - t) / 10000
+    # SIDs nuevos que caen fuera del conjunto exacto: solo decide el Bloom
+    idx._exact.clear()
+    fresh = [f"SN{i:032x}" for i in range(n)]
+    t = time.perf_counter()
+    fp = sum(1 for sid in fresh if idx.seen(sid))
+    per_fresh = (time.perf_counter() - t) / n
+    st = idx.stats()
+    print(f"SidIndex con {n:,} SIDs: alta {per_add * 1e6:.1f} us, repetido {per_dup * 1e6:.1f} us, "
+          f"nuevo (solo Bloom) {per_fresh * 1e6:.1f} us")
+    print(f"  repetidos detectados {dup}/10000, falsos positivos {fp}/{n:,} ({fp / n:.2e}), "
+          f"Bloom {st['bloom_bytes'] / 1e6:.1f} MB, k={idx._blooms[0].k}")
+
+
+def storm_worker(d: str, proc: int, sids, out) -> None:
+    log = IngestLog(Path(d))
+    accepted = 0
+    for sid in sids:
+        if log.append({"sid": sid, "from": f"whatsapp:+{proc}", "body": "hola"}):
+            accepted += 1
+    out.put(accepted)
+
+
+def bench_storm(procs: int, messages: int) -> bool:
+    ctx = multiprocessing.get_context("fork")
+    base = [f"SM{i:032x}" for i in range(messages)]
+    with tempfile.TemporaryDirectory() as d:
+        out = ctx.Queue()
+        workers = []
+        for p in range(procs):
+            sids = base[:]
+            random.Random(p).shuffle(sids)
+            workers.append(ctx.Process(target=storm_worker, args=(d, p, sids, out)))
+        t = time.perf_counter()
+        for w in workers:
+            w.start()
+        accepted = sum(out.get() for _ in workers)
+        for w in workers:
+            w.join()
+        elapsed = time.perf_counter() - t
+        logged = [r["sid"] for r in IngestLog(Path(d)).records()]
+    ok = accepted == messages and len(logged) == messages and len(set(logged)) == messages
+    print(f"tormenta: {procs} procesos x {messages} webhooks (cada SID llega {procs} veces) en {elapsed:.2f}s "
+          f"({procs * messages / elapsed:,.0f} webhooks/s)")
+    print(f"  aceptados {accepted}/{messages}, en el log {len(logged)} ({len(set(logged))} distintos): "
+          f"{'ok' if ok else 'FALLA'}")
+    return ok
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sids", type=int, default=200_000)
+    ap.add_argument("--procs", type=int, default=4)
+    ap.add_argument("--messages", type=int, default=2000)
+    args = ap.parse_args()
+    bench_index(args.sids)
+    raise SystemExit(0 if bench_storm(args.procs, args.messages) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Benchmark de la capa de LLM (services/llm.py) contra un servidor falso local
+compatible con OpenAI (/v1/chat/completions y /v1/completions con lista de
+prompts), con latencia simulada y 'usage' en tokens.
+
+Tráfico creciente (usuarios concurrentes) con preguntas repetidas al estilo
+Zipf y variantes de escritura (mayúsculas, tildes, signos). Compara:
+- chat sin caché:        un POST por pedido (solo se coalescen los idénticos en vuelo)
+- chat + caché:          caché exacta + normalizada
+- completions + lotes:   caché + micro-batching de prompts distintos
+
+Por nivel reporta p50/p99, POSTs y costo cada 1k pedidos, y aciertos de caché.
+Al final recorre el presupuesto hasta el modo "low" y muestra cómo cambian
+modelo, tokens y profundidad de búsqueda.
+
+    python -m benchmarks.bench_llm [--requests 400] [--levels 1,8,32,128] [--latency-ms 80]
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import unicodedata
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from services.budget import BudgetGuard
+from services.llm import LLMClient, cost_of
+from services.metrics import LatencyStats
+
+TOPICS = ("python", "la fotosíntesis", "el clima en madrid", "una receta de paella", "el teorema de pitágoras",
+          "cómo ahorrar", "la revolución francesa", "el sistema solar", "una rutina de gimnasio", "bitcoin")
+FORMS = ("¿Qué es {}?", "explícame {}", "resumen sobre {}", "dame 3 datos de {}", "¿por qué importa {}?")
+
+
+def _tokens(text: str) -> int:
+    return max(1, len(text.split()) * 4 // 3)
+
+
+def start_fake_openai(latency: float, per_prompt: float):
+    seen = {"posts": 0, "prompts": 0, "models": Counter()}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            if self.path.endswith("/chat/completions"):
+                prompts = [" ".join(m["content"] for m in body["messages"])]
+            else:
+                prompts = body["prompt"] if isinstance(body["prompt"], list) else [body["prompt"]]
+            # un lote cuesta casi lo mismo que un pedido: la GPU procesa los prompts juntos
+            time.sleep(latency + per_prompt * len(prompts))
+            with lock:
+                seen["posts"] += 1
+                seen["prompts"] += len(prompts)
+                seen["models"][body["model"]] += len(prompts)
+            # respuestas de un cuarto del máximo: el nivel se nota en los tokens de salida
+            words = body.get("max_tokens", 100) // 4
+            texts = [f"Respuesta ({body['model']}) sobre: {p[-60:]} " + "bla " * words for p in prompts]
+            usage = {"prompt_tokens": sum(_tokens(p) for p in prompts),
+                     "completion_tokens": sum(_tokens(t) for t in texts)}
+            if self.path.endswith("/chat/completions"):
+                choices = [{"index": 0, "message": {"role": "assistant", "content": texts[0]}}]
+            else:
+                choices = [{"index": i, "text": t} for i, t in enumerate(texts)]
+            payload = json.dumps({"choices": choices, "usage": usage}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    class Server(ThreadingHTTPServer):
+        request_queue_size = 256
+
+    httpd = Server(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd, f"http://127.0.0.1:{httpd.server_port}/v1", seen, lock
+
+
+def _variant(rnd: random.Random, text: str) -> str:
+    r = rnd.random()
+    if r < 0.25:
+        return text.upper()
+    if r < 0.5:
+        return "".join(ch for ch in unicodedata.normalize("NFKD", text) if not unicodedata.combining(ch))
+    if r < 0.7:
+        return text.rstrip("?") + "  "
+    return text
+
+
+def workload(n: int, seed: int = 3):
+    """n prompts: preguntas frecuentes (Zipf) con variantes de escritura y un 15% únicas."""
+    rnd = random.Random(seed)
+    pool = [f.format(t) for t in TOPICS for f in FORMS]
+    weights = [1 / (i + 1) for i in range(len(pool))]
+    out = []
+    for i in range(n):
+        if rnd.random() < 0.15:
+            out.append(f"pregunta única #{seed}-{i} sobre {rnd.choice(TOPICS)}")
+        else:
+            out.append(_variant(rnd, rnd.choices(pool, weights)[0]))
+    return out
+
+
+def run_level(config: str, users: int, prompts, base_url: str, seen, lock) -> dict:
+    kwargs = {"chat sin caché": dict(api="chat", cache_size=0),
+              "chat + caché": dict(api="chat"),
+              "completions + lotes": dict(api="completions", batch_window=0.01)}[config]
+    budget = BudgetGuard(monthly_limit=1e9)
+    client = LLMClient(base_url=base_url, budget=budget, concurrency=64, **kwargs)
+    with lock:
+        before = (seen["posts"], seen["prompts"])
+    lat = LatencyStats(window=len(prompts))
+
+    def one(p):
+        t = time.perf_counter()
+        client.complete(p, mode="medium")
+        lat.observe(time.perf_counter() - t)
+
+    t = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users) as ex:
+        list(ex.map(one, prompts))
+    elapsed = time.perf_counter() - t
+    with lock:
+        posts, sent = seen["posts"] - before[0], seen["prompts"] - before[1]
+    n = len(prompts)
+    hits = client.exact_hits + client.normalized_hits + client.cache.coalesced
+    return {"p50": lat.percentile(50) * 1000, "p99": lat.percentile(99) * 1000, "rps": n / elapsed,
+            "posts_1k": posts * 1000 / n, "prompts_1k": sent * 1000 / n, "cost_1k": budget.current_usage * 1000 / n,
+            "hits": hits / n, "stats": client.stats()}
+
+
+def tiers_demo(base_url: str, seen, lock) -> None:
+    """El gasto real empuja el modo de high a low; el nivel cambia de modelo y recorta tokens."""
+    # límite chico para que unas decenas de respuestas de gpt-4o lo crucen
+    budget = BudgetGuard(monthly_limit=0.05)
+    client = LLMClient(base_url=base_url, budget=budget, cache_size=0)
+    by_mode = Counter()
+    spent = Counter()
+    for i in range(2000):
+        mode = budget.check_mode()
+        before = budget.current_usage
+        client.complete(f"pregunta {i} sobre {TOPICS[i % len(TOPICS)]}")
+        by_mode[mode] += 1
+        spent[mode] += budget.current_usage - before
+        if mode == "low" and by_mode["low"] >= 50:
+            break
+    print("\nniveles según el presupuesto (límite 0.05 USD):")
+    for mode in ("high", "medium", "low"):
+        t = client.tiers[mode]
+        n = by_mode[mode]
+        avg = spent[mode] / n if n else 0.0
+        print(f"  {mode:<6} {t.model:<12} max_tokens {t.max_tokens:>4}  búsqueda {t.search_results:>2} resultados  "
+              f"{n:>4} pedidos  {avg * 1000:.4f} USD / 1k pedidos")
+    check = cost_of(client.tiers["high"].model, client.prompt_tokens, client.completion_tokens)
+    print(f"  gasto anotado {budget.current_usage:.4f} USD ({client.prompt_tokens} + {client.completion_tokens} tokens); "
+          f"ledger == medido: {abs(budget.current_usage - client.cost) < 1e-9}  (todo a precio de high sería {check:.4f})")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=400)
+    ap.add_argument("--levels", default="1,8,32,128")
+    ap.add_argument("--latency-ms", type=float, default=80.0)
+    ap.add_argument("--per-prompt-ms", type=float, default=2.0)
+    args = ap.parse_args()
+    httpd, base_url, seen, lock = start_fake_openai(args.latency_ms / 1000, args.per_prompt_ms / 1000)
+    levels = [int(x) for x in args.levels.split(",")]
+    print(f"{args.requests} pedidos por nivel, servidor falso con {args.latency_ms:.0f} ms + "
+          f"{args.per_prompt_ms:.0f} ms/prompt")
+    print(f"{'config':<22}{'usuarios':>9}{'p50 ms':>9}{'p99 ms':>9}{'pedidos/s':>11}{'POSTs/1k':>10}"
+          f"{'prompts/1k':>11}{'USD/1k':>9}{'caché':>7}")
+    for config in ("chat sin caché", "chat + caché", "completions + lotes"):
+        for users in levels:
+            # cada nivel con preguntas propias: la caché arranca fría
+            r = run_level(config, users, workload(args.requests, seed=users), base_url, seen, lock)
+            print(f"{config:<22}{users:>9}{r['p50']:>9.1f}{r['p99']:>9.1f}{r['rps']:>11.1f}{r['posts_1k']:>10.0f}"
+                  f"{r['prompts_1k']:>11.0f}{r['cost_1k']:>9.4f}{r['hits']:>7.0%}")
+    tiers_demo(base_url, seen, lock)
+    httpd.shutdown()
+
+
+if __name__ == "__main__":
+    main()
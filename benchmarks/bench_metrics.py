@@ -0,0 +1,54 @@
+"""
+Costo de la instrumentación (services/metrics.py): una función vacía sin
+medir, con @timed activo, con @timed desactivado (METRICS=0) y dentro de un
+request_trace (que además junta los spans), más lo que tarda render().
+
+    python -m benchmarks.bench_metrics [--calls 200000]
+"""
+
+import argparse
+import time
+
+from services import metrics
+
+
+def noop():
+    return None
+
+
+def per_call(fn, calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--calls", type=int, default=200000)
+    args = ap.parse_args()
+
+    wrapped = metrics.timed("bench.noop")(noop)
+    base = per_call(noop, args.calls)
+    on = per_call(wrapped, args.calls)
+    metrics.ENABLED = False
+    off = per_call(wrapped, args.calls)
+    metrics.ENABLED = True
+    with metrics.request_trace("bench"):
+        traced = per_call(wrapped, min(args.calls, 20000))  # cada llamada agrega un span
+
+    print(f"{args.calls} llamadas")
+    print(f"  sin medir:            {base * 1e9:8.0f} ns/llamada")
+    print(f"  @timed activo:        {on * 1e9:8.0f} ns/llamada (+{(on - base) * 1e9:.0f})")
+    print(f"  @timed desactivado:   {off * 1e9:8.0f} ns/llamada (+{(off - base) * 1e9:.0f})")
+    print(f"  dentro de un trace:   {traced * 1e9:8.0f} ns/llamada")
+
+    for i in range(50):
+        metrics.timed(f"bench.stage{i}")(noop)()
+    start = time.perf_counter()
+    text = metrics.REGISTRY.render()
+    print(f"  render(): {(time.perf_counter() - start) * 1000:.2f} ms, {len(text.splitlines())} líneas")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark del almacén de notas: guardados/s y búsquedas/s del almacén único
+(services.note_store, SQLite WAL + FTS5) frente al código anterior basado en
+un JSON que se reescribe entero (copiado abajo), con N notas precargadas.
+
+    python -m benchmarks.bench_notes [--notes 10000] [--ops 200]
+"""
+
+import argparse
+import json
+import random
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from services.note_store import NoteStore
+
+WORDS = ("comprar leche pan llamar mamá cumpleaños reunión proyecto idea viaje "
+         "médico gimnasio libro película receta pagar factura correo banco").split()
+
+
+class LegacyJsonNotes:
+    """memory_module anterior: carga y reescribe todo el JSON en cada operación."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        path.write_text(json.dumps({"created_at": datetime.utcnow().isoformat(), "notes": []}))
+
+    def save_note(self, text, tags):
+        data = json.loads(self.path.read_text())
+        data["notes"].append({"timestamp": datetime.utcnow().isoformat(), "text": text, "tags": tags})
+        self.path.write_text(json.dumps(data, indent=2, ensure_ascii=False))
+
+    def search_notes(self, keyword):
+        k = keyword.lower()
+        data = json.loads(self.path.read_text())
+        return [n for n in data["notes"] if k in n["text"].lower() or any(k in t for t in n["tags"])]
+
+    def bulk(self, notes):
+        data = json.loads(self.path.read_text())
+        data["notes"] += [{"timestamp": datetime.utcnow().isoformat(), "text": t, "tags": g} for t, g in notes]
+        self.path.write_text(json.dumps(data, indent=2, ensure_ascii=False))
+
+
+def rate(fn, ops: int) -> float:
+    t0 = time.perf_counter()
+    for i in range(ops):
+        fn(i)
+    return ops / (time.perf_counter() - t0)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--notes", type=int, default=10_000)
+    ap.add_argument("--ops", type=int, default=200)
+    args = ap.parse_args()
+
+    rng = random.Random(1)
+    notes = [(" ".join(rng.choice(WORDS) for _ in range(8)), [rng.choice(WORDS)]) for _ in range(args.notes)]
+    queries = [rng.choice(WORDS) for _ in range(args.ops)]
+
+    with tempfile.TemporaryDirectory() as d:
+        legacy = LegacyJsonNotes(Path(d) / "memory_store.json")
+        legacy.bulk(notes)
+        store = NoteStore(Path(d) / "notes.db")
+        for text, tags in notes:
+            store.add(text, tags)
+
+        print(f"{args.notes} notas precargadas")
+        print(f"  guardados/s  almacén único: {rate(lambda i: store.add(*notes[i]), args.ops):8.0f}"
+              f"   anterior: {rate(lambda i: legacy.save_note(*notes[i]), args.ops):8.0f}")
+        print(f"  búsquedas/s  almacén único: {rate(lambda i: store.search(queries[i], limit=10), args.ops):8.0f}"
+              f"   anterior: {rate(lambda i: legacy.search_notes(queries[i]), args.ops):8.0f}")
+
+
+if __name__ == "__main__":
+    main()
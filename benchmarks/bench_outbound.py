@@ -0,0 +1,98 @@
+"""
+Benchmark del envío saliente contra un Twilio falso local (HTTP): latencia del
+servidor simulada, 429 y 5xx aleatorios. Mide mensajes/s, p50/p99 de entrega,
+reintentos, y verifica que cada destinatario recibe sus trozos en orden.
+
+    python -m benchmarks.bench_outbound [--recipients 50] [--messages 10] [--latency-ms 20]
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+from services.outbound import TwilioSender, split_message
+
+
+def start_fake_twilio(latency: float, error_rate: float):
+    received = defaultdict(list)
+    lock = threading.Lock()
+    rng = random.Random(7)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            form = parse_qs(self.rfile.read(int(self.headers["Content-Length"])).decode())
+            time.sleep(latency)
+            with lock:
+                roll = rng.random()
+            if roll < error_rate:
+                status, payload = (429, b"{}") if roll < error_rate / 2 else (503, b"{}")
+            else:
+                with lock:
+                    received[form["To"][0]].append(form["Body"][0])
+                status, payload = 201, json.dumps({"sid": f"SM{rng.getrandbits(64):x}"}).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            if status in (429, 503):
+                self.send_header("Retry-After", "0.05")
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    class Server(ThreadingHTTPServer):
+        request_queue_size = 128  # el backlog por defecto (5) descarta conexiones
+
+    httpd = Server(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd, f"http://127.0.0.1:{httpd.server_port}", received
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--recipients", type=int, default=50)
+    ap.add_argument("--messages", type=int, default=10)
+    ap.add_argument("--latency-ms", type=float, default=20)
+    ap.add_argument("--error-rate", type=float, default=0.05)
+    ap.add_argument("--mps", type=float, default=200)
+    ap.add_argument("--workers", type=int, default=16)
+    args = ap.parse_args()
+
+    httpd, base, received = start_fake_twilio(args.latency_ms / 1000, args.error_rate)
+    sender = TwilioSender("ACbench", "token", "whatsapp:+10000000000", base_url=base, rate=args.mps,
+                          burst=args.mps, backoff=0.05, workers=args.workers, queue_size=100_000)
+
+    expected = defaultdict(list)
+    t0 = time.perf_counter()
+    for m in range(args.messages):
+        for r in range(args.recipients):
+            to = f"whatsapp:+34{r:09d}"
+            # uno de cada 5 mensajes supera el límite y se parte
+            body = f"[{m}] " + ("respuesta larga " * 150 if m % 5 == 4 else "hola")
+            expected[to] += split_message(body)
+            sender.send(body, to)
+    sender.join()
+    elapsed = time.perf_counter() - t0
+    httpd.shutdown()
+
+    stats = sender.stats()
+    in_order = all(received[to] == parts for to, parts in expected.items())
+    print(f"{args.recipients} destinatarios x {args.messages} mensajes, latencia {args.latency_ms} ms, "
+          f"errores {args.error_rate:.0%}, límite {args.mps:g} msg/s")
+    print(f"  requests OK: {stats['sent']} en {elapsed:.2f}s ({stats['sent'] / elapsed:,.0f}/s)  "
+          f"reintentos: {stats['retries']}  fallidos: {stats['failed']}")
+    print(f"  entrega p50/p99: {stats['delivery']['p50_ms']:.1f} / {stats['delivery']['p99_ms']:.1f} ms  "
+          f"request p50/p99: {stats['requests']['p50_ms']:.1f} / {stats['requests']['p99_ms']:.1f} ms")
+    print(f"  orden por destinatario: {'OK' if in_order else 'ROTO'}")
+
+
+if __name__ == "__main__":
+    main()
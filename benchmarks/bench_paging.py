@@ -0,0 +1,129 @@
+"""
+Benchmark de los listados por páginas (services/paging.py) con 100k notas y
+100k agentes: tiempo y pico de memoria (tracemalloc) por página, contra el
+render anterior que cargaba todo y armaba un solo texto gigante.
+
+- antes:          todos los registros -> un string (lo que hacían pretty_list,
+                  pretty_search y list_agents)
+- página 1:       primera página
+- «más»:          página siguiente desde el cursor guardado del remitente
+- página N:       mitad del listado (recorre las N-1 anteriores con los
+                  mismos cortes que «más»)
+- «más» profundo: la siguiente a esa (keyset: no depende de lo lejos que esté)
+
+    python -m benchmarks.bench_paging [--notes 100000] [--agents 100000]
+"""
+
+import argparse
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from benchmarks import fixtures
+from services.context import sender_context
+
+
+def measure(fn, rounds: int = 5):
+    fn()  # calentamiento (cachés de SQLite, índice del registro)
+    best = float("inf")
+    for _ in range(rounds):
+        t = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t)
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak, out
+
+
+def report(label: str, fn, rounds: int = 5) -> None:
+    seconds, peak, out = measure(fn, rounds)
+    size = len(out.encode("utf-8"))
+    print(f"  {label:<16} {seconds * 1000:>10.2f} ms  pico {peak / 1e6:>8.2f} MB  respuesta {size:>10,} bytes")
+
+
+def old_list_notes(store) -> str:
+    notes = store.list_notes()
+    lines = []
+    for i, n in enumerate(notes):
+        tags = ", ".join(n.get("tags", [])) if n.get("tags") else "-"
+        lines.append(f"{i}. [{n.get('timestamp', '')}] {n.get('text', '')}  (tags: {tags})")
+    return "\n".join(lines)
+
+
+def old_search(store, keyword: str) -> str:
+    results = store.search(keyword)
+    lines = [f"Resultados para '{keyword}':"]
+    for n in results:
+        tags = ", ".join(n.get("tags", [])) if n.get("tags") else "-"
+        lines.append(f"- [{n.get('timestamp', '')}] {n.get('text', '')}  (tags: {tags})")
+    return "\n".join(lines)
+
+
+def old_list_agents(store) -> str:
+    lines = []
+    for i, (aid, a) in enumerate(store.items(), start=1):
+        lines.append(f"{i}. [{aid}] {a['name']} — {a['description']} (tipo: {a['type']})")
+    return "\n".join(lines)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--notes", type=int, default=100_000)
+    ap.add_argument("--agents", type=int, default=100_000)
+    args = ap.parse_args()
+    with tempfile.TemporaryDirectory() as d:
+        d = Path(d)
+        fixtures.isolate(d)
+        from agents import router
+        from modules import memory_module
+        from services import paging, shards
+        from services.note_store import current_store
+
+        sender = "whatsapp:+34000000001"
+        mid_notes = args.notes // paging.PAGE_ITEMS // 2
+        mid_agents = args.agents // paging.PAGE_ITEMS // 2
+
+        # los datos del remitente van en su shard (services/shards.py)
+        shards.ENABLED = True
+        with sender_context(sender):
+            store = current_store()
+            fixtures.fill_notes(store, args.notes)
+            fixtures.build_registry(shards.default_shards().get(sender).path / "registry.json", args.agents)
+
+            print(f"notas ({args.notes:,}): listar notas")
+            report("antes", lambda: old_list_notes(store), rounds=2)
+            report("página 1", lambda: memory_module.pretty_list())
+            report("«más»", lambda: (memory_module.pretty_list(), paging.more())[1])
+            report(f"página {mid_notes}", lambda: memory_module.pretty_list(page=mid_notes))
+            report("«más» profundo", lambda: (memory_module.pretty_list(page=mid_notes), paging.more())[1])
+
+            print(f"notas ({args.notes:,}): búsqueda 'idea' (BM25)")
+            report("antes", lambda: old_search(store, "idea"), rounds=2)
+            report("página 1", lambda: memory_module.pretty_search("idea"))
+            report("«más»", lambda: (memory_module.pretty_search("idea"), paging.more())[1])
+
+            print(f"agentes ({args.agents:,}): listar agentes")
+            report("antes", lambda: old_list_agents(router.registry()), rounds=2)
+            report("página 1", lambda: router.list_agents())
+            report("«más»", lambda: (router.list_agents(), paging.more())[1])
+            report(f"página {mid_agents}", lambda: router.list_agents(page=mid_agents))
+            report("«más» profundo", lambda: (router.list_agents(page=mid_agents), paging.more())[1])
+
+            # recorrer todo con «más» no pierde ni repite agentes
+            text, seen = router.list_agents(), 0
+            pages = 1
+            while True:
+                seen += sum(1 for line in text.splitlines() if line[:1].isdigit())
+                if "«más»" not in text:
+                    break
+                text = paging.more()
+                pages += 1
+            print(f"  recorrido completo con «más»: {seen:,} agentes en {pages:,} páginas "
+                  f"({'ok' if seen == args.agents else 'FALLA'})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Benchmark del registro de agentes: costo por llamada de run_agent con
+10k agentes y 1M entradas de historia (datos sintéticos en un directorio temporal),
+con y sin la caché de instancias del router.
+
+    python -m benchmarks.bench_registry [--agents 10000] [--history 1000000] [--calls 200] [--hot 100]
+"""
+
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from agents import router
+from agents.agent_cache import AgentCache
+from benchmarks import fixtures
+
+
+def per_call_ms(ids, calls: int, hot: int = 0) -> float:
+    """hot > 0: 90% de las llamadas van a los primeros 'hot' agentes."""
+    t0 = time.perf_counter()
+    for i in range(calls):
+        if hot and i % 10:
+            aid = ids[(i * 7919) % hot]
+        else:
+            aid = ids[(i * 7919) % len(ids)]
+        router.run_agent(aid, "tarea de prueba")
+    return (time.perf_counter() - t0) * 1000 / calls
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--agents", type=int, default=10_000)
+    ap.add_argument("--history", type=int, default=1_000_000)
+    ap.add_argument("--calls", type=int, default=200)
+    ap.add_argument("--hot", type=int, default=100)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as d:
+        fixtures.isolate(Path(d))
+        ids = fixtures.build_registry(Path(d) / "registry.json", args.agents, args.history)
+
+        t0 = time.perf_counter()
+        router.store.items()
+        print(f"carga inicial: {(time.perf_counter() - t0) * 1000:.0f} ms")
+
+        for rnd in range(3):
+            print(f"ronda {rnd}: {per_call_ms(ids, args.calls):.3f} ms/llamada")
+
+        # uso realista: unos pocos agentes concentran la mayoría de las llamadas
+        router.agent_cache = AgentCache()
+        with_cache = per_call_ms(ids, args.calls, hot=args.hot)
+        stats = router.agent_cache_stats()
+        router.agent_cache = AgentCache(max_entries=0)
+        without = per_call_ms(ids, args.calls, hot=args.hot)
+        print(f"90% a {args.hot} agentes: {with_cache:.3f} ms/llamada con caché "
+              f"(hit ratio {stats['hit_ratio']:.2f}), {without:.3f} ms/llamada sin caché")
+        print(f"caché de agentes: {json.dumps(stats)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Prueba de carga de sesiones: miles de remitentes distintos mandando mensajes al
+webhook /whatsapp a la vez (cliente de prueba de Flask en varios threads, sin
+red; las respuestas se capturan en vez de enviarse). Registro, notas y sesiones
+van a un directorio temporal (presupuesto solo en memoria).
+
+Reporta latencia del webhook, mensajes/s procesados, 503 por cola llena
+(se reintentan como haría Twilio), agentes creados (debe haber uno por
+remitente) y estadísticas de la caché de sesiones.
+
+    python -m benchmarks.bench_sessions [--senders 2000] [--messages 3] [--clients 32]
+"""
+
+import argparse
+import json
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from agents import router
+from benchmarks import fixtures
+from services import sessions
+from services.context import sender_context
+from services.metrics import LatencyStats
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--senders", type=int, default=2000)
+    ap.add_argument("--messages", type=int, default=3)
+    ap.add_argument("--clients", type=int, default=32)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as d:
+        d = Path(d)
+        fixtures.isolate(d, sessions_path=True)
+
+        import app as web
+        replies = []
+        web.pipeline.send = lambda text, to: replies.append(to)
+        webhook = LatencyStats()
+        busy = [0]
+
+        senders = [f"whatsapp:+34{i:09d}" for i in range(args.senders)]
+        # cada remitente: guarda notas y luego busca las suyas
+        work = [(s, f"recordar: idea {m} de u{s[-6:]}" if m < args.messages - 1 else f"buscar en memoria: u{s[-6:]}")
+                for m in range(args.messages) for s in senders]
+        # un MessageSid por mensaje: el webhook descarta los repetidos (services/ingest.py)
+        work = [(s, body, f"SM{i:08d}") for i, (s, body) in enumerate(work)]
+
+        def client(part):
+            c = web.app.test_client()
+            for sender, body, sid in part:
+                while True:
+                    t = time.perf_counter()
+                    r = c.post("/whatsapp", data={"From": sender, "Body": body, "MessageSid": sid})
+                    webhook.observe(time.perf_counter() - t)
+                    if r.status_code != 503:
+                        break
+                    busy[0] += 1
+                    time.sleep(0.05)
+
+        t0 = time.perf_counter()
+        threads = [threading.Thread(target=client, args=(work[i::args.clients],)) for i in range(args.clients)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        web.pipeline.pool.join()
+        elapsed = time.perf_counter() - t0
+
+        # cada remitente tiene su agente en su propio registro (services/shards.py)
+        owned = 0
+        for sender in senders:
+            with sender_context(sender):
+                owned += router.registry().find_owned(sender, "memory") is not None
+        print(f"{args.senders} remitentes x {args.messages} mensajes, {args.clients} clientes concurrentes")
+        print(f"  procesados: {len(replies)} en {elapsed:.2f}s ({len(replies) / elapsed:,.0f} msg/s)  "
+              f"503 reintentados: {busy[0]}")
+        print(f"  webhook p50/p99: {webhook.percentile(50) * 1000:.2f} / {webhook.percentile(99) * 1000:.2f} ms")
+        print(f"  agentes por remitente: {owned} (esperado {args.senders})")
+        print(f"  sesiones: {json.dumps(sessions.default_sessions().stats())}")
+        print(f"  pipeline: {json.dumps(web.pipeline.stats()['processing'])}")
+
+        store = sessions.default_sessions()
+        t = time.perf_counter()
+        store.snapshot()
+        print(f"  snapshot de {len(store)} sesiones: {(time.perf_counter() - t) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Benchmark de escalado por remitentes: archivos únicos (SHARDS=0) contra un
+shard por remitente (services/shards.py), de 1 a 10k remitentes.
+
+N procesos (como los workers de gunicorn) atienden los mismos mensajes
+repartidos al azar, sobre un directorio temporal compartido. Mezcla por
+mensaje: 60% 'recordar: ...' (nota + historia del agente en el registro),
+25% 'buscar en memoria: ...' y 15% 'listar notas'.
+
+- alta:  primer mensaje de cada remitente (crea su agente y, con shards, su
+         directorio); se mide aparte.
+- carga: --messages mensajes de remitentes al azar, ya dados de alta.
+
+Con más remitentes que OPEN_SHARDS por proceso, parte de los mensajes
+reabren el shard desde disco: eso también entra en la medida.
+
+    python -m benchmarks.bench_shards [--senders 1,10,100,1000,10000] [--messages 4000] [--procs 4]
+"""
+
+import argparse
+import multiprocessing
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks import fixtures
+from services.metrics import LatencyStats
+
+LAYOUTS = ("único", "shards")
+
+
+def sender_name(i: int) -> str:
+    return f"whatsapp:+34{i:09d}"
+
+
+def workload(senders: int, messages: int, seed: int = 7):
+    rnd = random.Random(seed)
+    out = []
+    for _ in range(messages):
+        sender = sender_name(rnd.randrange(senders))
+        r = rnd.random()
+        if r < 0.6:
+            body = f"recordar: {fixtures.sentence(rnd)}"
+        elif r < 0.85:
+            body = f"buscar en memoria: {rnd.choice(fixtures.WORDS)}"
+        else:
+            body = "listar notas"
+        out.append((sender, body))
+    return out
+
+
+def worker(d: str, layout: str, warm, work, barrier, out) -> None:
+    fixtures.isolate(Path(d))
+    from agents import router
+    from services import shards
+    from services.context import sender_context
+
+    shards.ENABLED = layout == "shards"
+
+    def handle(sender, body):
+        with sender_context(sender):
+            return router.handle_text_command(body) or router.handle_agent_task(body)
+
+    t = time.perf_counter()
+    for sender in warm:
+        handle(sender, "recordar: primera idea")
+    warm_s = time.perf_counter() - t
+    out.put(("warm", warm_s))
+    # todos terminan el alta antes de medir la carga
+    barrier.wait()
+    latencies = []
+    t = time.perf_counter()
+    for sender, body in work:
+        start = time.perf_counter()
+        handle(sender, body)
+        latencies.append(time.perf_counter() - start)
+    out.put(("load", (time.perf_counter() - t, latencies,
+                      shards.default_shards().stats() if shards.ENABLED else None)))
+
+
+def run(layout: str, senders: int, messages: int, procs: int) -> None:
+    ctx = multiprocessing.get_context("fork")
+    names = [sender_name(i) for i in range(senders)]
+    work = workload(senders, messages)
+    with tempfile.TemporaryDirectory() as d:
+        out = ctx.Queue()
+        barrier = ctx.Barrier(procs)
+        # alta en paralelo: cada proceso da de alta una parte de los remitentes
+        ps = [ctx.Process(target=worker, args=(d, layout, names[p::procs], work[p::procs], barrier, out))
+              for p in range(procs)]
+        for p in ps:
+            p.start()
+        warm, load, stats = [], [], []
+        for _ in range(2 * procs):
+            kind, value = out.get()
+            if kind == "warm":
+                warm.append(value)
+            elif kind == "load":
+                load.append(value)
+        for p in ps:
+            p.join()
+    lat = LatencyStats(window=messages)
+    for _, latencies, st in load:
+        for x in latencies:
+            lat.observe(x)
+        if st:
+            stats.append(st)
+    wall = max(x[0] for x in load)
+    extra = ""
+    if stats:
+        opened = sum(s["opened"] for s in stats)
+        extra = f"  shards abiertos {opened:,} (reaperturas {sum(s['evictions'] for s in stats):,})"
+    print(f"  {layout:<7} {senders:>6,} remitentes: alta {max(warm) * 1000 / max(1, senders / procs):>6.2f} ms/remitente  "
+          f"carga {messages / wall:>7,.0f} msg/s  p50 {lat.percentile(50) * 1000:>6.2f} ms  "
+          f"p99 {lat.percentile(99) * 1000:>7.2f} ms{extra}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--senders", default="1,10,100,1000,10000")
+    ap.add_argument("--messages", type=int, default=4000)
+    ap.add_argument("--procs", type=int, default=4)
+    args = ap.parse_args()
+    fixtures.stub_ddgs()
+    print(f"{args.messages} mensajes en {args.procs} procesos")
+    for senders in (int(x) for x in args.senders.split(",")):
+        for layout in LAYOUTS:
+            run(layout, senders, args.messages, args.procs)
+
+
+if __name__ == "__main__":
+    main()
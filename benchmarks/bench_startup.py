@@ -0,0 +1,67 @@
+"""
+Benchmark de arranque: tiempo de import y RSS de cada punto de entrada, en un
+proceso nuevo por medición (se toma el mejor de --repeat), y qué dependencias
+pesadas quedaron cargadas.
+
+- web:        import app (lo que hace cada worker de gunicorn sin preload)
+- web+warm:   import app + app.warm_up() (lo que carga el master con preload,
+              equivalente a los imports eager de antes)
+- cli:        import main
+
+    python -m benchmarks.bench_startup [--repeat 5]
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+HEAVY = ("twilio", "pydub", "speech_recognition", "duckduckgo_search", "numpy", "requests")
+
+_PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+{code}
+elapsed = time.perf_counter() - t0
+rss_kb = 0
+try:
+    with open("/proc/self/status") as f:
+        rss_kb = next(int(l.split()[1]) for l in f if l.startswith("VmRSS:"))
+except OSError:
+    import resource
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{"ms": elapsed * 1000, "rss_mb": rss_kb / 1024,
+                  "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+ENTRY_POINTS = {
+    "web": "import app",
+    "web+warm": "import app; app.warm_up()",
+    "cli": "import main",
+}
+
+
+def probe(code: str) -> dict:
+    out = subprocess.run([sys.executable, "-c", _PROBE.format(code=code, heavy=HEAVY)],
+                         cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    base = min((probe("pass") for _ in range(args.repeat)), key=lambda r: r["ms"])
+    print(f"intérprete vacío: {base['rss_mb']:.1f} MB")
+    for name, code in ENTRY_POINTS.items():
+        best = min((probe(code) for _ in range(args.repeat)), key=lambda r: r["ms"])
+        print(f"  {name:9s} import {best['ms']:7.1f} ms   RSS {best['rss_mb']:6.1f} MB   "
+              f"cargados: {', '.join(best['heavy']) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
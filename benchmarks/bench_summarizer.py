@@ -0,0 +1,71 @@
+"""
+Benchmark del resumen extractivo: services.summarizer frente a la versión
+anterior de _top_bullets (copiada abajo), con 10 a 1000 snippets sintéticos.
+
+    python -m benchmarks.bench_summarizer
+"""
+
+import random
+import re
+import time
+from typing import List
+
+from services.summarizer import summarize
+
+WORDS = ("madrid clima temperatura grados lluvia sol viento mañana tarde noche "
+         "pronóstico ciudad norte sur humedad semana fin máxima mínima nubes").split()
+
+
+def legacy_top_bullets(snippets: List[str], max_items: int = 5) -> List[str]:
+    def _clean(s):
+        return re.sub(r"\s+", " ", (s or "")).strip()
+    text = " ".join(_clean(s) for s in snippets if s)
+    if not text:
+        return []
+    sents = [p for p in re.split(r"(?<=[.!?])\s+", _clean(text)) if 30 <= len(p) <= 220]
+    words = re.findall(r"[a-záéíóúüñ0-9]{3,}", text.lower())
+    freq = {}
+    for w in words:
+        freq[w] = freq.get(w, 0) + 1
+    def score(sent):
+        toks = re.findall(r"[a-záéíóúüñ0-9]{3,}", sent.lower())
+        return sum(freq.get(t, 0) for t in toks) / max(1, len(toks))
+    out, seen = [], set()
+    for s in sorted(sents, key=score, reverse=True):
+        key = s.lower()[:60]
+        if key in seen:
+            continue
+        seen.add(key)
+        out.append(s)
+        if len(out) >= max_items:
+            break
+    return out
+
+
+def make_snippets(n: int, rng: random.Random) -> List[str]:
+    out = []
+    for _ in range(n):
+        sents = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 18))).capitalize() + "."
+                 for _ in range(3)]
+        out.append(" ".join(sents))
+    return out
+
+
+def bench(fn, snippets, reps: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(reps):
+        fn(snippets, max_items=5)
+    return (time.perf_counter() - t0) * 1000 / reps
+
+
+def main():
+    rng = random.Random(42)
+    for n in (10, 100, 1000):
+        snippets = make_snippets(n, rng)
+        reps = max(3, 2000 // n)
+        print(f"{n:>5} snippets: actual {bench(summarize, snippets, reps):.2f} ms, "
+              f"anterior {bench(legacy_top_bullets, snippets, reps):.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Benchmark del índice vectorial: inserción en lote, latencia de consulta exacta
+(memmap por bloques) y con LSH, y recall@k de LSH frente a la búsqueda exacta.
+Usa vectores aleatorios normalizados (el costo no depende del embedder).
+
+    python -m benchmarks.bench_vectors [--rows 300000] [--dim 256] [--queries 50]
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from services.vector_index import VectorIndex
+
+
+class _FixedDim:
+    name = "bench"
+
+    def __init__(self, dim: int):
+        self.dim = dim
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=300_000)
+    ap.add_argument("--dim", type=int, default=256)
+    ap.add_argument("--queries", type=int, default=50)
+    ap.add_argument("--k", type=int, default=10)
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as d:
+        idx = VectorIndex(Path(d) / "bench", _FixedDim(args.dim), ann_threshold=args.rows + 1)
+        t0 = time.perf_counter()
+        for start in range(0, args.rows, 50_000):
+            n = min(50_000, args.rows - start)
+            x = rng.standard_normal((n, args.dim)).astype(np.float32)
+            x /= np.linalg.norm(x, axis=1, keepdims=True)
+            idx.add(np.arange(start, start + n) + 1, x)
+        print(f"{args.rows} vectores de {args.dim} dims: inserción {args.rows / (time.perf_counter() - t0):,.0f}/s")
+
+        # consultas cerca de vectores existentes (como una nota parecida a otra)
+        vecs = np.memmap(idx.vec_path, dtype=np.float32, mode="r", shape=(args.rows, args.dim))
+        queries = []
+        for r in rng.integers(0, args.rows, args.queries):
+            q = vecs[r] + 0.5 * rng.standard_normal(args.dim).astype(np.float32) / np.sqrt(args.dim)
+            queries.append(q / np.linalg.norm(q))
+
+        def run():
+            t = time.perf_counter()
+            res = [idx.search(q, args.k) for q in queries]
+            return res, (time.perf_counter() - t) / len(queries) * 1000
+
+        exact, exact_ms = run()
+        idx.ann_threshold = 0
+        ann, ann_ms = run()
+        recall = np.mean([len({i for i, _ in a} & {i for i, _ in e}) / args.k for a, e in zip(ann, exact)])
+        top1 = np.mean([a[0][0] == e[0][0] for a, e in zip(ann, exact)])
+        print(f"  exacta: {exact_ms:7.2f} ms/consulta")
+        print(f"  LSH:    {ann_ms:7.2f} ms/consulta   recall@{args.k}: {recall:.2f}   top-1: {top1:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Datos y entorno comunes de los benchmarks (todo local, sin red).
+
+- isolate(d): apunta registro, historia, notas, shards por remitente,
+  sesiones, presupuesto, caché de agentes y log de entrada del proceso a un
+  directorio temporal (nada toca services/ ni agents/).
+- build_registry(path, n, history): snapshot sintético de n agentes 'base'.
+- fill_notes(store, n): notas sintéticas con vocabulario repetido.
+- FakeDDGS / stub_ddgs(): reemplazo de duckduckgo_search.DDGS con resultados fijos.
+- tone_wav(seconds): tono WAV estéreo 44.1 kHz en bytes (no necesita ffmpeg).
+"""
+
+import atexit
+import json
+import random
+import sys
+import types
+from pathlib import Path
+from typing import List
+
+WORDS = ("idea proyecto cliente reunión factura viaje receta libro música código servidor "
+         "jardín compra llamada correo agenda gimnasio película regalo presupuesto informe").split()
+
+
+def isolate(d: Path, sessions_path: bool = False) -> None:
+    from agents import base_agent, router
+    from agents.agent_cache import AgentCache
+    from agents.registry_store import RegistryStore
+    from services import ingest, llm, note_store, paging, sessions, shards
+    from services.budget import BudgetGuard
+
+    d = Path(d)
+    router.store = RegistryStore(d / "registry.json")
+    router.budget = BudgetGuard(monthly_limit=1e9)  # sin ledger en disco ni tope
+    llm.attach_budget(router.budget)
+    router.agent_cache = AgentCache()
+    base_agent.HISTORY_DIR = d / "history"
+    note_store._default = note_store.NoteStore(d / "notes.db")
+    shards._default = shards.ShardMap(d / "shards")
+    ingest._default = ingest.IngestLog(d / "ingest")
+    paging.PAGER_DIR = d / "pager"
+    store = sessions.SessionStore(path=d / "sessions.json" if sessions_path else None, snapshot_interval=5.0)
+    if sessions_path:
+        atexit.unregister(store.snapshot)  # el directorio temporal se borra antes de salir
+    sessions._default = store
+
+
+def build_registry(path: Path, n_agents: int, n_history: int = 0) -> List[str]:
+    per_agent = n_history // max(1, n_agents)
+    entry = {"t": "2024-01-01T00:00:00", "entry": {"task": "x" * 20, "mode": "high"}}
+    data, ids = {}, []
+    for i in range(n_agents):
+        aid = f"agent-{i:06d}"
+        ids.append(aid)
+        data[aid] = {
+            "name": f"Agente {i}",
+            "description": "sintético",
+            "type": "base",
+            "created_at": "2024-01-01T00:00:00",
+            "history": [entry] * per_agent,
+        }
+    Path(path).write_text(json.dumps(data))
+    return ids
+
+
+def sentence(rnd: random.Random, words: int = 8) -> str:
+    return " ".join(rnd.choice(WORDS) for _ in range(words))
+
+
+def fill_notes(store, n: int, seed: int = 1) -> None:
+    rnd = random.Random(seed)
+    conn = store._conn()
+    with conn:
+        # en una transacción: precargar 100k notas de a una tardaría minutos
+        for i in range(n):
+            text = f"{sentence(rnd)} #{i}"
+            cur = conn.execute("INSERT INTO notes (ts, text, source) VALUES (?, ?, ?)",
+                               ("2024-01-01T00:00:00", text, "bench"))
+            if store.fts:
+                conn.execute("INSERT INTO notes_fts (rowid, text, tags) VALUES (?, ?, '')", (cur.lastrowid, text))
+
+
+def snippets(n: int, seed: int = 2) -> List[str]:
+    rnd = random.Random(seed)
+    return [". ".join(sentence(rnd, rnd.randint(6, 20)) for _ in range(rnd.randint(1, 3))) + "." for _ in range(n)]
+
+
+class FakeDDGS:
+    """Mismo uso que duckduckgo_search.DDGS (context manager, text(), news(), images())."""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def text(self, query, max_results=10, **kwargs):
+        rnd = random.Random(query)
+        for i in range(max_results):
+            yield {"title": f"{query} {i}", "href": f"https://sitio{i % 4}.example/{i}",
+                   "body": ". ".join(sentence(rnd, 12) for _ in range(3))}
+
+    def news(self, query, max_results=10, **kwargs):
+        rnd = random.Random("news " + query)
+        for i in range(max_results):
+            yield {"title": f"{query} noticia {i}", "url": f"https://diario{i % 3}.example/{i}",
+                   "body": ". ".join(sentence(rnd, 12) for _ in range(2))}
+
+    def images(self, query, max_results=4, **kwargs):
+        for i in range(max_results):
+            yield {"image": f"https://img{i}.example/{i}.jpg"}
+
+
+def stub_ddgs() -> None:
+    """Las búsquedas importan DDGS al usarlas: basta con reemplazar el módulo."""
+    mod = types.ModuleType("duckduckgo_search")
+    mod.DDGS = FakeDDGS
+    sys.modules["duckduckgo_search"] = mod
+
+
+def tone_wav(seconds: float) -> bytes:
+    import io
+    from pydub.generators import Sine
+    tone = Sine(440).to_audio_segment(duration=seconds * 1000).set_frame_rate(44100).set_channels(2)
+    buf = io.BytesIO()
+    tone.export(buf, format="wav")
+    return buf.getvalue()
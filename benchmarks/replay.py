@@ -0,0 +1,142 @@
+"""
+Reproduce un flujo de mensajes capturado por el router (services.ingest.replay),
+para pruebas de carga y de regresión sin WhatsApp ni Twilio.
+
+El archivo es JSONL: el log de entrada (services/ingest/ingest-*.jsonl), forms
+de Twilio (MessageSid, From, Body) u objetos con 'body' / 'text' al estilo de
+requests.jsonl. Por defecto corre aislado en un directorio temporal
+(fixtures.isolate) y con DuckDuckGo falso; --live usa los datos y la red reales.
+
+    python -m benchmarks.replay synth captura.jsonl [--messages 5000] [--senders 200] [--retries 0.05]
+    python -m benchmarks.replay run captura.jsonl [--workers 8] [--speed 0] [--dedupe] [--out respuestas.jsonl]
+    python -m benchmarks.replay run captura.jsonl --expect respuestas.jsonl   (regresión: sale con 1 si cambian)
+
+En --expect las respuestas se comparan por SID, con ids de agente, fechas y
+horas reemplazados por marcadores (cambian en cada corrida). Con SHARDS=1
+cada remitente tiene sus propias notas y agentes (services/shards.py) y sus
+mensajes se procesan en orden, así que las respuestas no dependen del número
+de workers. Sin shards (por defecto) los datos son compartidos y el
+intercalado entre remitentes las cambia: --out / --expect usan entonces un
+solo worker salvo que se pida otro.
+"""
+
+import argparse
+import json
+import random
+import re
+import sys
+import tempfile
+from pathlib import Path
+
+from benchmarks import fixtures
+from services import shards
+from services.ingest import IngestLog, iter_messages, replay
+
+_VOLATILE = [
+    (re.compile(r"\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b"), "<id>"),
+    (re.compile(r"\b\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}(:\d{2}(\.\d+)?)?([+-]\d{2}:\d{2})?"), "<fecha>"),
+    (re.compile(r"\b\d{2}:\d{2}(:\d{2})?\b"), "<hora>"),
+]
+
+
+def normalize_reply(text):
+    if text is None:
+        return None
+    for pattern, repl in _VOLATILE:
+        text = pattern.sub(repl, text)
+    return text
+
+
+def synth(path: Path, messages: int, senders: int, retries: float, seed: int = 5) -> None:
+    """Captura sintética: notas, búsquedas en memoria, agentes y preguntas; con reintentos de Twilio."""
+    rnd = random.Random(seed)
+    ts = 1_714_521_600.0  # 2024-05-01
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(messages):
+            sender = f"whatsapp:+34{rnd.randrange(senders):09d}"
+            r = rnd.random()
+            if r < 0.45:
+                body = f"recordar: {fixtures.sentence(rnd)}"
+            elif r < 0.75:
+                body = f"buscar en memoria: {rnd.choice(fixtures.WORDS)}"
+            elif r < 0.8:
+                body = "listar agentes"
+            elif r < 0.9:
+                body = f"buscar: {fixtures.sentence(rnd, 3)}"
+            else:
+                body = f"qué es {rnd.choice(fixtures.WORDS)}"
+            ts += rnd.expovariate(20)  # ~20 mensajes/s
+            rec = {"MessageSid": f"SM{seed:02d}{i:08d}", "From": sender, "Body": body, "ts": round(ts, 3)}
+            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            if rnd.random() < retries:
+                # el mismo webhook otra vez, un poco después (respuesta lenta)
+                f.write(json.dumps(dict(rec, ts=round(ts + rnd.uniform(0.5, 15), 3)), ensure_ascii=False) + "\n")
+    print(f"{path}: {messages} mensajes de {senders} remitentes (+{retries:.0%} reintentos)")
+
+
+def run(args) -> int:
+    with tempfile.TemporaryDirectory() as d:
+        if not args.live:
+            fixtures.isolate(Path(d))
+            fixtures.stub_ddgs()
+        log = IngestLog(Path(d) / "replay-ingest") if args.dedupe else None
+        workers = args.workers or (1 if (args.out or args.expect) and not shards.ENABLED else 8)
+        res = replay(iter_messages(Path(args.file)), workers=workers, speed=args.speed, log=log)
+    lat = res["latency"]
+    print(f"{res['processed']} mensajes en {res['seconds']:.2f}s ({res['per_second']:,.0f} msg/s), "
+          f"{res['duplicates']} repetidos descartados, {res['errors']} errores")
+    print(f"  por mensaje: promedio {lat['avg_ms']:.2f} ms  p50 {lat['p50_ms']:.2f} ms  p99 {lat['p99_ms']:.2f} ms")
+    for r in [r for r in res["results"] if r.error][:5]:
+        print(f"  error en {r.sid}: {r.error}")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            for r in res["results"]:
+                f.write(json.dumps(r.as_dict(), ensure_ascii=False) + "\n")
+        print(f"Respuestas en {args.out}")
+
+    if args.expect:
+        expected = {}
+        with open(args.expect, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    rec = json.loads(line)
+                    expected[rec["sid"]] = normalize_reply(rec.get("reply"))
+        got = {r.sid: normalize_reply(r.reply) for r in res["results"]}
+        changed = [sid for sid in expected if sid in got and got[sid] != expected[sid]]
+        missing = [sid for sid in expected if sid not in got]
+        extra = [sid for sid in got if sid not in expected]
+        for sid in changed[:5]:
+            print(f"  {sid}:\n    antes: {expected[sid]!r}\n    ahora: {got[sid]!r}")
+        print(f"regresión: {len(changed)} respuestas distintas, {len(missing)} faltan, {len(extra)} nuevas "
+              f"(de {len(expected)})")
+        if changed or missing or extra:
+            return 1
+    return 1 if res["errors"] else 0
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Replay de mensajes capturados por el router")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    s = sub.add_parser("synth", help="genera una captura sintética")
+    s.add_argument("file")
+    s.add_argument("--messages", type=int, default=5000)
+    s.add_argument("--senders", type=int, default=200)
+    s.add_argument("--retries", type=float, default=0.05, help="fracción de webhooks repetidos")
+    r = sub.add_parser("run", help="reproduce una captura")
+    r.add_argument("file")
+    r.add_argument("--workers", type=int, help="por defecto 8 (con SHARDS=0, 1 con --out / --expect)")
+    r.add_argument("--speed", type=float, default=0.0, help="0: a toda velocidad; 1: ritmo original")
+    r.add_argument("--dedupe", action="store_true", help="descarta repetidos por SID como el webhook")
+    r.add_argument("--out", help="guarda las respuestas (JSONL) para compararlas después")
+    r.add_argument("--expect", help="respuestas de una corrida anterior: marca las que cambian")
+    r.add_argument("--live", action="store_true", help="usa los datos y la red reales (no aislado)")
+    args = ap.parse_args()
+    if args.cmd == "synth":
+        synth(Path(args.file), args.messages, args.senders, args.retries)
+        return 0
+    return run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
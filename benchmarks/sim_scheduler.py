@@ -0,0 +1,149 @@
+"""
+Simulación del planificador (services/scheduler.py) con reloj falso: miles de
+usuarios con su hora y zona horaria propias durante varios días, saltando de
+una tarea vencida a la siguiente (sin esperar de verdad).
+
+Comprueba que cada usuario recibe exactamente un resumen por día a su HH:MM
+local, que el resumen es incremental (solo notas desde el envío anterior) y
+mide cuánto cuesta guardar/recargar el archivo de tareas.
+
+    python -m benchmarks.sim_scheduler [--users 10000] [--days 3] [--workers 8]
+"""
+
+import argparse
+import random
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, time as dtime, timedelta, timezone
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+from modules import automation_module
+from services import note_store, shards
+from services.context import sender_context
+from services.metrics import LatencyStats
+from services.scheduler import FakeClock, Job, Scheduler
+
+ZONES = ["UTC", "Europe/Madrid", "America/Bogota", "America/Mexico_City", "America/Argentina/Buenos_Aires",
+         "America/New_York", "Asia/Tokyo", "Australia/Sydney", "Asia/Kolkata", "Pacific/Auckland"]
+
+
+def expected_runs(job: Job, start: float, end: float) -> list:
+    """Instantes HH:MM locales en (start, end), calculados día por día."""
+    tz = ZoneInfo(job.tz)
+    day = datetime.fromtimestamp(start, tz).date() - timedelta(days=1)
+    out = set()
+    while datetime.combine(day, dtime(0, 0), tzinfo=tz).timestamp() < end:
+        cand = datetime.combine(day, dtime(job.hour, job.minute), tzinfo=tz).timestamp()
+        if start < cand < end:
+            out.add(cand)
+        day += timedelta(days=1)
+    return sorted(out)
+
+
+def simulate(users: int, days: int, workers: int, d: Path) -> None:
+    rnd = random.Random(7)
+    start = datetime(2024, 3, 30, tzinfo=timezone.utc).timestamp()  # cruza el cambio de hora europeo
+    clock = FakeClock(start)
+    sched = Scheduler(d / "jobs.json", clock=clock, workers=workers, save_interval=3600)
+    runs = defaultdict(list)
+    mu = threading.Lock()
+
+    def handler(job, now):
+        with mu:
+            runs[job.user].append(now)
+
+    sched.register("resumen", handler)
+
+    entries = [(f"whatsapp:+1{i:09d}", rnd.randrange(24), rnd.choice((0, 15, 30, 45)), rnd.choice(ZONES))
+               for i in range(users)]
+    t = time.perf_counter()
+    for e in entries[:100]:
+        sched.add_daily(*e)
+    one = (time.perf_counter() - t) / 100
+    t = time.perf_counter()
+    sched.add_daily_many(entries[100:])
+    print(f"{users} tareas: alta individual {one * 1000:.2f} ms (guarda el archivo), "
+          f"el resto en lote en {time.perf_counter() - t:.2f}s")
+
+    end = start + days * 86400
+    ticks = 0
+    tick = LatencyStats()
+    t = time.perf_counter()
+    while True:
+        due = sched.next_due()
+        if due is None or due >= end:
+            break
+        clock.set(due)
+        t1 = time.perf_counter()
+        sched.run_pending()
+        tick.observe(time.perf_counter() - t1)
+        sched.maybe_save()
+        ticks += 1
+    sched.pool.join()
+    elapsed = time.perf_counter() - t
+    total = sum(len(v) for v in runs.values())
+    print(f"{days} días simulados en {elapsed:.2f}s: {total} ejecuciones, {ticks} despertares")
+    print(f"  run_pending p50/p99: {tick.percentile(50) * 1000:.3f} / {tick.percentile(99) * 1000:.3f} ms")
+
+    bad = 0
+    for jid in list(sched._jobs):
+        job = sched.get(jid)
+        if sorted(runs.get(job.user, [])) != expected_runs(job, start, end):
+            bad += 1
+    print(f"  usuarios con ejecuciones distintas de su HH:MM local (una por día): {bad}")
+
+    t = time.perf_counter()
+    sched.maybe_save(force=True)
+    save = time.perf_counter() - t
+    t = time.perf_counter()
+    reloaded = Scheduler(d / "jobs.json", clock=clock)
+    load = time.perf_counter() - t
+    same = sum(1 for jid in reloaded._jobs if reloaded.get(jid).next_run == sched.get(jid).next_run)
+    print(f"  guardar: {save * 1000:.1f} ms   recargar: {load * 1000:.1f} ms   "
+          f"próximas ejecuciones conservadas: {same}/{len(sched)}")
+    reloaded.pool.join()
+
+
+def incremental(d: Path) -> None:
+    """enviar_resumen solo manda notas posteriores a la última ejecución correcta."""
+    note_store._default = note_store.NoteStore(d / "notes.db")
+    shards._default = shards.ShardMap(d / "shards")
+    base = datetime(2024, 5, 1, tzinfo=timezone.utc).timestamp()
+
+    def at(ts):
+        return datetime.fromtimestamp(ts, timezone.utc).replace(tzinfo=None).isoformat()
+
+    job = Job("resumen:u", "whatsapp:+1", "resumen", 20, 0, "UTC", created=base)
+    # las notas del usuario están en su shard (el resumen se arma con su remitente)
+    with sender_context(job.user):
+        store = note_store.current_store()
+    sent = []
+    store.add("idea vieja", ts=at(base - 60))
+    store.add("idea del día 1", ts=at(base + 60))
+    automation_module.enviar_resumen(job, base + 86400, send=lambda text, to: sent.append(text))
+    job.last_run = base + 86400
+    store.add("idea del día 2", ts=at(base + 86400 + 60))
+    automation_module.enviar_resumen(job, base + 2 * 86400, send=lambda text, to: sent.append(text))
+    job.last_run = base + 2 * 86400
+    automation_module.enviar_resumen(job, base + 3 * 86400, send=lambda text, to: sent.append(text))
+    ok = (len(sent) == 2 and "día 1" in sent[0] and "vieja" not in sent[0]
+          and "día 2" in sent[1] and "día 1" not in sent[1])
+    print(f"resumen incremental: {'ok' if ok else 'FALLA'} ({len(sent)} envíos, sin envío si no hay notas nuevas)")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=10000)
+    ap.add_argument("--days", type=int, default=3)
+    ap.add_argument("--workers", type=int, default=8)
+    args = ap.parse_args()
+    with tempfile.TemporaryDirectory() as d:
+        simulate(args.users, args.days, args.workers, Path(d))
+        incremental(Path(d))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Prueba de estrés del almacenamiento compartido: N procesos (como workers de
+gunicorn) x T threads guardando a la vez sobre los mismos archivos, y después
+se verifica que no se perdió ni duplicó nada.
+
+- naive:     leer JSON + agregar + write_text, sin lock (lo que había antes) -> pierde notas
+- jsonfile:  services.storage.JsonFile.update (lock + rename atómico + lotes con un fsync)
+- optimista: read_json_versioned + write_json_if, reintentando en VersionConflict
+- registry:  RegistryStore.create + append_history (log con GroupCommit)
+- notes:     NoteStore.add (SQLite WAL)
+- cache:     TTLCache con persistencia (cada worker mezcla sus claves)
+
+Reporta notas esperadas/encontradas, duplicados, ops/s y escrituras vs fsyncs.
+
+    python -m benchmarks.stress_storage [--procs 8] [--threads 4] [--ops 50]
+"""
+
+import argparse
+import json
+import multiprocessing
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from services.storage import JsonFile, VersionConflict, read_json, read_json_versioned, write_json_if
+
+
+def _threads(n: int, fn) -> None:
+    ts = [threading.Thread(target=fn, args=(t,)) for t in range(n)]
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+
+
+def worker(mode: str, d: str, proc: int, threads: int, ops: int, out) -> None:
+    d = Path(d)
+    stats = {}
+
+    if mode == "naive":
+        path = d / "naive.json"
+        corrupt = [0]
+
+        def run(t):
+            for i in range(ops):
+                try:
+                    notes = read_json(path, [])
+                except ValueError:
+                    corrupt[0] += 1  # leyó un archivo a medio escribir
+                    notes = []
+                notes.append(f"p{proc}-t{t}-{i}")
+                path.write_text(json.dumps(notes))
+        stats = lambda: {"corrupt_reads": corrupt[0]}
+    elif mode == "jsonfile":
+        f = JsonFile(d / "notes.json", default=list)
+
+        def run(t):
+            for i in range(ops):
+                note = f"p{proc}-t{t}-{i}"
+                f.update(lambda notes: notes.append(note))
+        stats = f.stats
+    elif mode == "optimista":
+        path = d / "optimistic.json"
+        conflicts = [0]
+
+        def run(t):
+            for i in range(ops):
+                while True:
+                    try:
+                        notes, version = read_json_versioned(path, [])
+                        notes.append(f"p{proc}-t{t}-{i}")
+                        write_json_if(path, notes, version)
+                        break
+                    except VersionConflict:
+                        conflicts[0] += 1
+        stats = lambda: {"conflicts": conflicts[0]}
+    elif mode == "registry":
+        from agents.registry_store import RegistryStore
+        store = RegistryStore(d / "registry.json")
+
+        def run(t):
+            aid = f"p{proc}-t{t}"
+            store.create(aid, {"name": aid, "description": "", "type": "base", "history": []})
+            for i in range(ops):
+                store.append_history(aid, [f"{aid}-{i}"])
+        stats = store._commit.stats
+    elif mode == "notes":
+        from services.note_store import NoteStore
+        store = NoteStore(d / "notes.db")
+
+        def run(t):
+            for i in range(ops):
+                store.add(f"p{proc}-t{t}-{i}", source="stress")
+    elif mode == "cache":
+        from services.cache import TTLCache
+        cache = TTLCache(maxsize=10 ** 6, path=d / "cache.json")
+
+        def run(t):
+            for i in range(ops):
+                cache.set(f"p{proc}-t{t}-{i}", i, ttl=3600)
+        stats = cache._file.stats
+    else:
+        raise ValueError(mode)
+
+    _threads(threads, run)
+    out.put(stats() if callable(stats) else stats)
+
+
+def collect(mode: str, d: Path):
+    if mode == "naive":
+        try:
+            return read_json(d / "naive.json", [])
+        except ValueError:
+            return []  # quedó corrupto
+    if mode == "jsonfile":
+        return read_json_versioned(d / "notes.json", [])[0]
+    if mode == "optimista":
+        return read_json_versioned(d / "optimistic.json", [])[0]
+    if mode == "registry":
+        from agents.registry_store import RegistryStore
+        return [e for _, a in RegistryStore(d / "registry.json").items() for e in a.get("history", [])]
+    if mode == "notes":
+        from services.note_store import NoteStore
+        return [n["text"] for n in NoteStore(d / "notes.db").list_notes()]
+    if mode == "cache":
+        return [k for k, _, _ in read_json_versioned(d / "cache.json", [])[0]]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--procs", type=int, default=8)
+    ap.add_argument("--threads", type=int, default=4)
+    ap.add_argument("--ops", type=int, default=50)
+    ap.add_argument("--modes", default="naive,jsonfile,optimista,registry,notes,cache")
+    args = ap.parse_args()
+    expected = args.procs * args.threads * args.ops
+    ctx = multiprocessing.get_context("fork")
+    print(f"{args.procs} procesos x {args.threads} threads x {args.ops} guardados = {expected} por modo")
+    failed = False
+    for mode in args.modes.split(","):
+        with tempfile.TemporaryDirectory() as d:
+            out = ctx.Queue()
+            procs = [ctx.Process(target=worker, args=(mode, d, p, args.threads, args.ops, out))
+                     for p in range(args.procs)]
+            t0 = time.perf_counter()
+            for p in procs:
+                p.start()
+            stats = [out.get() for _ in procs]
+            for p in procs:
+                p.join()
+            elapsed = time.perf_counter() - t0
+            found = collect(mode, Path(d))
+        dupes = len(found) - len(set(found))
+        lost = expected - len(set(found))
+        totals = {}
+        for s in stats:
+            for k, v in (s or {}).items():
+                totals[k] = totals.get(k, 0) + v
+        ok = lost == 0 and dupes == 0
+        failed |= not ok and mode != "naive"
+        print(f"  {mode:<10} {len(set(found)):>6}/{expected} guardados  perdidos {lost:>5}  duplicados {dupes:>3}  "
+              f"{expected / elapsed:>8,.0f} ops/s  {json.dumps(totals) if totals else ''}")
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""
+Suite de benchmarks de los caminos calientes, reproducible y sin red.
+
+Cada caso prepara datos sintéticos en un directorio temporal (benchmarks/fixtures.py)
+y se mide con varias rondas hasta --min-time: mediana, media, p95, min y ops/s.
+Los resultados se guardan en JSON para compararlos entre versiones:
+
+    python -m benchmarks.suite run [--quick] [-k registry] [--out bench.json]
+    python -m benchmarks.suite compare base.json nuevo.json [--threshold 0.15]
+    python -m benchmarks.suite list
+
+'compare' marca como regresión todo caso cuya mediana (o --stat) empeore más que
+el umbral y termina con código 1 si hay alguna (útil en CI).
+
+Casos (parámetro entre corchetes):
+- registry.run_agent[agentes], registry.create_agent[agentes]
+- memory.client_search[notas], memory.search_notes[notas]
+- summarizer.top_bullets[snippets]
+- websearch.smart_query[tipo]     (DDGS reemplazado por FakeDDGS)
+- audio.transcode[segundos]       (WAV local -> PCM 16 kHz mono)
+- webhook.whatsapp[mensajes]      (cliente de prueba de Flask + pipeline)
+"""
+
+import argparse
+import fnmatch
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from benchmarks import fixtures
+
+# nombre -> (parámetros, parámetros en --quick, setup(param, dir) -> fn o (fn, items por llamada))
+CASES: Dict[str, Tuple[tuple, tuple, Callable]] = {}
+
+
+def case(name: str, params: tuple, quick: Optional[tuple] = None):
+    def deco(setup: Callable) -> Callable:
+        CASES[name] = (params, quick or params[:1], setup)
+        return setup
+    return deco
+
+
+# ---- casos ----
+
+@case("registry.run_agent", (100, 1000, 10000), (100, 1000))
+def _run_agent(n: int, d: Path):
+    from agents import router
+    fixtures.isolate(d)
+    ids = fixtures.build_registry(d / "registry.json", n, n * 10)
+    hot = ids[:100]
+    i = iter(range(10 ** 9))
+    return lambda: router.run_agent(hot[next(i) % len(hot)], "tarea de prueba")
+
+
+@case("registry.create_agent", (100, 1000, 10000), (100, 1000))
+def _create_agent(n: int, d: Path):
+    from agents import router
+    fixtures.isolate(d)
+    fixtures.build_registry(d / "registry.json", n)
+    return lambda: router.create_agent("Nuevo", "sintético", "base")
+
+
+@case("memory.client_search", (1000, 10000, 100000), (1000, 10000))
+def _client_search(n: int, d: Path):
+    from services.memory import MemoryClient
+    from services.note_store import default_store
+    fixtures.isolate(d)
+    fixtures.fill_notes(default_store(), n)
+    client = MemoryClient()
+    words = iter(fixtures.WORDS * 10 ** 6)
+    return lambda: client.search(next(words), limit=20)
+
+
+@case("memory.search_notes", (1000, 10000, 100000), (1000, 10000))
+def _search_notes(n: int, d: Path):
+    from modules.memory_module import search_notes
+    from services.note_store import default_store
+    fixtures.isolate(d)
+    fixtures.fill_notes(default_store(), n)
+    words = iter(fixtures.WORDS * 10 ** 6)
+    return lambda: search_notes(next(words), limit=20)
+
+
+@case("summarizer.top_bullets", (10, 100, 1000), (10, 100))
+def _top_bullets(n: int, d: Path):
+    from modules.web_search_module import _top_bullets
+    data = fixtures.snippets(n)
+    return lambda: _top_bullets(data, max_items=5)
+
+
+@case("websearch.smart_query", ("texto", "imagenes", "clima"), ("texto",))
+def _smart_query(kind: str, d: Path):
+    fixtures.stub_ddgs()
+    from modules import web_search_module as ws
+    text = {"texto": "qué es {}", "imagenes": "imagenes de {}", "clima": "clima en {}"}[kind]
+    i = iter(range(10 ** 9))
+    # consultas distintas: mide el ruteo + motor + resumen, no la caché
+    return lambda: ws.handle_smart_query(text.format(f"tema{next(i)}"))
+
+
+@case("audio.transcode", (5, 30), (5,))
+def _transcode(seconds: int, d: Path):
+    import io
+    from services.audio import _to_pcm16k
+    data = fixtures.tone_wav(seconds)
+    return lambda: _to_pcm16k(io.BytesIO(data), "wav")
+
+
+@case("webhook.whatsapp", (200, 1000), (200,))
+def _webhook(n: int, d: Path):
+    fixtures.isolate(d)
+    import app as web
+    web.pipeline.send = lambda text, to: None
+    client = web.app.test_client()
+    batch = iter(range(10 ** 9))
+
+    def run():
+        b = next(batch)
+        for i in range(n):
+            sender = f"whatsapp:+34{i % 50:09d}"
+            body = f"recordar: idea {b}-{i}" if i % 2 else f"buscar en memoria: idea {b}"
+            client.post("/whatsapp", data={"From": sender, "Body": body, "MessageSid": f"SM{b}-{i}"})
+        web.pipeline.pool.join()
+
+    return run, n
+
+
+# ---- medición ----
+
+def measure(fn: Callable, min_time: float, max_rounds: int, warmup: int) -> List[float]:
+    for _ in range(warmup):
+        fn()
+    times: List[float] = []
+    deadline = time.perf_counter() + min_time
+    while len(times) < max_rounds and (len(times) < 5 or time.perf_counter() < deadline):
+        t = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t)
+    return times
+
+
+def summarize(times: List[float], items: int) -> Dict[str, Any]:
+    ordered = sorted(times)
+    median = statistics.median(ordered)
+    return {
+        "rounds": len(times),
+        "items": items,
+        "min_ms": round(ordered[0] * 1000, 4),
+        "median_ms": round(median * 1000, 4),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 4),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))] * 1000, 4),
+        "ops_per_s": round(items / median, 2) if median else 0.0,
+    }
+
+
+def _git_rev() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=Path(__file__).resolve().parent.parent, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run(args) -> int:
+    results: Dict[str, Any] = {}
+    selected = [(name, p) for name, (params, quick, _) in CASES.items()
+                for p in (quick if args.quick else params)
+                if not args.k or any(fnmatch.fnmatch(name, f"*{k}*") for k in args.k)]
+    for name, param in selected:
+        key = f"{name}[{param}]"
+        setup = CASES[name][2]
+        with tempfile.TemporaryDirectory() as d:
+            try:
+                made = setup(param, Path(d))
+            except Exception as e:  # p. ej. sin pydub: el resto de la suite sigue
+                print(f"{key:<40} omitido: {type(e).__name__}: {e}")
+                continue
+            fn, items = made if isinstance(made, tuple) else (made, 1)
+            times = measure(fn, args.min_time, args.max_rounds, args.warmup)
+        results[key] = summarize(times, items)
+        r = results[key]
+        per = f"{r['median_ms'] / items * 1000:.1f} us/item" if items > 1 else ""
+        print(f"{key:<40} mediana {r['median_ms']:>10.3f} ms  p95 {r['p95_ms']:>10.3f} ms  "
+              f"{r['ops_per_s']:>12,.1f} ops/s  {per}")
+    out = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git": _git_rev(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "quick": args.quick,
+        },
+        "results": results,
+    }
+    Path(args.out).write_text(json.dumps(out, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"Resultados en {args.out}")
+    return 0
+
+
+def compare(args) -> int:
+    base = json.loads(Path(args.base).read_text(encoding="utf-8"))["results"]
+    new = json.loads(Path(args.new).read_text(encoding="utf-8"))["results"]
+    regressions = 0
+    print(f"{'caso':<40} {'base ms':>11} {'nuevo ms':>11} {'cambio':>9}   ({args.stat})")
+    for key in sorted(set(base) | set(new)):
+        if key not in base or key not in new:
+            print(f"{key:<40} {'(solo en ' + ('base' if key in base else 'nuevo') + ')':>33}")
+            continue
+        b, n = base[key][f"{args.stat}_ms"], new[key][f"{args.stat}_ms"]
+        change = (n - b) / b if b else 0.0
+        flag = ""
+        if change > args.threshold:
+            flag = "  REGRESIÓN"
+            regressions += 1
+        elif change < -args.threshold:
+            flag = "  mejora"
+        print(f"{key:<40} {b:>11.3f} {n:>11.3f} {change:>+8.1%}{flag}")
+    print(f"{regressions} regresiones (umbral {args.threshold:.0%})")
+    return 1 if regressions else 0
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Suite de benchmarks de Jarvis-BOT")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    r = sub.add_parser("run", help="corre los casos y guarda JSON")
+    r.add_argument("--quick", action="store_true", help="tamaños chicos (segundos en vez de minutos)")
+    r.add_argument("-k", action="append", help="solo casos cuyo nombre contenga esto (repetible)")
+    r.add_argument("--out", default="bench.json")
+    r.add_argument("--min-time", type=float, default=1.0, help="segundos mínimos por caso")
+    r.add_argument("--max-rounds", type=int, default=1000)
+    r.add_argument("--warmup", type=int, default=2)
+    c = sub.add_parser("compare", help="compara dos resultados y marca regresiones")
+    c.add_argument("base")
+    c.add_argument("new")
+    c.add_argument("--threshold", type=float, default=0.15, help="empeoramiento relativo tolerado")
+    c.add_argument("--stat", choices=("median", "min", "mean", "p95"), default="median",
+                   help="estadístico a comparar ('min' es el más estable en máquinas ruidosas)")
+    sub.add_parser("list", help="lista los casos")
+    args = ap.parse_args()
+    if args.cmd == "run":
+        return run(args)
+    if args.cmd == "compare":
+        return compare(args)
+    for name, (params, quick, _) in CASES.items():
+        print(f"{name:<28} {list(params)}  (--quick: {list(quick)})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
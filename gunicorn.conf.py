@@ -0,0 +1,30 @@
+"""
+Configuración de gunicorn (Procfile: gunicorn -c gunicorn.conf.py app:app).
+
+GUNICORN_PRELOAD=1 carga la app y los subsistemas pesados (app.warm_up) en el
+master antes del fork: arranque de workers casi instantáneo y memoria
+compartida por copy-on-write. Sin preload cada worker importa lo suyo y lo
+pesado se carga recién con el primer mensaje que lo necesita.
+
+Cada worker arranca además el planificador de resúmenes diarios; solo uno
+(el que toma el lock de líder) ejecuta las tareas (modules/automation_module.py).
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', 5000)}"
+workers = int(os.getenv("WEB_CONCURRENCY", 1))
+preload_app = os.getenv("GUNICORN_PRELOAD", "0") == "1"
+
+
+def when_ready(server):
+    # corre en el master, antes de crear los workers
+    if preload_app:
+        from app import warm_up
+        warm_up()
+
+
+def post_worker_init(worker):
+    # después del fork: el thread del planificador es de este worker
+    from modules.automation_module import iniciar_en_web
+    iniciar_en_web()
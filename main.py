@@ -1,5 +1,4 @@
 from agents.router import create_agent, list_agents, run_agent
-from services.audio import audio_to_text
 
 if __name__ == "__main__":
     print("🤖 Jarvis BOT listo.")
@@ -10,13 +9,11 @@ if __name__ == "__main__":
         if cmd == "crear":
             name = input("Nombre del agente: ")
             desc = input("Descripción: ")
-            agent = create_agent(name, desc, agent_type="memory")
-            print(f"Agente creado: {agent.name}")
+            agent_id = create_agent(name, desc, agent_type="memory")
+            print(f"Agente creado: {name} (ID: {agent_id})")
 
         elif cmd == "listar":
-            agents = list_agents()
-            for k, v in agents.items():
-                print(f"[{k}] {v['name']} - {v['description']}")
+            print(list_agents())
 
         elif cmd == "run":
             agent_id = input("ID del agente: ")
@@ -25,6 +22,7 @@ if __name__ == "__main__":
 
         elif cmd == "audio":
             path = input("Ruta del archivo de audio: ")
+            from services.audio import audio_to_text  # pydub/STT solo si se usa
             print("Texto detectado:", audio_to_text(path))
 
         elif cmd == "salir":
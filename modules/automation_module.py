@@ -1,22 +1,92 @@
-import schedule
-import time
+"""
+automation_module.py
+Resumen diario de ideas por WhatsApp, con el planificador de services/scheduler.py.
+
+- Cada usuario programa su hora y zona horaria ('resumen diario: 20:00 | Europe/Madrid').
+- El resumen es incremental: solo las notas desde el último envío (índice por fecha).
+- Se entrega con el sender saliente (services/outbound.py).
+
+El planificador corre dentro de la web (gunicorn.conf.py -> iniciar_en_web):
+ahí están las tareas que agrega 'resumen diario:' y las notas de cada
+remitente, y en Heroku otro dyno no las vería. Uno solo de los workers
+ejecuta las tareas (ver Scheduler.run_as_leader). SCHEDULER_IN_WEB=0 lo
+desactiva, para correrlo aparte en la misma máquina:
+    python -m modules.automation_module
+"""
+
+import os
+from datetime import datetime, timezone
+from typing import Optional
+
 from modules.memory_module import consultar_ideas
+from services.context import sender_context
+from services.scheduler import DEFAULT_TZ, default_scheduler
+
+# destinatario del resumen global de antes (20:00), si se configura
+RESUMEN_TO = os.getenv("RESUMEN_TO")
+
 
-def resumen_texto():
-    ideas = consultar_ideas()
+def _iso_utc(ts: float) -> str:
+    # las notas guardan la fecha como ISO UTC sin zona
+    return datetime.fromtimestamp(ts, timezone.utc).replace(tzinfo=None).isoformat()
+
+
+def resumen_texto(since: Optional[str] = None) -> Optional[str]:
+    """Resumen de las ideas desde 'since' (ISO UTC); todas si es None. None si no hay."""
+    ideas = consultar_ideas(since=since)
     if not ideas:
-        return "No tienes ideas registradas aún."
-    out = ["Resumen de tus últimas ideas:"]
+        return None
+    titulo = "Resumen de tus ideas nuevas:" if since else "Resumen de tus últimas ideas:"
+    out = [titulo]
     for _, texto, fecha in ideas:
         out.append(f"- {texto} ({fecha})")
     return "\n".join(out)
 
-def enviar_resumen():
-    # Por ahora imprime; si quieres, puedes integrarlo a WhatsApp con Twilio REST.
-    print(resumen_texto())
+
+def _send(text: str, to: str) -> None:
+    from modules.whatsapp_module import send_whatsapp_reply
+    send_whatsapp_reply(text, to)
+
+
+def enviar_resumen(job, now: float, send=_send) -> None:
+    """Handler del planificador: ideas desde la última ejecución correcta."""
+    since = _iso_utc(job.last_run if job.last_run is not None else job.created)
+    with sender_context(job.user):
+        texto = resumen_texto(since)
+    if texto:
+        send(texto, job.user)
+
+
+def programar_resumen(user: str, hora: str = "20:00", tz: Optional[str] = None):
+    """'HH:MM' en la zona 'tz' (IANA, p. ej. 'America/Bogota'). Reemplaza el anterior."""
+    hh, mm = (int(x) for x in hora.strip().split(":", 1))
+    if not (0 <= hh < 24 and 0 <= mm < 60):
+        raise ValueError("hora fuera de rango")
+    return default_scheduler().add_daily(user, hh, mm, tz or DEFAULT_TZ, kind="resumen")
+
+
+def cancelar_resumen(user: str) -> bool:
+    return default_scheduler().remove(f"resumen:{user}")
+
+
+def _preparar():
+    sched = default_scheduler()
+    sched.register("resumen", enviar_resumen)
+    if RESUMEN_TO and sched.get(f"resumen:{RESUMEN_TO}") is None:
+        programar_resumen(RESUMEN_TO, "20:00")
+    return sched
+
+
+def iniciar_en_web():
+    """En cada worker de la web (después del fork): el loop lo corre el que gane el lock."""
+    if os.getenv("SCHEDULER_IN_WEB", "1") == "0":
+        return None
+    return _preparar().start(leader=True)
+
 
 def iniciar_automatizacion():
-    schedule.every().day.at("20:00").do(enviar_resumen)
-    while True:
-        schedule.run_pending()
-        time.sleep(60)
+    _preparar().run_as_leader()
+
+
+if __name__ == "__main__":
+    iniciar_automatizacion()
@@ -1,48 +1,32 @@
 """
 memory_module.py
-Módulo simple de memoria basado en archivo JSON.
+Módulo simple de memoria (notas con fecha y tags).
 
 Funciones principales:
-- init_store()              -> garantiza que el archivo existe
+- init_store()              -> garantiza que el almacén existe
 - save_note(text, tags=[])  -> guarda una nota
 - list_notes(limit=None)    -> lista notas (opcionalmente limitado)
-- search_notes(keyword)     -> busca por palabra clave (texto/tags)
+- search_notes(keyword)     -> busca por palabra clave (texto/tags), con ranking BM25
 - delete_note(index)        -> borra por índice (lista visible)
 - clear_notes()             -> borra todas las notas (¡cuidado!)
+- consultar_ideas(since)    -> (id, texto, fecha) para resúmenes
+- pretty_list / pretty_search -> una página de texto para WhatsApp (services/paging.py)
 
-El archivo de almacenamiento por defecto es 'memory_store.json'
-en la misma carpeta de este módulo. Puedes cambiar MEMORY_PATH.
+Las notas viven en services/note_store.py (SQLite), el mismo almacén que usa
+services.memory.MemoryClient: el shard del remitente en curso (services/shards.py)
+o, sin remitente, el único. El antiguo 'memory_store.json' de esta carpeta se
+importa automáticamente la primera vez.
 """
 
-import json
-from pathlib import Path
-from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import Iterator, List, Dict, Any, Optional, Tuple
 
-# === Config ===
-# Archivo donde se guardan las notas
-MEMORY_PATH = Path(__file__).parent / "memory_store.json"
+from services import paging
+from services.note_store import current_store
 
 
 def init_store() -> None:
-    """Crea el archivo JSON si no existe."""
-    if not MEMORY_PATH.exists():
-        data = {
-            "created_at": datetime.utcnow().isoformat(),
-            "notes": []
-        }
-        MEMORY_PATH.write_text(json.dumps(data, indent=2, ensure_ascii=False))
-
-
-def _load() -> Dict[str, Any]:
-    """Carga el JSON de memoria."""
-    init_store()
-    return json.loads(MEMORY_PATH.read_text())
-
-
-def _save(data: Dict[str, Any]) -> None:
-    """Guarda el JSON de memoria."""
-    MEMORY_PATH.write_text(json.dumps(data, indent=2, ensure_ascii=False))
+    """Crea el almacén si no existe."""
+    current_store().ensure()
 
 
 def save_note(text: str, tags: Optional[List[str]] = None) -> Dict[str, Any]:
@@ -51,15 +35,7 @@ def save_note(text: str, tags: Optional[List[str]] = None) -> Dict[str, Any]:
     Retorna la nota guardada.
     """
     tags = tags or []
-    data = _load()
-    note = {
-        "timestamp": datetime.utcnow().isoformat(),
-        "text": text.strip(),
-        "tags": [t.strip().lower() for t in tags if t.strip()]
-    }
-    data["notes"].append(note)
-    _save(data)
-    return note
+    return current_store().add(text.strip(), [t.strip().lower() for t in tags if t.strip()], source="modules")
 
 
 def list_notes(limit: Optional[int] = None) -> List[Dict[str, Any]]:
@@ -67,30 +43,18 @@ def list_notes(limit: Optional[int] = None) -> List[Dict[str, Any]]:
     Lista notas en orden de inserción (las más antiguas primero).
     Si limit está definido, corta la lista a ese número.
     """
-    data = _load()
-    notes = data.get("notes", [])
-    if limit is not None:
-        notes = notes[:limit]
-    return notes
+    return current_store().list_notes(limit=limit)
 
 
-def search_notes(keyword: str) -> List[Dict[str, Any]]:
+def search_notes(keyword: str, limit: Optional[int] = None, mode: str = "index") -> List[Dict[str, Any]]:
     """
     Busca keyword en el texto o en los tags de las notas (case-insensitive).
     Retorna lista de notas coincidentes.
+
+    mode="index"     -> índice de texto completo por palabras, ordenado por BM25
+    mode="substring" -> comportamiento original: substring, orden de inserción
     """
-    k = (keyword or "").strip().lower()
-    if not k:
-        return []
-    data = _load()
-    results = []
-    for note in data.get("notes", []):
-        text_hit = k in note.get("text", "").lower()
-        tags = note.get("tags", [])
-        tag_hit = any(k in t for t in tags)
-        if text_hit or tag_hit:
-            results.append(note)
-    return results
+    return current_store().search(keyword, limit, mode)
 
 
 def delete_note(index: int) -> bool:
@@ -98,52 +62,77 @@ def delete_note(index: int) -> bool:
     Borra una nota por índice de la lista (usa list_notes() para ver orden/índices).
     Retorna True si borró, False si el índice no existe.
     """
-    data = _load()
-    notes = data.get("notes", [])
-    if 0 <= index < len(notes):
-        notes.pop(index)
-        data["notes"] = notes
-        _save(data)
-        return True
-    return False
+    return current_store().delete_at(index)
 
 
 def clear_notes() -> None:
     """BORRA TODAS LAS NOTAS. Úsalo con cuidado."""
-    data = _load()
-    data["notes"] = []
-    _save(data)
+    current_store().clear()
+
+
+def consultar_ideas(since: Optional[str] = None, limit: Optional[int] = None) -> List[Tuple[int, str, str]]:
+    """
+    Notas como (id, texto, fecha), opcionalmente solo las desde 'since'
+    (timestamp ISO); usa el índice por fecha.
+    """
+    return [(n["id"], n["text"], n["timestamp"]) for n in current_store().list_notes(limit=limit, since=since)]
 
 
 # ---- Helpers de presentación (opcional) ----
 
-def pretty_list(limit: Optional[int] = None) -> str:
+def _note_line(n: Dict[str, Any]) -> str:
+    tags = ", ".join(n.get("tags", [])) if n.get("tags") else "-"
+    return f"[{n.get('timestamp', '')}] {n.get('text', '')}  (tags: {tags})"
+
+
+def iter_note_lines(cursor: Optional[list] = None, limit: Optional[int] = None) -> Iterator[Tuple[str, list]]:
+    """
+    Líneas del listado con su índice (el de delete_note), leídas por tandas con
+    keyset (id > último): cursor = [último id, índice siguiente].
+    """
+    store = current_store()
+    after, pos = cursor if cursor is not None else (None, 0)
+    batch = paging.PAGE_ITEMS + 1
+    while limit is None or pos < limit:
+        notes = store.list_notes(limit=batch, after_id=after)
+        for n in notes:
+            if limit is not None and pos >= limit:
+                return
+            after = n["id"]
+            yield f"{pos}. {_note_line(n)}", [after, pos + 1]
+            pos += 1
+        if len(notes) < batch:
+            return
+
+
+def iter_search_lines(cursor: Optional[int], keyword: str) -> Iterator[Tuple[str, int]]:
+    """Resultados por ranking, de a tandas (cursor = cantidad ya mostrada)."""
+    pos = cursor or 0
+    batch = paging.PAGE_ITEMS + 1
+    while True:
+        results = current_store().search(keyword, limit=batch, offset=pos)
+        for n in results:
+            pos += 1
+            yield f"- {_note_line(n)}", pos
+        if len(results) < batch:
+            return
+
+
+paging.register_pager("notas", iter_note_lines, "No hay notas.")
+paging.register_pager("busqueda", iter_search_lines, lambda kw: f"Sin coincidencias para: {kw}",
+                      header=lambda kw: f"Resultados para '{kw}':")
+
+
+def pretty_list(limit: Optional[int] = None, page: int = 1) -> str:
     """
-    Representación legible de las notas (para enviar por WhatsApp).
+    Representación legible de las notas (para enviar por WhatsApp), de a una
+    página; «más» sigue con la siguiente.
     """
-    notes = list_notes(limit=limit)
-    if not notes:
-        return "No hay notas."
-    lines = []
-    for i, n in enumerate(notes):
-        ts = n.get("timestamp", "")
-        text = n.get("text", "")
-        tags = ", ".join(n.get("tags", [])) if n.get("tags") else "-"
-        lines.append(f"{i}. [{ts}] {text}  (tags: {tags})")
-    return "\n".join(lines)
+    return paging.show("notas", limit, page=page)
 
 
-def pretty_search(keyword: str) -> str:
+def pretty_search(keyword: str, page: int = 1) -> str:
     """
-    Representación legible de resultados de búsqueda.
+    Representación legible de resultados de búsqueda, de a una página.
     """
-    results = search_notes(keyword)
-    if not results:
-        return f"Sin coincidencias para: {keyword}"
-    lines = [f"Resultados para '{keyword}':"]
-    for i, n in enumerate(results):
-        ts = n.get("timestamp", "")
-        text = n.get("text", "")
-        tags = ", ".join(n.get("tags", [])) if n.get("tags") else "-"
-        lines.append(f"- [{ts}] {text}  (tags: {tags})")
-    return "\n".join(lines)
+    return paging.show("busqueda", keyword, page=page)
@@ -1,84 +1,140 @@
 from __future__ import annotations
+import math
+import os
 import re
-from typing import List, Tuple
-from duckduckgo_search import DDGS
+from typing import Dict, List, Optional
+from services.cache import TTLCache
+from services.metrics import timed
+from services.search_engine import SearchEngine
+
+REGION = "es-es"
+# resultados de texto por búsqueda cuando no se indica otra profundidad
+SEARCH_RESULTS = 10
+
+# -------- caché de respuestas --------
+# TTL (segundos) por tipo de consulta: hora/clima cambian rápido
+CACHE_TTLS = {
+    "hora": 60,
+    "clima": 15 * 60,
+    "images": 6 * 3600,
+    "text": 3600,
+}
+_cache = TTLCache(
+    maxsize=int(os.getenv("SEARCH_CACHE_SIZE", 512)),
+    path=os.getenv("SEARCH_CACHE_PATH") or None,
+)
+
+def _cache_key(kind: str, query: str, max_results: int) -> str:
+    # la profundidad va en la clave: una respuesta de nivel bajo no se sirve a uno alto
+    return f"{kind}|{REGION}|{max_results}|{_clean(query).lower()}"
+
+def cache_stats() -> dict:
+    return _cache.stats()
 
 # -------- utilidades --------
 def _clean(s: str) -> str:
     return re.sub(r"\s+", " ", (s or "")).strip()
 
-def _sentences(text: str) -> List[str]:
-    parts = re.split(r"(?<=[.!?])\s+", _clean(text))
-    return [p for p in parts if 30 <= len(p) <= 220]
-
 def _top_bullets(snippets: List[str], max_items: int = 5) -> List[str]:
-    text = " ".join(_clean(s) for s in snippets if s)
-    if not text:
-        return []
-    sents = _sentences(text)
-    # scoring ligero por frecuencia
-    words = re.findall(r"[a-záéíóúüñ0-9]{3,}", text.lower())
-    freq = {}
-    for w in words:
-        freq[w] = freq.get(w, 0) + 1
-    def score(sent: str) -> float:
-        toks = re.findall(r"[a-záéíóúüñ0-9]{3,}", sent.lower())
-        return sum(freq.get(t, 0) for t in toks) / max(1, len(toks))
-    ranked = sorted(sents, key=score, reverse=True)
-    out, seen = [], set()
-    for s in ranked:
-        key = s.lower()[:60]
-        if key in seen: 
-            continue
-        seen.add(key)
-        out.append(s)
-        if len(out) >= max_items:
-            break
-    return out
+    # resumen extractivo TF-IDF + centralidad, sin casi-duplicados
+    from services.summarizer import summarize  # numpy se carga con la primera búsqueda
+    return summarize(snippets, max_items=max_items)
 
 def _host(url: str) -> str:
     return re.sub(r"^www\.", "", re.sub(r"^https?://", "", url)).split("/")[0]
 
 # -------- searchers --------
-def _ddg_text(query: str, max_results: int = 10) -> List[Tuple[str, str, str]]:
+# Cada backend devuelve hits como dict con "url" (texto: también "title" y "body").
+# Los errores se propagan: el motor los cuenta por backend.
+# 'timeout': segundos hasta el deadline del motor (DDGS los quiere enteros).
+def _ddgs(timeout: Optional[float]):
+    from duckduckgo_search import DDGS
+    return DDGS(timeout=max(1, math.ceil(timeout)) if timeout else 10)
+
+@timed("search.ddg_text")
+def _ddg_text(query: str, max_results: int = 10, timeout: Optional[float] = None) -> List[Dict[str, str]]:
+    q = _clean(query)
+    out: List[Dict[str, str]] = []
+    with _ddgs(timeout) as ddgs:
+        for r in ddgs.text(q, max_results=max_results, region=REGION, safesearch="moderate"):
+            title = r.get("title") or ""
+            href  = r.get("href") or r.get("url") or ""
+            body  = r.get("body") or ""
+            if href and (title or body):
+                out.append({"title": title, "url": href, "body": body})
+    return out
+
+@timed("search.ddg_news")
+def _ddg_news(query: str, max_results: int = 10, timeout: Optional[float] = None) -> List[Dict[str, str]]:
     q = _clean(query)
-    out: List[Tuple[str, str, str]] = []
-    try:
-        with DDGS() as ddgs:
-            for r in ddgs.text(q, max_results=max_results, region="es-es", safesearch="moderate"):
-                title = r.get("title") or ""
-                href  = r.get("href") or r.get("url") or ""
-                body  = r.get("body") or ""
-                if href and (title or body):
-                    out.append((title, href, body))
-    except Exception:
-        pass
+    out: List[Dict[str, str]] = []
+    with _ddgs(timeout) as ddgs:
+        for r in ddgs.news(q, max_results=max_results, region=REGION, safesearch="moderate"):
+            title = r.get("title") or ""
+            href  = r.get("url") or r.get("href") or ""
+            body  = r.get("body") or ""
+            if href and (title or body):
+                out.append({"title": title, "url": href, "body": body})
     return out
 
-def _ddg_images(query: str, max_results: int = 4) -> List[str]:
+@timed("search.ddg_images")
+def _ddg_images(query: str, max_results: int = 4, timeout: Optional[float] = None) -> List[Dict[str, str]]:
     q = _clean(query)
-    urls: List[str] = []
-    try:
-        with DDGS() as ddgs:
-            for r in ddgs.images(q, max_results=max_results, region="es-es", safesearch="moderate"):
-                u = r.get("image") or r.get("thumbnail") or r.get("url")
-                if u:
-                    urls.append(u)
-    except Exception:
-        pass
-    return urls
+    out: List[Dict[str, str]] = []
+    with _ddgs(timeout) as ddgs:
+        for r in ddgs.images(q, max_results=max_results, region=REGION, safesearch="moderate"):
+            u = r.get("image") or r.get("thumbnail") or r.get("url")
+            if u:
+                out.append({"url": u})
+    return out
+
+def _url_key(hit: Dict[str, str]) -> str:
+    url = hit["url"]
+    path = re.sub(r"^https?://[^/]*", "", url).split("#")[0].rstrip("/")
+    return _host(url).lower() + path
+
+# Motor: todos los backends de un tipo corren en paralelo, con deadline por petición.
+# Las preguntas generales consultan web y noticias a la vez (SEARCH_NEWS=0 lo apaga).
+engine = SearchEngine(deadline=float(os.getenv("SEARCH_DEADLINE", 4.0)), dedupe_key=_url_key)
+engine.register("ddg_text", _ddg_text, kind="text")
+if os.getenv("SEARCH_NEWS", "1").lower() not in ("0", "false", "no"):
+    engine.register("ddg_news", _ddg_news, kind="text")
+engine.register("ddg_images", _ddg_images, kind="images")
+
+def register_backend(name: str, fn, kind: str = "text") -> None:
+    """Agrega un backend extra: fn(query, max_results, timeout) -> [{"url", "title", "body"}]."""
+    engine.register(name, fn, kind)
+
+def search_stats() -> dict:
+    return engine.stats()
 
 # -------- respuestas --------
 def web_images_answer(topic: str) -> str:
-    urls = _ddg_images(topic or "imagen", 4)
+    topic = topic or "imagen"
+    answer = _cache.get_or_compute(_cache_key("images", topic, 4), CACHE_TTLS["images"],
+                                   lambda: _images_answer(topic))
+    return answer or "No pude encontrar imágenes ahora mismo."
+
+def _images_answer(topic: str) -> Optional[str]:
+    urls = [h["url"] for h in engine.search(topic, kinds=("images",), max_results=4)["images"][:4]]
     if not urls:
-        return "No pude encontrar imágenes ahora mismo."
+        return None
     return "🖼️ Imágenes:\n" + "\n".join(f"• {u}" for u in urls)
 
-def web_answer(query: str) -> str:
-    hits = _ddg_text(query, 10)
+def web_answer(query: str, kind: str = "text", max_results: int = SEARCH_RESULTS) -> str:
+    """
+    Respuesta resumida; se cachea por (tipo, región, profundidad, consulta normalizada).
+    max_results: profundidad de búsqueda (la baja el nivel del presupuesto, ver services/llm.py).
+    """
+    answer = _cache.get_or_compute(_cache_key(kind, query, max_results), CACHE_TTLS.get(kind, CACHE_TTLS["text"]),
+                                   lambda: _web_answer(query, max_results))
+    return answer or "No encontré resultados claros ahora mismo."
+
+def _web_answer(query: str, max_results: int = SEARCH_RESULTS) -> Optional[str]:
+    found = engine.search(query, kinds=("text",), max_results=max_results)["text"]
+    hits = [(h.get("title", ""), h["url"], h.get("body", "")) for h in found]
     if not hits:
-        return "No encontré resultados claros ahora mismo."
+        return None
 
     snippets = [h[2] for h in hits if h[2]]
     bullets = _top_bullets(snippets, max_items=5)
@@ -98,7 +154,7 @@ def web_answer(query: str) -> str:
     tail = "\n".join(fuentes) if fuentes else ""
     return "\n".join([header, body, tail]).strip()
 
-def handle_smart_query(text: str) -> str:
+def handle_smart_query(text: str, max_results: int = SEARCH_RESULTS) -> str:
     """Router simple: hora, clima, imágenes o pregunta general (todo vía web)."""
     t = _clean(text).lower()
 
@@ -106,13 +162,13 @@ def handle_smart_query(text: str) -> str:
     if "hora" in t:
         place = re.sub(r"\b(hora|actual|en|de|del|la|el)\b", " ", t).strip()
         q = f"current time in {place or 'my city'}"
-        return "⏰ " + web_answer(q)
+        return "⏰ " + web_answer(q, kind="hora", max_results=max_results)
 
     # Clima
     if any(k in t for k in ("clima", "tiempo", "temperatura", "pronóstico", "pronostico", "weather")):
         place = re.sub(r"\b(clima|tiempo|temperatura|pronóstico|pronostico|en|de|del|la|el|actual)\b", " ", t).strip()
         q = f"current weather in {place or 'my city'}"
-        return "🌦️ " + web_answer(q)
+        return "🌦️ " + web_answer(q, kind="clima", max_results=max_results)
 
     # Imágenes (si llegara aquí)
     if any(k in t for k in ("imagen", "imagenes", "imágenes", "foto", "fotos", "image", "picture")):
@@ -120,4 +176,4 @@ def handle_smart_query(text: str) -> str:
         return web_images_answer(topic or text)
 
     # General
-    return web_answer(text)
+    return web_answer(text, max_results=max_results)
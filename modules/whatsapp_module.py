@@ -1,18 +1,11 @@
-import os
-from twilio.rest import Client
-
-_account_sid = os.getenv("TWILIO_ACCOUNT_SID")
-_auth_token = os.getenv("TWILIO_AUTH_TOKEN")
-_from = os.getenv("TWILIO_WHATSAPP_FROM")
-
-_client = Client(_account_sid, _auth_token)
+from services.outbound import default_sender
 
 def send_whatsapp_reply(message: str, to_number: str):
     """
     to_number llega como 'whatsapp:+<pais><numero>' desde Twilio.
+    El envío va en segundo plano (services/outbound.py); si la cola está llena
+    se envía en este mismo thread para no perder la respuesta.
     """
-    _client.messages.create(
-        body=message,
-        from_=_from,
-        to=to_number
-    )
+    sender = default_sender()
+    if not sender.send(message, to_number):
+        sender.send_now(message, to_number)
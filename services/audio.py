@@ -1,41 +1,258 @@
+from __future__ import annotations
+
+import json
+import logging
+import multiprocessing
 import os
 import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import TYPE_CHECKING, Dict, List, Optional
 import requests
-from twilio.http.http_client import TwilioHttpClient
-from pydub import AudioSegment
-import speech_recognition as sr
+from requests.adapters import HTTPAdapter
+from services.metrics import timed
+
+# pydub y speech_recognition se importan al usarlos (arranque más rápido)
+if TYPE_CHECKING:
+    from pydub import AudioSegment
+
+log = logging.getLogger(__name__)
 
 # Descarga media de Twilio con auth básica
 _TWILIO_SID = os.getenv("TWILIO_ACCOUNT_SID")
 _TWILIO_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
 
-def _download_media_to_wav(media_url: str) -> str:
-    # Twilio media puede venir como .ogg - convertimos a .wav para SpeechRecognition
-    with requests.get(media_url, auth=( _TWILIO_SID, _TWILIO_TOKEN ), stream=True) as r:
-        r.raise_for_status()
-        with tempfile.NamedTemporaryFile(suffix=".bin", delete=False) as tmp_in:
-            for chunk in r.iter_content(chunk_size=8192):
-                tmp_in.write(chunk)
-            in_path = tmp_in.name
-
-    # Detecta por contenido; pydub lee automáticamente
-    audio = AudioSegment.from_file(in_path)
-    out_fd = tempfile.NamedTemporaryFile(suffix=".wav", delete=False)
-    out_path = out_fd.name
-    out_fd.close()
-    audio.export(out_path, format="wav")
-    return out_path
+# Formato que esperan los reconocedores: PCM 16 bits, mono, 16 kHz
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2
+# Hasta este tamaño la descarga vive en memoria; por encima se vuelca a un temporal
+SPOOL_MAX_BYTES = int(os.getenv("AUDIO_SPOOL_MAX_BYTES", 8 * 1024 * 1024))
+
+# content-type de Twilio -> formato de pydub/ffmpeg
+_FORMATS = {
+    "audio/ogg": "ogg",
+    "audio/opus": "ogg",
+    "audio/mpeg": "mp3",
+    "audio/mp4": "mp4",
+    "audio/aac": "aac",
+    "audio/amr": "amr",
+    "audio/wav": "wav",
+    "audio/x-wav": "wav",
+    "audio/webm": "webm",
+}
+
+_session = None
+
+def _http() -> requests.Session:
+    """Sesión HTTP reutilizable (pool de conexiones keep-alive hacia Twilio)."""
+    global _session
+    if _session is None:
+        s = requests.Session()
+        s.auth = (_TWILIO_SID, _TWILIO_TOKEN)
+        s.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+        _session = s
+    return _session
+
+@timed("audio.download")
+def _download_media(media_url: str):
+    """
+    Descarga a un SpooledTemporaryFile: en memoria salvo que supere
+    SPOOL_MAX_BYTES. Devuelve (archivo posicionado al inicio, formato o None).
+    Quien lo recibe debe cerrarlo (se borra solo).
+    """
+    buf = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    try:
+        with _http().get(media_url, stream=True, timeout=30) as r:
+            r.raise_for_status()
+            ctype = (r.headers.get("Content-Type") or "").split(";")[0].strip().lower()
+            for chunk in r.iter_content(chunk_size=64 * 1024):
+                buf.write(chunk)
+    except BaseException:
+        buf.close()
+        raise
+    buf.seek(0)
+    return buf, _FORMATS.get(ctype)
+
+@timed("audio.transcode")
+def _to_pcm16k(src, fmt=None) -> AudioSegment:
+    """Decodifica (ffmpeg por pipe, sin archivos) y normaliza a 16 kHz mono 16 bits."""
+    from pydub import AudioSegment
+    return _normalize(AudioSegment.from_file(src, format=fmt))
+
+def _normalize(audio: AudioSegment) -> AudioSegment:
+    # lo que ya viene de _to_pcm16k pasa tal cual (sin otra copia de las muestras)
+    if (audio.frame_rate, audio.channels, audio.sample_width) == (SAMPLE_RATE, 1, SAMPLE_WIDTH):
+        return audio
+    return audio.set_frame_rate(SAMPLE_RATE).set_channels(1).set_sample_width(SAMPLE_WIDTH)
+
+# -------- reconocedores --------
+# Cada backend recibe PCM 16 bits mono y devuelve texto ("" si no entiende).
+
+class Recognizer:
+    name = "base"
+    # True: se reparte en procesos (CPU); False: en threads (red)
+    cpu_bound = False
+
+    def transcribe(self, pcm: bytes, sample_rate: int) -> str:
+        raise NotImplementedError("Implementar en subclase")
+
+class GoogleRecognizer(Recognizer):
+    name = "google"
+
+    def __init__(self, language: str = "es-ES"):
+        self.language = language
+
+    def transcribe(self, pcm: bytes, sample_rate: int) -> str:
+        import speech_recognition as sr
+        # AudioData directo desde el PCM, sin pasar por un .wav intermedio
+        data = sr.AudioData(pcm, sample_rate, SAMPLE_WIDTH)
+        try:
+            return sr.Recognizer().recognize_google(data, language=self.language)
+        except sr.UnknownValueError:
+            return ""
+
+class VoskRecognizer(Recognizer):
+    """Offline con Vosk (pip install vosk + modelo en VOSK_MODEL_PATH)."""
+    name = "vosk"
+    cpu_bound = True
+    _model = None
+
+    def transcribe(self, pcm: bytes, sample_rate: int) -> str:
+        import vosk
+        if VoskRecognizer._model is None:
+            VoskRecognizer._model = vosk.Model(os.getenv("VOSK_MODEL_PATH", "model"))
+        rec = vosk.KaldiRecognizer(VoskRecognizer._model, sample_rate)
+        rec.AcceptWaveform(pcm)
+        return json.loads(rec.FinalResult()).get("text", "")
+
+class StubRecognizer(Recognizer):
+    """Para tests/benchmarks: devuelve la duración del fragmento, sin red ni modelo."""
+    name = "stub"
+    cpu_bound = True
+
+    def transcribe(self, pcm: bytes, sample_rate: int) -> str:
+        return f"[{len(pcm) / (SAMPLE_WIDTH * sample_rate):.1f}s]"
+
+RECOGNIZERS = {cls.name: cls for cls in (GoogleRecognizer, VoskRecognizer, StubRecognizer)}
+
+def register_recognizer(cls) -> None:
+    RECOGNIZERS[cls.name] = cls
+
+_instances: Dict[str, Recognizer] = {}
+
+def get_recognizer(name: Optional[str] = None) -> Recognizer:
+    name = name or os.getenv("STT_BACKEND", "google")
+    if name not in _instances:
+        _instances[name] = RECOGNIZERS[name]()
+    return _instances[name]
+
+# -------- fragmentado y transcripción en paralelo --------
+# Fragmentos de hasta MAX_CHUNK_MS, cortados en silencios
+MAX_CHUNK_MS = int(os.getenv("STT_MAX_CHUNK_MS", 30000))
+MIN_SILENCE_MS = 400
+STT_WORKERS = int(os.getenv("STT_WORKERS", max(1, (os.cpu_count() or 2) - 1)))
+
+def split_on_silence_chunks(audio: AudioSegment, max_chunk_ms: int = MAX_CHUNK_MS) -> List[AudioSegment]:
+    if len(audio) <= max_chunk_ms:
+        return [audio]
+    from pydub.silence import detect_nonsilent
+    voiced = detect_nonsilent(audio, min_silence_len=MIN_SILENCE_MS,
+                              silence_thresh=audio.dBFS - 16, seek_step=10)
+    if not voiced:
+        return [audio]
+    # corta en la mitad de los silencios, agrupando tramos hasta max_chunk_ms
+    mids = [(end + nxt) // 2 for (_, end), (nxt, _) in zip(voiced, voiced[1:])]
+    cuts, last = [0], 0
+    for mid in mids + [len(audio)]:
+        if mid - cuts[-1] > max_chunk_ms and last > cuts[-1]:
+            cuts.append(last)
+        last = mid
+    cuts.append(len(audio))
+    chunks = []
+    for start, end in zip(cuts, cuts[1:]):
+        # tramos sin silencios más largos que el máximo: corte duro
+        for s in range(start, end, max_chunk_ms):
+            chunks.append(audio[s:min(end, s + max_chunk_ms)])
+    return chunks
+
+def _transcribe_chunk(backend: str, pcm: bytes, sample_rate: int) -> str:
+    # función de módulo para poder ejecutarla en otro proceso
+    return get_recognizer(backend).transcribe(pcm, sample_rate)
+
+_pools: Dict[bool, object] = {}
+_pools_lock = threading.Lock()
+
+def _pool(cpu_bound: bool):
+    with _pools_lock:
+        if cpu_bound not in _pools:
+            if cpu_bound:
+                # spawn: no hereda threads/locks del worker web
+                _pools[cpu_bound] = ProcessPoolExecutor(
+                    max_workers=STT_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+            else:
+                _pools[cpu_bound] = ThreadPoolExecutor(max_workers=STT_WORKERS, thread_name_prefix="stt")
+        return _pools[cpu_bound]
+
+def _process_pool_failed(exc: BaseException) -> None:
+    """Sin procesos (sandbox, límite de procesos, pool roto): threads desde ahora."""
+    log.warning("STT en procesos no disponible, se usan threads: %s", exc)
+    with _pools_lock:
+        broken = _pools.get(True)
+        _pools[True] = _pools.setdefault(False, ThreadPoolExecutor(max_workers=STT_WORKERS,
+                                                                  thread_name_prefix="stt"))
+    if isinstance(broken, ProcessPoolExecutor):
+        broken.shutdown(wait=False, cancel_futures=True)
+
+# factor de tiempo real por backend: segundos de proceso / segundos de audio
+_rtf: Dict[str, Dict[str, float]] = {}
+_rtf_lock = threading.Lock()
+
+def recognizer_stats() -> Dict[str, Dict[str, float]]:
+    with _rtf_lock:
+        return {
+            name: {**v, "rtf": round(v["processing_s"] / v["audio_s"], 4) if v["audio_s"] else 0.0}
+            for name, v in _rtf.items()
+        }
+
+@timed("audio.recognize")
+def transcribe_audio(audio: AudioSegment, backend: Optional[str] = None) -> str:
+    """Fragmenta en silencios, transcribe en paralelo y une en orden."""
+    rec = get_recognizer(backend)
+    audio = _normalize(audio)
+    start = time.monotonic()
+    chunks = split_on_silence_chunks(audio)
+    if len(chunks) == 1:
+        texts = [rec.transcribe(audio.raw_data, SAMPLE_RATE)]
+    else:
+        jobs = [(_transcribe_chunk, rec.name, c.raw_data, SAMPLE_RATE) for c in chunks]
+        try:
+            texts = [f.result() for f in [_pool(rec.cpu_bound).submit(*j) for j in jobs]]
+        except (BrokenProcessPool, OSError) as e:
+            if not rec.cpu_bound:
+                raise
+            _process_pool_failed(e)
+            texts = [f.result() for f in [_pool(False).submit(*j) for j in jobs]]
+    with _rtf_lock:
+        st = _rtf.setdefault(rec.name, {"calls": 0, "audio_s": 0.0, "processing_s": 0.0})
+        st["calls"] += 1
+        st["audio_s"] += len(audio) / 1000.0
+        st["processing_s"] += time.monotonic() - start
+    return " ".join(t for t in texts if t).strip()
 
 def transcribe_twilio_media(media_url: str) -> str:
     try:
-        wav_path = _download_media_to_wav(media_url)
-        rec = sr.Recognizer()
-        with sr.AudioFile(wav_path) as source:
-            audio = rec.record(source)
-        text = rec.recognize_google(audio, language="es-ES")
-        return text
-    except sr.UnknownValueError:
-        return ""
+        buf, fmt = _download_media(media_url)
+        with buf:
+            audio = _to_pcm16k(buf, fmt)
+        return transcribe_audio(audio)
     except Exception:
         return ""
 
+def audio_to_text(path: str, backend: Optional[str] = None) -> str:
+    """Transcribe un archivo de audio local (usado por la CLI)."""
+    with open(path, "rb") as f:
+        fmt = os.path.splitext(path)[1].lstrip(".").lower() or None
+        audio = _to_pcm16k(f, fmt)
+    return transcribe_audio(audio, backend)
@@ -1,17 +1,181 @@
+import atexit
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from services.context import current_sender
+from services.storage import file_lock
+
+# Un archivo append-only por mes: budget/ledger-YYYY-MM.jsonl
+LEDGER_DIR = Path(__file__).parent / "budget"
+# sin ledger solo se guardan en memoria las últimas anotaciones (el total no se pierde)
+MEMORY_RECORDS = 10000
+
+
+def _month(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m")
+
+
 class BudgetGuard:
     """
     Guardián de costos simple:
     - Lleva conteo de uso "simulado" por operación (puedes enchufar costos reales si integras LLM).
     - Cambia el "modo" (alto/medio/bajo) según porcentaje del presupuesto mensual.
+
+    Con ledger_dir, cada costo se anota en un ledger append-only compartido por
+    todos los procesos (con agente, operación y remitente). Las anotaciones se
+    acumulan en memoria y se escriben en lote cada 'flush_interval' segundos,
+    así add_usage() no hace I/O. El total del mes se cachea y solo se lee la
+    parte nueva del ledger cada 'refresh_interval' segundos. Cada mes empieza
+    en un archivo nuevo, con lo que el uso se reinicia solo. El lote se escribe
+    fuera del lock: un disco lento no frena add_usage() ni check_mode().
+
+    Sin ledger_dir los totales se llevan en memoria y de las anotaciones solo
+    quedan las últimas MEMORY_RECORDS (para spend()).
     """
-    def __init__(self, monthly_limit=130.0):
+    def __init__(self, monthly_limit=130.0, ledger_dir: Optional[Path] = None,
+                 flush_interval: float = 2.0, refresh_interval: float = 1.0, clock=time.time):
         self.monthly_limit = float(monthly_limit)
-        self.current_usage = 0.0
+        self.ledger_dir = Path(ledger_dir) if ledger_dir else None
+        self.flush_interval = flush_interval
+        self.refresh_interval = refresh_interval
+        self.clock = clock
+        self._lock = threading.Lock()
+        # un flush a la vez (el periódico y el de atexit)
+        self._flush_lock = threading.Lock()
+        self._pending = self._new_pending()
+        # suma de lo pendiente por mes, para no recorrer _pending en cada consulta
+        self._pending_totals: Dict[str, float] = {}
+        # lote que se está escribiendo: sigue contando hasta que el ledger lo refleje
+        self._inflight: List[Dict[str, Any]] = []
+        self._inflight_totals: Dict[str, float] = {}
+        # agregado cacheado del mes en curso (lo ya escrito en el ledger)
+        self._month = _month(clock())
+        self._flushed_total = 0.0
+        self._offset = 0
+        self._refreshed_at = 0.0
+        self._flusher = None
+        if self.ledger_dir:
+            atexit.register(self.flush)
+
+    def _new_pending(self) -> deque:
+        return deque(maxlen=None if self.ledger_dir else MEMORY_RECORDS)
+
+    def _ledger(self, month: str) -> Path:
+        return self.ledger_dir / f"ledger-{month}.jsonl"
 
-    def add_usage(self, cost: float):
-        self.current_usage += float(cost)
+    # ---- escritura ----
+
+    def add_usage(self, cost: float, agent: Optional[str] = None, op: Optional[str] = None,
+                  sender: Optional[str] = None):
+        rec = {
+            "ts": self.clock(),
+            "cost": float(cost),
+            "agent": agent,
+            "op": op,
+            "sender": sender if sender is not None else current_sender.get(),
+        }
+        month = _month(rec["ts"])
+        with self._lock:
+            self._pending.append(rec)
+            self._pending_totals[month] = self._pending_totals.get(month, 0.0) + rec["cost"]
+        if self.ledger_dir:
+            self._ensure_flusher()
         return self.current_usage
 
+    def _ensure_flusher(self) -> None:
+        if self._flusher is not None:
+            return
+        with self._lock:
+            if self._flusher is not None:
+                return
+            self._flusher = threading.Thread(target=self._flush_loop, name="budget-flush", daemon=True)
+            self._flusher.start()
+
+    def _flush_loop(self) -> None:
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except OSError:
+                pass  # se reintenta en la próxima vuelta
+
+    def flush(self) -> None:
+        """Escribe en el ledger lo acumulado en memoria (una escritura por mes tocado)."""
+        if not self.ledger_dir:
+            return
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = list(self._pending), self._new_pending()
+                totals, self._pending_totals = self._pending_totals, {}
+                if not batch:
+                    return
+                self._inflight, self._inflight_totals = batch, totals
+            by_month: Dict[str, List[str]] = {}
+            for rec in batch:
+                by_month.setdefault(_month(rec["ts"]), []).append(json.dumps(rec, ensure_ascii=False))
+            try:
+                self.ledger_dir.mkdir(parents=True, exist_ok=True)
+                for month, lines in by_month.items():
+                    path = self._ledger(month)
+                    with file_lock(path), open(path, "a", encoding="utf-8") as f:
+                        f.write("\n".join(lines) + "\n")
+                        # un fsync por lote (ya agrupado cada flush_interval)
+                        f.flush()
+                        os.fsync(f.fileno())
+            except OSError:
+                # vuelve a la cola (delante de lo que llegó mientras tanto)
+                with self._lock:
+                    self._pending.extendleft(reversed(batch))
+                    for month, cost in totals.items():
+                        self._pending_totals[month] = self._pending_totals.get(month, 0.0) + cost
+                    self._inflight, self._inflight_totals = [], {}
+                raise
+            with self._lock:
+                # si otro thread ya leyó estas líneas del ledger, por un instante cuentan
+                # dos veces (de más, nunca de menos); desde aquí cuentan solo en el ledger
+                self._inflight, self._inflight_totals = [], {}
+                self._refresh_locked(force=True)
+
+    # ---- lectura ----
+
+    def _refresh_locked(self, force: bool = False) -> None:
+        now = self.clock()
+        month = _month(now)
+        if month != self._month:
+            # cambio de mes: el agregado arranca de cero con el archivo nuevo
+            self._month, self._flushed_total, self._offset = month, 0.0, 0
+        if not self.ledger_dir or (not force and now - self._refreshed_at < self.refresh_interval):
+            return
+        self._refreshed_at = now
+        path = self._ledger(month)
+        try:
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            return
+        if size <= self._offset:
+            return
+        with open(path, "rb") as f:
+            f.seek(self._offset)
+            chunk = f.read(size - self._offset)
+        end = chunk.rfind(b"\n") + 1
+        for line in chunk[:end].splitlines():
+            if line.strip():
+                self._flushed_total += json.loads(line)["cost"]
+        self._offset += end
+
+    @property
+    def current_usage(self) -> float:
+        with self._lock:
+            self._refresh_locked()
+            return (self._flushed_total + self._pending_totals.get(self._month, 0.0)
+                    + self._inflight_totals.get(self._month, 0.0))
+
     def usage_ratio(self) -> float:
         if self.monthly_limit <= 0:
             return 1.0
@@ -24,3 +188,45 @@ class BudgetGuard:
         if r >= 0.5:
             return "medium"  # ahorro moderado
         return "high"        # calidad alta (cuando hay presupuesto)
+
+    # ---- consultas ----
+
+    def records(self, since: Optional[float] = None, until: Optional[float] = None):
+        """Recorre las anotaciones (ledger + pendientes) en el rango [since, until)."""
+        with self._lock:
+            pending = self._inflight + list(self._pending)
+        if self.ledger_dir:
+            lo = _month(since) if since is not None else ""
+            hi = _month(until) if until is not None else "9999-99"
+            for path in sorted(self.ledger_dir.glob("ledger-*.jsonl")):
+                month = path.stem[len("ledger-"):]
+                if not (lo <= month <= hi):
+                    continue
+                with open(path, encoding="utf-8") as f:
+                    for line in f:
+                        if not line.strip():
+                            continue
+                        rec = json.loads(line)
+                        if (since is None or rec["ts"] >= since) and (until is None or rec["ts"] < until):
+                            yield rec
+        for rec in pending:
+            if (since is None or rec["ts"] >= since) and (until is None or rec["ts"] < until):
+                yield rec
+
+    def spend(self, since: Optional[float] = None, until: Optional[float] = None,
+              group_by: Optional[str] = None):
+        """
+        Gasto total en el rango, o agrupado por 'agent' | 'op' | 'sender' | 'day' | 'month'.
+        """
+        if group_by is None:
+            return sum(r["cost"] for r in self.records(since, until))
+        out: Dict[str, float] = {}
+        for r in self.records(since, until):
+            if group_by == "day":
+                key = datetime.fromtimestamp(r["ts"], timezone.utc).strftime("%Y-%m-%d")
+            elif group_by == "month":
+                key = _month(r["ts"])
+            else:
+                key = r.get(group_by) or "-"
+            out[key] = out.get(key, 0.0) + r["cost"]
+        return out
@@ -0,0 +1,138 @@
+"""
+cache.py
+Caché en memoria con TTL por entrada y desalojo LRU.
+
+- get_or_compute(key, ttl, fn): si hay valor vigente lo devuelve; si no, llama
+  a fn() una sola vez aunque lleguen varias peticiones iguales a la vez
+  (las demás esperan ese resultado). Los valores None no se guardan.
+- Persistencia opcional en JSON (claves str, valores serializables), compartida
+  entre workers: cada guardado mezcla con lo que dejaron los demás (JsonFile).
+- Contadores: hits / misses / coalesced / evictions.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from services.storage import JsonFile
+
+
+class _Call:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TTLCache:
+    def __init__(self, maxsize: int = 512, path: Optional[Path] = None, clock: Callable[[], float] = time.time):
+        self.maxsize = maxsize
+        self.path = Path(path) if path else None
+        self._file = JsonFile(self.path, default=list) if self.path else None
+        self.clock = clock
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expira, valor)
+        self._inflight: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.coalesced = self.evictions = 0
+        if self.path:
+            self.load()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            return self._get_locked(key)
+
+    def _get_locked(self, key: str) -> Any:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        if item[0] <= self.clock():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return item[1]
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        with self._lock:
+            self._data[key] = (self.clock() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+        if self.path:
+            self.save()
+
+    def get_or_compute(self, key: str, ttl: float, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            value = self._get_locked(key)
+            if value is not None:
+                self.hits += 1
+                return value
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                self.misses += 1
+                call = self._inflight[key] = _Call()
+            else:
+                self.coalesced += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+        try:
+            call.value = fn()
+            if call.value is not None:
+                self.set(key, call.value, ttl)
+            return call.value
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            call.done.set()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+        }
+
+    # ---- persistencia ----
+
+    def save(self) -> None:
+        with self._lock:
+            now = self.clock()
+            mine = [(k, exp, v) for k, (exp, v) in self._data.items() if exp > now]
+
+        def merge(items):
+            # por clave gana la que vence más tarde (de este u otro worker)
+            by_key = {k: (exp, v) for k, exp, v in items if exp > now}
+            for k, exp, v in mine:
+                if exp >= by_key.get(k, (0.0,))[0]:
+                    by_key[k] = (exp, v)
+            items[:] = [[k, exp, v] for k, (exp, v) in by_key.items()][-self.maxsize:]
+
+        # los set() que llegan juntos se escriben en un solo lote
+        self._file.update(merge)
+
+    def load(self) -> None:
+        now = self.clock()
+        items, _ = self._file.read()
+        with self._lock:
+            for k, exp, v in items:
+                if exp > now:
+                    self._data[k] = (exp, v)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
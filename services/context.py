@@ -0,0 +1,37 @@
+"""
+context.py
+Contexto del mensaje en curso (por thread / tarea), para que los servicios
+sepan a quién atribuir costos, logs, etc. sin pasarlo por todas las firmas.
+
+Los pools de workers (services/pipeline.py) copian el contexto al encolar,
+así que el remitente y el request id siguen al mensaje hasta el envío.
+"""
+
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+# número 'From' de Twilio (p. ej. 'whatsapp:+34600111222')
+current_sender: ContextVar[Optional[str]] = ContextVar("current_sender", default=None)
+# id del mensaje en curso (MessageSid de Twilio, o uno generado)
+current_request_id: ContextVar[Optional[str]] = ContextVar("current_request_id", default=None)
+
+
+@contextmanager
+def sender_context(sender: Optional[str]) -> Iterator[None]:
+    token = current_sender.set(sender)
+    try:
+        yield
+    finally:
+        current_sender.reset(token)
+
+
+@contextmanager
+def request_context(request_id: Optional[str] = None) -> Iterator[str]:
+    request_id = request_id or uuid.uuid4().hex[:16]
+    token = current_request_id.set(request_id)
+    try:
+        yield request_id
+    finally:
+        current_request_id.reset(token)
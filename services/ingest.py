@@ -0,0 +1,467 @@
+"""
+ingest.py
+Registro de entrada idempotente de los mensajes del webhook (por MessageSid).
+
+Twilio reintenta el webhook si la respuesta tarda; sin esto un mensaje repetido
+correría run_agent y guardaría la nota dos veces.
+
+- Cada mensaje nuevo se anota una sola vez en un log append-only por día
+  (ingest/ingest-YYYY-MM-DD.jsonl), compartido por todos los workers: la
+  escritura va con el lock del archivo y un fsync agrupado (GroupCommit).
+- Los repetidos se rechazan en O(1) con SidIndex: un conjunto exacto de los
+  SIDs recientes (INGEST_EXACT_WINDOW) más un Bloom filter rotativo que cubre
+  INGEST_WINDOW en memoria acotada (varias generaciones; la más vieja se
+  vacía al rotar). Un SID que solo está en el Bloom se toma como repetido
+  (falso positivo con probabilidad INGEST_BLOOM_FP).
+- Antes de decidir, cada proceso lee lo que los otros agregaron al log desde
+  la última vez (como el ledger de BudgetGuard), así un reintento que cae en
+  otro worker también se detecta.
+- release(sid): si el mensaje no se pudo encolar (503), se anota y el
+  reintento de Twilio vuelve a entrar.
+- Retención: los archivos de más de INGEST_RETENTION_DAYS días se borran (una
+  vez por día y proceso, al anotar); nunca menos de los que cubre
+  INGEST_WINDOW, que son los únicos de los que se rehace el índice.
+  INGEST_RETENTION_DAYS=0 los guarda todos (para capturas de replay).
+- iter_messages(path) / replay(...): reproduce un flujo capturado (este log,
+  forms de Twilio o JSONL con 'body' al estilo requests.jsonl) por el router,
+  a toda velocidad o al ritmo original (ver benchmarks/replay.py).
+"""
+
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from services.metrics import LatencyStats, timed
+from services.storage import GroupCommit, file_lock, lock_path_for
+
+INGEST_DIR = Path(__file__).parent / "ingest"
+INGEST_WINDOW = float(os.getenv("INGEST_WINDOW", 24 * 3600))
+INGEST_EXACT_WINDOW = float(os.getenv("INGEST_EXACT_WINDOW", 15 * 60))
+INGEST_BLOOM_CAPACITY = int(os.getenv("INGEST_BLOOM_CAPACITY", 100_000))
+INGEST_BLOOM_FP = float(os.getenv("INGEST_BLOOM_FP", 1e-6))
+INGEST_RETENTION_DAYS = int(os.getenv("INGEST_RETENTION_DAYS", 14))
+
+
+def _day(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%d")
+
+
+class BloomFilter:
+    """Bits en un bytearray; k posiciones por doble hashing de un blake2b de 128 bits."""
+
+    def __init__(self, capacity: int, fp_rate: float):
+        self.capacity = max(1, capacity)
+        self.bits = max(64, int(-self.capacity * math.log(fp_rate) / (math.log(2) ** 2)))
+        self.k = max(1, round(self.bits / self.capacity * math.log(2)))
+        self._data = bytearray((self.bits + 7) // 8)
+        self.count = 0
+
+    def positions(self, key: str) -> List[int]:
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        bits = self.bits
+        return [(h1 + i * h2) % bits for i in range(self.k)]
+
+    def add(self, key: str, positions: Optional[List[int]] = None) -> None:
+        data = self._data
+        for p in positions or self.positions(key):
+            data[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+    def contains(self, key: str, positions: Optional[List[int]] = None) -> bool:
+        data = self._data
+        for p in positions or self.positions(key):
+            if not data[p >> 3] & (1 << (p & 7)):
+                return False
+        return True
+
+    __contains__ = contains
+
+    def clear(self) -> None:
+        self._data = bytearray(len(self._data))
+        self.count = 0
+
+
+class SidIndex:
+    """
+    ¿Ya vimos este SID en la ventana? Exacto para lo reciente, Bloom para el resto.
+
+    generations Bloom filters de window/generations segundos cada uno (o hasta
+    llenar su capacidad); se consulta en todos y se inserta en el actual.
+    """
+
+    def __init__(self, window: float = INGEST_WINDOW, exact_window: float = INGEST_EXACT_WINDOW,
+                 capacity: int = INGEST_BLOOM_CAPACITY, fp_rate: float = INGEST_BLOOM_FP,
+                 generations: int = 4, max_exact: int = 200_000, clock: Callable[[], float] = time.time):
+        self.window = window
+        self.exact_window = exact_window
+        self.max_exact = max_exact
+        self.clock = clock
+        self._span = window / max(1, generations)
+        # el fp total es la suma de las generaciones: se reparte entre ellas
+        self._blooms = [BloomFilter(capacity, fp_rate / generations) for _ in range(max(1, generations))]
+        self._current = 0
+        self._rotated_at = clock()
+        self._exact: "OrderedDict[str, float]" = OrderedDict()  # sid -> ts
+        self._released: Dict[str, float] = {}
+        self.exact_hits = 0
+        self.bloom_hits = 0
+        self.rotations = 0
+
+    def _maintain(self, now: float) -> None:
+        bloom = self._blooms[self._current]
+        if now - self._rotated_at >= self._span or bloom.count >= bloom.capacity:
+            self._current = (self._current + 1) % len(self._blooms)
+            self._blooms[self._current].clear()
+            self._rotated_at = now
+            self.rotations += 1
+        exact = self._exact
+        while exact and (len(exact) > self.max_exact or next(iter(exact.values())) < now - self.exact_window):
+            exact.popitem(last=False)
+
+    def seen(self, sid: str) -> bool:
+        if sid in self._exact:
+            self.exact_hits += 1
+            return True
+        if sid in self._released:
+            return False
+        # todas las generaciones tienen el mismo tamaño: las posiciones se calculan una vez
+        positions = self._blooms[0].positions(sid)
+        if any(b.count and b.contains(sid, positions) for b in self._blooms):
+            self.bloom_hits += 1
+            return True
+        return False
+
+    def add(self, sid: str, ts: Optional[float] = None) -> None:
+        now = self.clock()
+        self._maintain(now)
+        self._blooms[self._current].add(sid)
+        self._exact[sid] = ts if ts is not None else now
+        self._exact.move_to_end(sid)
+        self._released.pop(sid, None)
+
+    def release(self, sid: str) -> None:
+        """El SID vuelve a valer como nuevo (el Bloom no permite borrar: se anota aparte)."""
+        self._exact.pop(sid, None)
+        self._released[sid] = self.clock()
+        if len(self._released) > self.max_exact:
+            self._released.pop(next(iter(self._released)))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "exact": len(self._exact),
+            "bloom": [b.count for b in self._blooms],
+            "bloom_bytes": sum(len(b._data) for b in self._blooms),
+            "exact_hits": self.exact_hits,
+            "bloom_hits": self.bloom_hits,
+            "rotations": self.rotations,
+        }
+
+
+class IngestLog:
+    def __init__(self, directory: Path = INGEST_DIR, index: Optional[SidIndex] = None,
+                 clock: Callable[[], float] = time.time, retention_days: int = INGEST_RETENTION_DAYS):
+        self.dir = Path(directory)
+        self.clock = clock
+        self.index = index or SidIndex(clock=clock)
+        self.retention_days = retention_days
+        self._pruned_day: Optional[str] = None
+        self.pruned = 0
+        self._lock = threading.Lock()
+        self._offsets: Dict[str, int] = {}  # archivo -> bytes ya leídos
+        self._commits: Dict[str, GroupCommit] = {}
+        self.accepted = 0
+        self.duplicates = 0
+        self.released = 0
+        self._load()
+
+    def _path(self, day: str) -> Path:
+        return self.dir / f"ingest-{day}.jsonl"
+
+    def _days(self, now: float) -> List[str]:
+        # días que toca la ventana del índice (normalmente hoy y ayer)
+        n = int(self.index.window // 86400) + 1
+        return sorted({_day(now - i * 86400) for i in range(n + 1)})
+
+    def _load(self) -> None:
+        with self._lock:
+            self._prune(self.clock())
+            self._catch_up(self.clock())
+
+    def _prune(self, now: float) -> None:
+        """Borra los días fuera de la retención (como mucho una vez por día)."""
+        today = _day(now)
+        if not self.retention_days or self._pruned_day == today:
+            return
+        self._pruned_day = today
+        # nunca por debajo de los días que necesita el índice
+        keep = max(self.retention_days, len(self._days(now)))
+        cutoff = _day(now - (keep - 1) * 86400)
+        for path in self.dir.glob("ingest-*.jsonl"):
+            if path.stem[len("ingest-"):] >= cutoff:
+                continue
+            for p in (path, lock_path_for(path)):
+                try:
+                    os.unlink(p)
+                except FileNotFoundError:
+                    pass  # otro worker ya lo borró
+            self._offsets.pop(path.name, None)
+            self.pruned += 1
+
+    def _catch_up(self, now: float) -> None:
+        """Aplica al índice lo que se agregó al log (de este u otro proceso) desde la última lectura."""
+        horizon = now - self.index.window
+        for day in self._days(now):
+            path = self._path(day)
+            try:
+                size = os.path.getsize(path)
+            except FileNotFoundError:
+                continue
+            offset = self._offsets.get(path.name, 0)
+            if size <= offset:
+                continue
+            with open(path, "rb") as f:
+                f.seek(offset)
+                chunk = f.read(size - offset)
+            end = chunk.rfind(b"\n") + 1
+            for line in chunk[:end].splitlines():
+                if not line.strip():
+                    continue
+                rec = json.loads(line)
+                if rec.get("event") == "released":
+                    self.index.release(rec["sid"])
+                elif rec["ts"] >= horizon:
+                    self.index.add(rec["sid"], rec["ts"])
+            self._offsets[path.name] = offset + end
+        for name in [n for n in self._offsets if n[len("ingest-"):-len(".jsonl")] < _day(horizon)]:
+            del self._offsets[name]
+
+    def _commit(self, path: Path) -> GroupCommit:
+        commit = self._commits.get(path.name)
+        if commit is None:
+            self._commits = {path.name: GroupCommit(path)}  # solo el archivo del día
+            commit = self._commits[path.name]
+        return commit
+
+    def _write_locked(self, path: Path, rec: Dict[str, Any]) -> None:
+        line = (json.dumps(rec, ensure_ascii=False) + "\n").encode("utf-8")
+        with open(path, "ab") as f:
+            f.write(line)
+        # con el lock tomado y recién puesto al día: lo propio no se vuelve a leer
+        self._offsets[path.name] = self._offsets.get(path.name, 0) + len(line)
+
+    @timed("ingest.append")
+    def append(self, msg: Dict[str, Any]) -> bool:
+        """
+        Anota el mensaje si es nuevo. False si su SID ya entró (reintento de Twilio).
+        Sin SID no hay cómo deduplicar: se anota siempre.
+        """
+        sid = msg.get("sid") or ""
+        now = self.clock()
+        rec = {"ts": now, "sid": sid, "from": msg.get("from", ""), "body": msg.get("body", ""),
+               "media_url": msg.get("media_url"), "media_type": msg.get("media_type")}
+        path = self._path(_day(now))
+        self.dir.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            self._prune(now)
+        with self._lock, file_lock(path):
+            self._catch_up(now)
+            if sid and self.index.seen(sid):
+                self.duplicates += 1
+                return False
+            self._write_locked(path, rec)
+            commit = self._commit(path)
+            commit.written()
+            if sid:
+                self.index.add(sid, now)
+            self.accepted += 1
+        commit.sync()
+        return True
+
+    def release(self, sid: str) -> None:
+        """El mensaje no llegó a procesarse (cola llena): su reintento debe entrar."""
+        if not sid:
+            return
+        now = self.clock()
+        path = self._path(_day(now))
+        with self._lock, file_lock(path):
+            self._catch_up(now)
+            self._write_locked(path, {"ts": now, "sid": sid, "event": "released"})
+            self.index.release(sid)
+            self.released += 1
+
+    def records(self, since: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Mensajes anotados (de los días retenidos), del más viejo al más nuevo,
+        sin los que después se liberaron.
+        """
+        def lines():
+            for path in sorted(self.dir.glob("ingest-*.jsonl")):
+                if since is not None and path.stem[len("ingest-"):] < _day(since):
+                    continue
+                with open(path, encoding="utf-8") as f:
+                    for line in f:
+                        if line.strip():
+                            yield json.loads(line)
+
+        for rec in _drop_released(lines()):
+            if since is None or rec["ts"] >= since:
+                yield rec
+
+    def stats(self) -> Dict[str, Any]:
+        return {"accepted": self.accepted, "duplicates": self.duplicates, "released": self.released,
+                "pruned": self.pruned, "index": self.index.stats()}
+
+
+_default: Optional[IngestLog] = None
+_default_lock = threading.Lock()
+
+
+def default_log() -> IngestLog:
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = IngestLog(Path(os.getenv("INGEST_DIR", INGEST_DIR)))
+    return _default
+
+
+def _drop_released(recs: Iterable[Dict[str, Any]], lookahead: int = 10_000) -> Iterator[Dict[str, Any]]:
+    """
+    Quita los eventos 'released' y el registro que anulan (su aceptación no llegó
+    a procesarse). El evento llega enseguida (mismo webhook), así que alcanza con
+    retener los últimos 'lookahead' registros.
+    """
+    pending: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+    last_by_sid: Dict[str, int] = {}
+    for n, rec in enumerate(recs):
+        if rec.get("event") == "released":
+            i = last_by_sid.pop(rec.get("sid"), None)
+            if i is not None:
+                pending.pop(i, None)
+            continue
+        if rec.get("event"):
+            continue
+        pending[n] = rec
+        if rec.get("sid"):
+            last_by_sid[rec["sid"]] = n
+        if len(pending) > lookahead:
+            i, old = pending.popitem(last=False)
+            if last_by_sid.get(old.get("sid")) == i:
+                del last_by_sid[old["sid"]]
+            yield old
+    yield from pending.values()
+
+
+# -------- replay --------
+
+def _message(rec: Dict[str, Any], n: int) -> Dict[str, Any]:
+    if "MessageSid" in rec or "Body" in rec:
+        from services.pipeline import parse_twilio_form
+        msg = parse_twilio_form(rec)
+    else:
+        body = rec.get("body") or rec.get("text") or ""
+        msg = {"sid": rec.get("sid") or rec.get("request_id") or rec.get("id") or "",
+               "from": rec.get("from") or "replay", "body": body.strip(),
+               "media_url": rec.get("media_url"), "media_type": rec.get("media_type")}
+    msg["ts"] = rec.get("ts")
+    msg["sid"] = msg["sid"] or f"replay-{n}"
+    return msg
+
+
+def iter_messages(path: Path) -> Iterator[Dict[str, Any]]:
+    """
+    Mensajes de un JSONL: registros de este log, forms de Twilio (MessageSid,
+    From, Body) o cualquier objeto con 'body'/'text' (y opcionalmente 'sid' /
+    'request_id', 'from', 'ts').
+    """
+    def recs():
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    for n, rec in enumerate(_drop_released(recs())):
+        yield _message(rec, n)
+
+
+class ReplayResult:
+    __slots__ = ("sid", "sender", "body", "reply", "seconds", "error")
+
+    def __init__(self, sid, sender, body, reply, seconds, error):
+        self.sid = sid
+        self.sender = sender
+        self.body = body
+        self.reply = reply
+        self.seconds = seconds
+        self.error = error
+
+    def as_dict(self) -> dict:
+        return {"sid": self.sid, "from": self.sender, "body": self.body, "reply": self.reply,
+                "ms": round(self.seconds * 1000, 3), "error": self.error}
+
+
+def replay(messages: Iterable[Dict[str, Any]], handle: Optional[Callable] = None, workers: int = 8,
+           speed: float = 0.0, log: Optional[IngestLog] = None) -> Dict[str, Any]:
+    """
+    Pasa los mensajes por handle (process_message del pipeline) con el mismo
+    orden por remitente que en producción. speed=0: a toda velocidad; speed=1:
+    respetando los tiempos originales ('ts'); 10: diez veces más rápido.
+    Con log, los repetidos se descartan como en el webhook.
+    Devuelve resultados (uno por mensaje procesado, en orden de entrada) y métricas.
+    """
+    from services.pipeline import WhatsAppPipeline, process_message
+    handle = handle or process_message
+    results: Dict[int, ReplayResult] = {}
+    latency = LatencyStats(window=1 << 20)
+
+    def run(msg):
+        start = time.perf_counter()
+        reply, error = None, None
+        try:
+            reply = handle(msg)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        seconds = time.perf_counter() - start
+        latency.observe(seconds)
+        results[msg["_n"]] = ReplayResult(msg["sid"], msg.get("from"), msg.get("body"), reply, seconds, error)
+        return reply
+
+    pipeline = WhatsAppPipeline(handle=run, send=lambda text, to: None, workers=workers, queue_size=1000)
+    duplicates = 0
+    first_ts = started = None
+    start = time.perf_counter()
+    for n, msg in enumerate(messages):
+        if log is not None and not log.append(msg):
+            duplicates += 1
+            continue
+        if speed and msg.get("ts") is not None:
+            if first_ts is None:
+                first_ts, started = msg["ts"], time.perf_counter()
+            wait = (msg["ts"] - first_ts) / speed - (time.perf_counter() - started)
+            if wait > 0:
+                time.sleep(wait)
+        msg = dict(msg, _n=n)
+        while not pipeline.submit(msg):
+            time.sleep(0.001)  # cola llena: en replay se espera en vez de rechazar
+    pipeline.pool.join()
+    elapsed = time.perf_counter() - start
+    pipeline.pool.shutdown()
+    ordered = [results[n] for n in sorted(results)]
+    return {
+        "results": ordered,
+        "processed": len(ordered),
+        "duplicates": duplicates,
+        "errors": sum(1 for r in ordered if r.error),
+        "seconds": elapsed,
+        "per_second": len(ordered) / elapsed if elapsed else 0.0,
+        "latency": latency.snapshot(),
+    }
@@ -0,0 +1,393 @@
+"""
+llm.py
+Capa de ejecución de LLM por niveles según el presupuesto (API compatible con OpenAI).
+
+- El modo de BudgetGuard.check_mode() ("high" / "medium" / "low") elige un nivel:
+  modelo, máximo de tokens de respuesta y profundidad de búsqueda (resultados de
+  _ddg_text). Se configuran con LLM_MODEL_<MODO>, LLM_MAX_TOKENS_<MODO> y
+  LLM_SEARCH_<MODO>.
+- Caché de respuestas (TTLCache) por clave exacta y por clave normalizada
+  (minúsculas, sin tildes ni signos, espacios colapsados): "¿Qué es Python?" y
+  "que es python" comparten respuesta. Pedidos iguales en vuelo se coalescen
+  (uno llama a la API, los demás esperan).
+- Micro-batching (LLM_API=completions): los pedidos distintos que llegan dentro
+  de LLM_BATCH_WINDOW segundos para el mismo modelo salen en un solo POST a
+  /completions con una lista de prompts (vLLM, llama.cpp, TGI, modelos instruct
+  de OpenAI). Con LLM_API=chat (por defecto) cada prompt es un /chat/completions,
+  con a lo sumo LLM_CONCURRENCY en vuelo.
+- Gasto medido con los tokens reales de 'usage' (precio por 1k tokens de
+  entrada/salida, LLM_PRICES) y anotado con BudgetGuard.add_usage en el thread
+  del pedido (con su remitente). Los aciertos de caché no cuestan nada.
+
+LLM_BASE_URL permite apuntar a un servidor falso local (ver benchmarks/bench_llm.py).
+Sin LLM_BASE_URL ni OPENAI_API_KEY, default_llm() es None y los agentes no usan LLM.
+"""
+
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+import unicodedata
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from services.cache import TTLCache
+from services.metrics import REGISTRY, LatencyStats, timed
+
+log = logging.getLogger(__name__)
+
+BASE_URL = os.getenv("LLM_BASE_URL", "https://api.openai.com/v1")
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# USD por 1k tokens (entrada, salida); LLM_PRICES='{"modelo": [in, out]}' agrega o reemplaza
+PRICES: Dict[str, Tuple[float, float]] = {
+    "gpt-4o": (0.0025, 0.01),
+    "gpt-4o-mini": (0.00015, 0.0006),
+    "gpt-3.5-turbo-instruct": (0.0015, 0.002),
+}
+PRICES.update({k: tuple(v) for k, v in json.loads(os.getenv("LLM_PRICES", "{}")).items()})
+# modelo sin precio conocido: se mide igual, con este precio
+DEFAULT_PRICE = (0.001, 0.002)
+
+TOKENS = REGISTRY.counter("jarvis_llm_tokens_total", "Tokens consumidos en la API de LLM", ("kind",))
+CACHE_LOOKUPS = REGISTRY.counter("jarvis_llm_cache_total", "Consultas a la caché de respuestas de LLM", ("result",))
+
+
+class Tier:
+    """Lo que cambia con el modo del presupuesto."""
+    __slots__ = ("mode", "model", "max_tokens", "search_results")
+
+    def __init__(self, mode: str, model: str, max_tokens: int, search_results: int):
+        self.mode = mode
+        self.model = model
+        self.max_tokens = max_tokens
+        self.search_results = search_results
+
+    def as_dict(self) -> dict:
+        return {"mode": self.mode, "model": self.model, "max_tokens": self.max_tokens,
+                "search_results": self.search_results}
+
+
+def _tier(mode: str, model: str, max_tokens: int, search_results: int) -> Tier:
+    m = mode.upper()
+    return Tier(mode, os.getenv(f"LLM_MODEL_{m}", model), int(os.getenv(f"LLM_MAX_TOKENS_{m}", max_tokens)),
+                int(os.getenv(f"LLM_SEARCH_{m}", search_results)))
+
+
+TIERS: Dict[str, Tier] = {
+    "high": _tier("high", "gpt-4o", 800, 10),
+    "medium": _tier("medium", "gpt-4o-mini", 400, 6),
+    "low": _tier("low", "gpt-4o-mini", 150, 3),
+}
+
+
+def tier_for(mode: Optional[str]) -> Tier:
+    return TIERS.get(mode or "high", TIERS["high"])
+
+
+_PUNCT_RE = re.compile(r"[^\w\s]")
+_WS_RE = re.compile(r"\s+")
+
+
+def normalize_prompt(text: str) -> str:
+    text = unicodedata.normalize("NFKD", (text or "").lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return _WS_RE.sub(" ", _PUNCT_RE.sub(" ", text)).strip()
+
+
+def cost_of(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    price_in, price_out = PRICES.get(model, DEFAULT_PRICE)
+    return prompt_tokens / 1000 * price_in + completion_tokens / 1000 * price_out
+
+
+class LLMError(RuntimeError):
+    pass
+
+
+class _Pending:
+    """Un prompt esperando su lote."""
+    __slots__ = ("prompt", "done", "text", "usage", "error")
+
+    def __init__(self, prompt: str):
+        self.prompt = prompt
+        self.done = threading.Event()
+        self.text: Optional[str] = None
+        self.usage: Dict[str, int] = {}
+        self.error: Optional[Exception] = None
+
+
+class LLMClient:
+    def __init__(self, base_url: str = BASE_URL, api_key: Optional[str] = None, budget=None,
+                 api: str = "chat", batch_window: float = 0.005, max_batch: int = 16, concurrency: int = 16,
+                 cache_size: int = 2048, cache_ttl: float = 24 * 3600, cache_path: Optional[str] = None,
+                 tiers: Optional[Dict[str, Tier]] = None, temperature: float = 0.2,
+                 max_retries: int = 2, backoff: float = 0.5, timeout: float = 60.0):
+        if api not in ("chat", "completions"):
+            raise ValueError(f"api desconocida: {api}")
+        self.base_url = base_url.rstrip("/")
+        self.budget = budget
+        self.api = api
+        self.batch_window = batch_window
+        self.max_batch = max(1, max_batch)
+        self.tiers = tiers or TIERS
+        self.temperature = temperature
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.cache_ttl = cache_ttl
+        self.cache = TTLCache(maxsize=cache_size, path=cache_path)
+
+        self.session = requests.Session()
+        if api_key:
+            self.session.headers["Authorization"] = f"Bearer {api_key}"
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=max(concurrency, 10))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._slots = threading.BoundedSemaphore(max(1, concurrency))
+
+        # lotes abiertos por (modelo, max_tokens, system)
+        self._pending: Dict[tuple, List[_Pending]] = {}
+        self._lock = threading.Lock()
+
+        self.latency = LatencyStats()
+        self.requests = 0
+        self.batches = 0
+        self.batched_prompts = 0
+        self.retries = 0
+        self.errors = 0
+        self.exact_hits = 0
+        self.normalized_hits = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost = 0.0
+
+    # ---- API pública ----
+
+    def tier(self, mode: Optional[str] = None) -> Tier:
+        if mode is None:
+            mode = self.budget.check_mode() if self.budget is not None else "high"
+        return self.tiers.get(mode, self.tiers["high"])
+
+    def complete(self, prompt: str, mode: Optional[str] = None, system: Optional[str] = None,
+                 agent: Optional[str] = None, op: str = "llm") -> str:
+        """Respuesta al prompt con el nivel del modo (o el del presupuesto actual)."""
+        tier = self.tier(mode)
+        prefix = f"{tier.model}|{tier.max_tokens}|{system or ''}|"
+        exact = "e|" + prefix + prompt
+        text = self.cache.get(exact)
+        if text is not None:
+            self.exact_hits += 1
+            CACHE_LOOKUPS.inc("exact")
+            return text
+        norm = "n|" + prefix + normalize_prompt(prompt)
+        text = self.cache.get(norm)
+        if text is not None:
+            self.normalized_hits += 1
+            CACHE_LOOKUPS.inc("normalized")
+            self.cache.set(exact, text, self.cache_ttl)
+            return text
+
+        usage: Dict[str, int] = {}
+
+        def call() -> str:
+            out, used = self._complete_uncached(tier, system, prompt)
+            usage.update(used)
+            return out
+
+        # pedidos con la misma clave normalizada en vuelo esperan a este
+        text = self.cache.get_or_compute(norm, self.cache_ttl, call)
+        CACHE_LOOKUPS.inc("miss" if usage else "coalesced")
+        if usage:
+            self._meter(tier.model, usage, agent, op)
+        self.cache.set(exact, text, self.cache_ttl)
+        return text
+
+    # ---- llamadas a la API ----
+
+    def _complete_uncached(self, tier: Tier, system: Optional[str], prompt: str) -> Tuple[str, Dict[str, int]]:
+        if self.api == "chat":
+            return self._chat(tier, system, prompt)
+        item = _Pending(prompt)
+        self._enqueue((tier.model, tier.max_tokens, system or ""), item)
+        item.done.wait()
+        if item.error is not None:
+            raise item.error
+        return item.text, item.usage
+
+    def _chat(self, tier: Tier, system: Optional[str], prompt: str) -> Tuple[str, Dict[str, int]]:
+        messages = [{"role": "system", "content": system}] if system else []
+        messages.append({"role": "user", "content": prompt})
+        data = self._post("/chat/completions", {"model": tier.model, "messages": messages,
+                                                "max_tokens": tier.max_tokens, "temperature": self.temperature})
+        text = data["choices"][0]["message"]["content"] or ""
+        usage = data.get("usage") or {}
+        return text.strip(), {"prompt_tokens": int(usage.get("prompt_tokens", 0)),
+                              "completion_tokens": int(usage.get("completion_tokens", 0))}
+
+    def _enqueue(self, group: tuple, item: _Pending) -> None:
+        with self._lock:
+            items = self._pending.setdefault(group, [])
+            items.append(item)
+            if len(items) >= self.max_batch:
+                # lote lleno: lo despacha quien lo completó, sin esperar la ventana
+                del self._pending[group]
+                full = True
+            elif len(items) == 1:
+                full = False
+            else:
+                return
+        if not full:
+            # el primero del lote espera la ventana y despacha lo que se juntó
+            # (salvo que otro lo haya llenado y despachado antes)
+            time.sleep(self.batch_window)
+            with self._lock:
+                if self._pending.get(group) is not items:
+                    return
+                del self._pending[group]
+        self._dispatch(group, items)
+
+    def _dispatch(self, group: tuple, batch: List[_Pending]) -> None:
+        model, max_tokens, system = group
+        prompts = [f"{system}\n\n{p.prompt}" if system else p.prompt for p in batch]
+        try:
+            data = self._post("/completions", {"model": model, "prompt": prompts, "max_tokens": max_tokens,
+                                               "temperature": self.temperature})
+            texts = [""] * len(batch)
+            for choice in data["choices"]:
+                texts[choice.get("index", 0)] = (choice.get("text") or "").strip()
+            self._split_usage(batch, prompts, texts, data.get("usage") or {})
+            for item, text in zip(batch, texts):
+                item.text = text
+        except Exception as e:
+            log.warning("lote de %d prompts falló: %s", len(batch), e)
+            for item in batch:
+                item.error = e
+        finally:
+            self.batches += 1
+            self.batched_prompts += len(batch)
+            for item in batch:
+                item.done.set()
+
+    @staticmethod
+    def _split_usage(batch: List[_Pending], prompts: List[str], texts: List[str], usage: Dict[str, Any]) -> None:
+        # 'usage' viene sumado para todo el lote: se reparte por largo de prompt / respuesta
+        total_in, total_out = int(usage.get("prompt_tokens", 0)), int(usage.get("completion_tokens", 0))
+        len_in = sum(len(p) for p in prompts) or 1
+        len_out = sum(len(t) for t in texts) or 1
+        left_in, left_out = total_in, total_out
+        for i, item in enumerate(batch):
+            if i == len(batch) - 1:
+                pt, ct = left_in, left_out
+            else:
+                pt = round(total_in * len(prompts[i]) / len_in)
+                ct = round(total_out * len(texts[i]) / len_out)
+            left_in -= pt
+            left_out -= ct
+            item.usage = {"prompt_tokens": pt, "completion_tokens": ct}
+
+    @timed("llm.request")
+    def _post(self, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        attempt = 0
+        with self._slots:
+            while True:
+                start = time.perf_counter()
+                try:
+                    resp = self.session.post(self.base_url + path, json=payload, timeout=self.timeout)
+                    self.requests += 1
+                    self.latency.observe(time.perf_counter() - start)
+                    if resp.status_code < 400:
+                        return resp.json()
+                    if resp.status_code not in RETRY_STATUS or attempt >= self.max_retries:
+                        self.errors += 1
+                        raise LLMError(f"LLM {resp.status_code}: {resp.text[:200]}")
+                    try:
+                        delay = float(resp.headers.get("Retry-After", ""))
+                    except ValueError:
+                        delay = None
+                except requests.RequestException as e:
+                    if attempt >= self.max_retries:
+                        self.errors += 1
+                        raise LLMError(f"LLM sin respuesta: {e}") from e
+                    delay = None
+                attempt += 1
+                self.retries += 1
+                time.sleep(delay if delay is not None else self.backoff * (2 ** (attempt - 1)) * random.uniform(0.5, 1.5))
+
+    # ---- gasto ----
+
+    def _meter(self, model: str, usage: Dict[str, int], agent: Optional[str], op: str) -> None:
+        pt, ct = usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+        cost = cost_of(model, pt, ct)
+        self.prompt_tokens += pt
+        self.completion_tokens += ct
+        self.cost += cost
+        TOKENS.inc("prompt", amount=pt)
+        TOKENS.inc("completion", amount=ct)
+        if self.budget is not None:
+            self.budget.add_usage(cost, agent=agent, op=op)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "api": self.api,
+            "requests": self.requests,
+            "batches": self.batches,
+            "batched_prompts": self.batched_prompts,
+            "retries": self.retries,
+            "errors": self.errors,
+            "exact_hits": self.exact_hits,
+            "normalized_hits": self.normalized_hits,
+            "cache": self.cache.stats(),
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cost": round(self.cost, 6),
+            "latency": self.latency.snapshot(),
+        }
+
+
+_default: Optional[LLMClient] = None
+_default_lock = threading.Lock()
+# presupuesto contra el que mide el cliente del proceso (attach_budget)
+_budget = None
+
+
+def llm_configured() -> bool:
+    return bool(os.getenv("LLM_BASE_URL") or os.getenv("OPENAI_API_KEY"))
+
+
+def attach_budget(budget) -> None:
+    """
+    Presupuesto del proceso (el del router): el cliente anota ahí el costo real
+    de cada llamada y de ahí saca el nivel. Vale para el cliente ya creado y
+    para el que se cree después, sin importar quién llame primero a default_llm().
+    """
+    global _budget
+    with _default_lock:
+        _budget = budget
+        if _default is not None:
+            _default.budget = budget
+
+
+def default_llm() -> Optional[LLMClient]:
+    """Cliente del proceso (mide contra el presupuesto de attach_budget), o None si no hay LLM configurado."""
+    global _default
+    if _default is None and llm_configured():
+        with _default_lock:
+            if _default is None:
+                _default = LLMClient(
+                    base_url=os.getenv("LLM_BASE_URL", BASE_URL),
+                    api_key=os.getenv("OPENAI_API_KEY"),
+                    budget=_budget,
+                    api=os.getenv("LLM_API", "chat"),
+                    batch_window=float(os.getenv("LLM_BATCH_WINDOW", 0.005)),
+                    max_batch=int(os.getenv("LLM_MAX_BATCH", 16)),
+                    concurrency=int(os.getenv("LLM_CONCURRENCY", 16)),
+                    cache_size=int(os.getenv("LLM_CACHE_SIZE", 2048)),
+                    cache_ttl=float(os.getenv("LLM_CACHE_TTL", 24 * 3600)),
+                    cache_path=os.getenv("LLM_CACHE_PATH") or None,
+                )
+    return _default
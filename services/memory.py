@@ -1,20 +1,26 @@
-import json
-from pathlib import Path
-
-STORE = Path(__file__).parent / "memory_store.json"
-if not STORE.exists():
-    STORE.write_text(json.dumps({"notes": []}, indent=2))
+from services.note_store import current_store
 
 class MemoryClient:
+    """Notas de texto plano del remitente en curso (services/note_store.py)."""
+
+    def __init__(self, store=None):
+        self._store = store
+
+    @property
+    def store(self):
+        return self._store or current_store()
+
     def load(self):
-        return json.loads(STORE.read_text())
+        return {"notes": [n["text"] for n in self.store.list_notes()]}
 
     def save(self, text: str):
-        data = self.load()
-        data["notes"].append(text)
-        STORE.write_text(json.dumps(data, indent=2))
+        self.store.add(text, source="services")
 
-    def search(self, keyword: str):
-        data = self.load()
-        k = keyword.lower()
-        return [n for n in data["notes"] if k in n.lower()]
+    def search(self, keyword: str, limit=None, mode: str = "index"):
+        """
+        mode="index"     -> índice de texto completo, resultados ordenados por BM25
+        mode="substring" -> comportamiento original (substring, orden de inserción)
+        mode="semantic"  -> por significado (embeddings), top 10 si no hay limit
+        mode="hybrid"    -> palabras clave + semántica combinadas
+        """
+        return [n["text"] for n in self.store.search(keyword, limit, mode)]
@@ -0,0 +1,283 @@
+"""
+metrics.py
+Métricas simples en proceso.
+
+- LatencyStats: ventana de las últimas N muestras con percentiles p50/p99.
+- Counter / Histogram / gauges: acumulados por etiqueta, en formato de texto
+  de Prometheus con REGISTRY.render() (ruta /metrics de app.py).
+- timed(stage): decorador o context manager que mide una etapa del camino
+  caliente en el histograma jarvis_stage_seconds{stage=...} y cuenta errores.
+- request_trace(request_id): envuelve un mensaje entero; fija el request id
+  (services/context.py) y junta las etapas medidas dentro (spans) para el
+  registro de pedidos lentos (services/profiler.py, opcional).
+
+Con METRICS=0 timed() solo llama a la función (un chequeo de bandera).
+Cada worker de gunicorn expone sus propios números.
+"""
+
+import bisect
+import functools
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from services.context import request_context
+from services.profiler import default_profiler
+
+ENABLED = os.getenv("METRICS", "1") != "0"
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# etapas medidas dentro del pedido en curso: [(etapa, segundos)]
+_spans: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("spans", default=None)
+
+
+class LatencyStats:
+    def __init__(self, window: int = 2048):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+            self.count += 1
+            self.total += seconds
+
+    def percentile(self, p: float) -> float:
+        with self._lock:
+            data = sorted(self._samples)
+        if not data:
+            return 0.0
+        k = min(len(data) - 1, max(0, int(round(p / 100.0 * (len(data) - 1)))))
+        return data[k]
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "p50_ms": round(self.percentile(50) * 1000, 3),
+            "p99_ms": round(self.percentile(99) * 1000, 3),
+        }
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str = "", labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1.0) -> None:
+        # sin lock, como los contadores de stats(): con el GIL una carrera
+        # puede perder algún incremento, aceptable para métricas
+        self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def value(self, *label_values: str) -> float:
+        return self._values.get(label_values, 0.0)
+
+    def render(self) -> List[str]:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for values, v in sorted(self._values.copy().items()):
+            out.append(f"{self.name}{_labels(self.labels, values)} {v:g}")
+        return out
+
+
+class _Series:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # el último es +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        # sin lock (ver Counter.inc): un lock costaría más que todo lo demás
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Histogram:
+    """Buckets fijos (acumulativos al exportar); observe() es O(log buckets)."""
+
+    def __init__(self, name: str, help: str = "", labels: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[tuple, _Series] = {}
+        self._lock = threading.Lock()
+
+    def child(self, *label_values: str) -> _Series:
+        """Serie de esas etiquetas (para guardarla y no buscarla en cada observe)."""
+        s = self._series.get(label_values)
+        if s is None:
+            with self._lock:
+                s = self._series.setdefault(label_values, _Series(self.buckets))
+        return s
+
+    def observe(self, value: float, *label_values: str) -> None:
+        self.child(*label_values).observe(value)
+
+    def count(self, *label_values: str) -> int:
+        s = self._series.get(label_values)
+        return s.count if s else 0
+
+    def render(self) -> List[str]:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, (list(v.counts), v.sum, v.count)) for k, v in self._series.items())
+        for values, (counts, total, n) in items:
+            acc = 0
+            for bound, c in zip(self.buckets + (float("inf"),), counts):
+                acc += c
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound:g}"'
+                out.append(f"{self.name}_bucket{_labels(self.labels, values, le)} {acc}")
+            out.append(f"{self.name}_sum{_labels(self.labels, values)} {total:.6f}")
+            out.append(f"{self.name}_count{_labels(self.labels, values)} {n}")
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._gauges: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help: str = "", labels: Sequence[str] = ()) -> Counter:
+        with self._lock:
+            return self._metrics.setdefault(name, Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str = "", labels: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        with self._lock:
+            return self._metrics.setdefault(name, Histogram(name, help, labels, buckets))
+
+    def gauge(self, name: str, fn: Callable[[], Any], help: str = "", labels: Sequence[str] = ()) -> None:
+        """
+        Valor leído al exportar (p. ej. largo de una cola). Con labels, fn
+        devuelve {valor_de_etiqueta (o tupla): número}, p. ej. uno por backend.
+        """
+        with self._lock:
+            self._gauges[name] = (fn, help, tuple(labels))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+            gauges = list(self._gauges.items())
+        for m in metrics:
+            lines.extend(m.render())
+        for name, (fn, help, labels) in gauges:
+            try:
+                if labels:
+                    values = [((k if isinstance(k, tuple) else (k,)), float(v)) for k, v in fn().items()]
+                else:
+                    values = [((), float(fn()))]
+            except Exception:
+                continue  # un gauge roto no tumba la exportación
+            lines.extend([f"# HELP {name} {help}", f"# TYPE {name} gauge"])
+            lines.extend(f"{name}{_labels(labels, k)} {v:g}" for k, v in sorted(values))
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+STAGE_SECONDS = REGISTRY.histogram("jarvis_stage_seconds", "Duración de cada etapa del camino caliente", ("stage",))
+STAGE_ERRORS = REGISTRY.counter("jarvis_stage_errors_total", "Etapas que terminaron con excepción", ("stage",))
+REQUESTS = REGISTRY.histogram("jarvis_request_seconds", "Duración total de cada mensaje procesado")
+
+
+def _record(stage: str, series: _Series, seconds: float, failed: bool) -> None:
+    series.observe(seconds)
+    if failed:
+        STAGE_ERRORS.inc(stage)
+    spans = _spans.get()
+    if spans is not None:
+        spans.append((stage, seconds))
+
+
+class timed:
+    """
+    Mide una etapa:
+        @timed("registry.load")
+        def _refresh(self): ...
+
+        with timed("audio.transcode"):
+            ...
+    """
+
+    __slots__ = ("stage", "_series", "_start")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self._series = STAGE_SECONDS.child(stage)
+        self._start = 0.0
+
+    def __call__(self, fn: Callable) -> Callable:
+        stage, series = self.stage, self._series
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            failed = True
+            try:
+                result = fn(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                _record(stage, series, time.perf_counter() - start, failed)
+
+        return wrapper
+
+    def __enter__(self) -> "timed":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if ENABLED:
+            _record(self.stage, self._series, time.perf_counter() - self._start, exc_type is not None)
+
+
+@contextmanager
+def request_trace(request_id: Optional[str] = None) -> Iterator[str]:
+    """
+    Un mensaje de principio a fin: fija el request id y junta sus etapas.
+    Si el perfilador está activo (PROFILE_SLOW=1) muestrea su stack.
+    """
+    profiler = default_profiler()
+    with request_context(request_id) as rid:
+        if not ENABLED:
+            yield rid
+            return
+        spans: List[Tuple[str, float]] = []
+        token = _spans.set(spans)
+        probe = profiler.begin(rid) if profiler else None
+        start = time.perf_counter()
+        try:
+            yield rid
+        finally:
+            elapsed = time.perf_counter() - start
+            _spans.reset(token)
+            REQUESTS.observe(elapsed)
+            if profiler:
+                profiler.end(probe, elapsed, spans)
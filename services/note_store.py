@@ -0,0 +1,346 @@
+"""
+note_store.py
+Almacén único de notas (SQLite en modo WAL) detrás de services.memory y
+modules.memory_module.
+
+- add(text, tags)              -> O(1), una fila + sus tags + entrada FTS
+- delete(id) / delete_at(i)    -> borra sin reescribir ni desplazar nada
+- list_notes(...)              -> por id, rango de tiempo (índice ts) o tag (índice tag)
+- search(q, limit, mode)       -> FTS5 con ranking BM25 (prefijos, todas las palabras;
+                                  si nada coincide, substring como antes), substring,
+                                  o semántica/híbrida (services/vector_index.py)
+- import_legacy()              -> importa una vez los dos memory_store.json antiguos (con
+                                  lock entre procesos, en una transacción; el archivo se
+                                  renombra a *.imported recién después del commit)
+
+Cada thread usa su propia conexión; varios procesos pueden escribir a la vez.
+Con shards (services/shards.py) cada remitente tiene su propio notes.db:
+current_store() da el del mensaje en curso, o el único sin remitente.
+Importación manual:
+    python -m services.note_store import
+"""
+
+import json
+import re
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from services import shards
+from services.metrics import timed
+from services.storage import file_lock
+
+DB_PATH = Path(__file__).parent / "notes.db"
+# Almacenes JSON anteriores (se importan una vez y se renombran a *.imported)
+LEGACY_STORES = [
+    Path(__file__).parent / "memory_store.json",
+    Path(__file__).parent.parent / "modules" / "memory_store.json",
+]
+LEGACY_INDEX = "memory_index.json"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS notes (
+    id     INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts     TEXT NOT NULL,
+    text   TEXT NOT NULL,
+    source TEXT
+);
+CREATE INDEX IF NOT EXISTS notes_ts ON notes(ts);
+CREATE TABLE IF NOT EXISTS note_tags (
+    tag     TEXT NOT NULL,
+    note_id INTEGER NOT NULL,
+    PRIMARY KEY (tag, note_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS note_tags_note ON note_tags(note_id);
+CREATE TABLE IF NOT EXISTS legacy_imports (
+    source TEXT PRIMARY KEY
+);
+"""
+_FTS_SCHEMA = "CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(text, tags)"
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def _py_lower(s):
+    # lower() de SQLite solo entiende ASCII; el substring original usaba str.lower()
+    return s.lower() if s is not None else None
+
+
+class NoteStore:
+    def __init__(self, path: Path = DB_PATH):
+        self.path = Path(path)
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._ready = False
+        self.fts = True
+
+    # ---- conexión ----
+
+    def ensure(self) -> None:
+        """Crea la base/tablas si no existen (y hace la importación inicial)."""
+        self._conn()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self._ensure_schema()
+            # el thread que creó las tablas (o hizo la importación inicial) ya tiene la suya
+            conn = getattr(self._local, "conn", None) or self._connect()
+            self._local.conn = conn
+        return conn
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.create_function("py_lower", 1, _py_lower, deterministic=True)
+        return conn
+
+    def _ensure_schema(self) -> None:
+        if self._ready:
+            return
+        with self._init_lock:
+            if self._ready:
+                return
+            conn = self._connect()
+            try:
+                # una sola transacción: un shard nuevo paga un commit, no uno por tabla
+                conn.executescript("BEGIN;" + _SCHEMA + "COMMIT;")
+                try:
+                    conn.execute(_FTS_SCHEMA)
+                except sqlite3.OperationalError:
+                    self.fts = False  # SQLite sin FTS5: búsqueda por substring
+            except BaseException:
+                conn.close()
+                raise
+            # se queda como conexión de este thread (un shard reabierto no conecta dos veces)
+            self._local.conn = conn
+            self._ready = True
+        if self.path == DB_PATH:
+            # barato si ya se importó (los archivos ya no están)
+            self.import_legacy()
+
+    # ---- escritura ----
+
+    def add(self, text: str, tags: Iterable[str] = (), ts: Optional[str] = None,
+            source: Optional[str] = None) -> Dict[str, Any]:
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            return self._insert(conn, text, tags, ts, source)
+
+    def _insert(self, conn: sqlite3.Connection, text: str, tags: Iterable[str], ts: Optional[str],
+                source: Optional[str]) -> Dict[str, Any]:
+        """Una nota dentro de la transacción en curso."""
+        tags = [t for t in dict.fromkeys(tags) if t]
+        ts = ts or datetime.utcnow().isoformat()
+        cur = conn.execute("INSERT INTO notes (ts, text, source) VALUES (?, ?, ?)", (ts, text, source))
+        note_id = cur.lastrowid
+        if tags:
+            conn.executemany("INSERT OR IGNORE INTO note_tags (tag, note_id) VALUES (?, ?)",
+                             [(t, note_id) for t in tags])
+        if self.fts:
+            conn.execute("INSERT INTO notes_fts (rowid, text, tags) VALUES (?, ?, ?)",
+                         (note_id, text, " ".join(tags)))
+        return {"id": note_id, "timestamp": ts, "text": text, "tags": tags}
+
+    def delete(self, note_id: int) -> bool:
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            cur = conn.execute("DELETE FROM notes WHERE id = ?", (note_id,))
+            if not cur.rowcount:
+                return False
+            conn.execute("DELETE FROM note_tags WHERE note_id = ?", (note_id,))
+            if self.fts:
+                conn.execute("DELETE FROM notes_fts WHERE rowid = ?", (note_id,))
+        return True
+
+    def delete_at(self, index: int) -> bool:
+        """Borra por posición en el listado (orden de inserción)."""
+        if index < 0:
+            return False
+        row = self._conn().execute("SELECT id FROM notes ORDER BY id LIMIT 1 OFFSET ?", (index,)).fetchone()
+        return self.delete(row["id"]) if row else False
+
+    def clear(self) -> None:
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM notes")
+            conn.execute("DELETE FROM note_tags")
+            if self.fts:
+                conn.execute("DELETE FROM notes_fts")
+
+    def backup(self, dest: Path) -> Path:
+        """Copia consistente de la base (API de backup de SQLite, incluye el WAL)."""
+        dest = Path(dest)
+        target = sqlite3.connect(dest)
+        try:
+            self._conn().backup(target)
+        finally:
+            target.close()
+        return dest
+
+    # ---- lectura ----
+
+    def _with_tags(self, rows) -> List[Dict[str, Any]]:
+        notes = [{"id": r["id"], "timestamp": r["ts"], "text": r["text"], "tags": []} for r in rows]
+        if notes:
+            by_id = {n["id"]: n for n in notes}
+            marks = ",".join("?" * len(by_id))
+            for r in self._conn().execute(
+                    f"SELECT note_id, tag FROM note_tags WHERE note_id IN ({marks})", list(by_id)):
+                by_id[r["note_id"]]["tags"].append(r["tag"])
+        return notes
+
+    def count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM notes").fetchone()[0]
+
+    def list_notes(self, limit: Optional[int] = None, offset: int = 0, since: Optional[str] = None,
+                   until: Optional[str] = None, tag: Optional[str] = None,
+                   after_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Notas en orden de inserción, filtradas por rango de ts [since, until), tag o id."""
+        where, args = [], []
+        if since is not None:
+            where.append("ts >= ?")
+            args.append(since)
+        if until is not None:
+            where.append("ts < ?")
+            args.append(until)
+        if after_id is not None:
+            where.append("id > ?")
+            args.append(after_id)
+        if tag is not None:
+            where.append("id IN (SELECT note_id FROM note_tags WHERE tag = ?)")
+            args.append(tag)
+        sql = "SELECT id, ts, text FROM notes"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY id LIMIT ? OFFSET ?"
+        args += [-1 if limit is None else limit, offset]
+        return self._with_tags(self._conn().execute(sql, args).fetchall())
+
+    def get_many(self, ids: List[int]) -> List[Dict[str, Any]]:
+        """Notas por id en el orden pedido (las borradas se omiten)."""
+        if not ids:
+            return []
+        marks = ",".join("?" * len(ids))
+        rows = self._conn().execute(f"SELECT id, ts, text FROM notes WHERE id IN ({marks})", list(ids)).fetchall()
+        by_id = {n["id"]: n for n in self._with_tags(rows)}
+        return [by_id[i] for i in ids if i in by_id]
+
+    @timed("memory.search")
+    def search(self, keyword: str, limit: Optional[int] = None, mode: str = "index",
+               offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        mode="index"     -> FTS5 sobre texto + tags, ordenado por BM25: cada palabra como
+                            prefijo y todas requeridas ("reun" encuentra "reunión");
+                            si no coincide ninguna nota, cae a "substring"
+        mode="substring" -> substring case-insensitive en texto o tags, orden de inserción
+        mode="semantic"  -> similitud de embeddings (services/vector_index.py)
+        mode="hybrid"    -> fusión de "index" y "semantic" por ranking recíproco
+        offset: resultados a saltear (páginas siguientes)
+        """
+        k = (keyword or "").strip().lower()
+        if not k:
+            return []
+        if mode in ("semantic", "hybrid"):
+            from services.vector_index import hybrid_search, semantic_search
+            fn = semantic_search if mode == "semantic" else hybrid_search
+            return fn(self, k, (10 if limit is None else limit) + offset)[offset:]
+        lim = -1 if limit is None else limit
+        if mode != "substring" and self.fts:
+            toks = _TOKEN_RE.findall(k)
+            if not toks:
+                return []
+            match = " AND ".join('"' + t.replace('"', '""') + '"*' for t in toks)
+            conn = self._conn()
+            rows = conn.execute(
+                "SELECT n.id, n.ts, n.text FROM notes_fts f JOIN notes n ON n.id = f.rowid "
+                "WHERE notes_fts MATCH ? ORDER BY bm25(notes_fts) LIMIT ? OFFSET ?", (match, lim, offset)).fetchall()
+            # la decisión depende solo de la consulta: todas las páginas usan el mismo modo
+            if rows or conn.execute("SELECT 1 FROM notes_fts WHERE notes_fts MATCH ? LIMIT 1", (match,)).fetchone():
+                return self._with_tags(rows)
+        rows = self._conn().execute(
+            "SELECT id, ts, text FROM notes WHERE instr(py_lower(text), ?) > 0 "
+            "OR id IN (SELECT note_id FROM note_tags WHERE instr(tag, ?) > 0) "
+            "ORDER BY id LIMIT ? OFFSET ?", (k, k, lim, offset)).fetchall()
+        return self._with_tags(rows)
+
+    # ---- migración ----
+
+    def import_legacy(self, paths: Optional[Iterable[Path]] = None) -> int:
+        """
+        Importa los memory_store.json antiguos y los renombra a *.imported.
+
+        Cada archivo va bajo su lock (otro worker que arranca a la vez espera y
+        lo encuentra ya importado) y en una sola transacción, que también anota
+        el archivo en legacy_imports: si el proceso muere antes del commit no
+        queda nada y se reintenta; si muere entre el commit y el rename, la
+        próxima vez solo se renombra.
+        """
+        total = 0
+        for path in (LEGACY_STORES if paths is None else paths):
+            path = Path(path)
+            # índice de palabras de la versión JSON: lo reemplazó FTS5, sin datos propios
+            path.with_name(LEGACY_INDEX).unlink(missing_ok=True)
+            if not path.exists():
+                continue
+            with file_lock(path):
+                if not path.exists():
+                    continue  # lo importó otro proceso mientras esperábamos
+                st = path.stat()
+                source = f"{path.resolve()}|{st.st_size}|{st.st_mtime_ns}"
+                conn = self._conn()
+                with conn:
+                    conn.execute("BEGIN IMMEDIATE")
+                    done = conn.execute("SELECT 1 FROM legacy_imports WHERE source = ?", (source,)).fetchone()
+                    if not done:
+                        raw = path.read_text(encoding="utf-8")
+                        data = json.loads(raw) if raw.strip() else {}
+                        fallback_ts = datetime.utcfromtimestamp(st.st_mtime).isoformat()
+                        for n in data.get("notes", []):
+                            if isinstance(n, str):
+                                self._insert(conn, n, (), fallback_ts, path.parent.name)
+                            else:
+                                self._insert(conn, n.get("text", ""), n.get("tags", []),
+                                             n.get("timestamp") or fallback_ts, path.parent.name)
+                            total += 1
+                        conn.execute("INSERT INTO legacy_imports (source) VALUES (?)", (source,))
+                path.rename(path.with_name(path.name + ".imported"))
+        return total
+
+
+_default: Optional[NoteStore] = None
+_default_lock = threading.Lock()
+
+
+def default_store() -> NoteStore:
+    """Almacén compartido del proceso (se crea en el primer uso)."""
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = NoteStore()
+    return _default
+
+
+def current_store() -> NoteStore:
+    """Notas del remitente en curso (su shard), o el almacén compartido."""
+    return shards.resolve("notes", default_store)
+
+
+shards.register_store("notes", lambda path: NoteStore(path / "notes.db"))
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["import"]:
+        n = default_store().import_legacy()
+        print(f"Importadas {n} notas a {DB_PATH}")
+    else:
+        print("Uso: python -m services.note_store import")
@@ -0,0 +1,235 @@
+"""
+outbound.py
+Envío de mensajes de WhatsApp por la API REST de Twilio.
+
+- Una sesión HTTP con pool de conexiones keep-alive (sin SDK de Twilio).
+- Token bucket por número de origen (TWILIO_MPS mensajes/s, ráfaga TWILIO_BURST).
+- Respuestas largas se parten en trozos de hasta MAX_BODY caracteres, cortando
+  en saltos de línea o espacios.
+- Reintentos solo cuando Twilio seguro no creó el mensaje: 429, 503 con
+  Retry-After y errores al conectar (el request no salió). Un timeout de
+  lectura, una conexión cortada o un 5xx pueden llegar después de que el
+  mensaje se creó: no se reintentan (la API no tiene clave de idempotencia
+  y el destinatario lo recibiría dos veces). Backoff exponencial con jitter
+  (o el Retry-After).
+- Envíos concurrentes entre destinatarios y en orden para cada uno
+  (KeyedWorkerPool con clave = destinatario).
+- Métricas: latencia de entrega (encolado -> último trozo), latencia por
+  request, enviados / reintentos / fallidos.
+
+TWILIO_API_BASE permite apuntar a un Twilio falso local (ver benchmarks/bench_outbound.py).
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError
+
+from services.metrics import LatencyStats, timed
+from services.pipeline import KeyedWorkerPool
+
+log = logging.getLogger(__name__)
+
+API_BASE = os.getenv("TWILIO_API_BASE", "https://api.twilio.com")
+MAX_BODY = 1600  # límite de Body de Twilio por mensaje
+
+
+def _not_sent(exc: requests.RequestException) -> bool:
+    """True si el error fue al conectar: el request no llegó a enviarse."""
+    if isinstance(exc, requests.ConnectTimeout):
+        return True
+    if not isinstance(exc, requests.ConnectionError) or isinstance(exc, requests.Timeout):
+        return False
+    # requests envuelve MaxRetryError(reason=NewConnectionError | NameResolutionError | ...)
+    reason = exc.args[0] if exc.args else None
+    reason = getattr(reason, "reason", reason)
+    return isinstance(reason, ConnectTimeoutError)
+
+
+def _retryable(resp: requests.Response) -> bool:
+    """429 (rechazado por límite) o 503 con Retry-After: Twilio no creó el mensaje."""
+    if resp.status_code == 429:
+        return True
+    return resp.status_code == 503 and bool(resp.headers.get("Retry-After"))
+
+
+class TokenBucket:
+    """rate tokens/s con capacidad burst; acquire() espera hasta tener un token."""
+
+    def __init__(self, rate: float, burst: float = 1.0, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = self.burst
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def _take(self) -> float:
+        """Toma un token si hay; si no, devuelve cuánto falta esperar."""
+        with self._lock:
+            now = self.clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return 0.0
+            return (1.0 - self._tokens) / self.rate
+
+    def acquire(self) -> float:
+        waited = 0.0
+        while True:
+            wait = self._take()
+            if not wait:
+                return waited
+            self.sleep(wait)
+            waited += wait
+
+
+def split_message(text: str, limit: int = MAX_BODY) -> List[str]:
+    """Parte text en trozos <= limit, prefiriendo cortar en párrafo, línea o espacio."""
+    parts = []
+    while len(text) > limit:
+        cut = -1
+        for sep in ("\n\n", "\n", " "):
+            cut = text.rfind(sep, 0, limit + 1)
+            if cut > limit // 2:
+                break
+        if cut <= 0:
+            cut = limit
+        parts.append(text[:cut].rstrip())
+        text = text[cut:].lstrip()
+    if text:
+        parts.append(text)
+    return parts
+
+
+class TwilioSender:
+    def __init__(self, account_sid: Optional[str], auth_token: Optional[str], from_number: Optional[str],
+                 base_url: str = API_BASE, rate: float = 10.0, burst: float = 10.0, max_retries: int = 4,
+                 backoff: float = 0.5, timeout: float = 10.0, workers: int = 8, queue_size: int = 1000):
+        self.account_sid = account_sid
+        self.from_number = from_number
+        self.url = f"{base_url.rstrip('/')}/2010-04-01/Accounts/{account_sid}/Messages.json"
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        self.session.auth = (account_sid, auth_token)
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=max(workers, 10))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self.pool = KeyedWorkerPool(workers, queue_size, name="outbound")
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._buckets_lock = threading.Lock()
+
+        self.delivery = LatencyStats()
+        self.requests = LatencyStats()
+        self.sent = 0
+        self.retries = 0
+        self.failed = 0
+
+    def _bucket(self, from_number: str) -> TokenBucket:
+        with self._buckets_lock:
+            b = self._buckets.get(from_number)
+            if b is None:
+                b = self._buckets[from_number] = TokenBucket(self.rate, self.burst)
+            return b
+
+    def _backoff(self, attempt: int, resp: Optional[requests.Response]) -> float:
+        retry_after = resp.headers.get("Retry-After") if resp is not None else None
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        # "full jitter": evita que todos los workers reintenten a la vez
+        return random.uniform(0, self.backoff * (2 ** attempt))
+
+    @timed("whatsapp.send")
+    def _post(self, body: str, to: str, from_number: str) -> str:
+        """Un mensaje (<= MAX_BODY); devuelve el SID o lanza tras agotar reintentos."""
+        data = {"From": from_number, "To": to, "Body": body}
+        for attempt in range(self.max_retries + 1):
+            self._bucket(from_number).acquire()
+            resp = None
+            start = time.monotonic()
+            try:
+                resp = self.session.post(self.url, data=data, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.max_retries or not _not_sent(e):
+                    raise
+            finally:
+                self.requests.observe(time.monotonic() - start)
+            if resp is not None and not _retryable(resp):
+                resp.raise_for_status()
+                self.sent += 1
+                return resp.json().get("sid", "")
+            if attempt == self.max_retries:
+                resp.raise_for_status()
+            self.retries += 1
+            time.sleep(self._backoff(attempt, resp))
+        raise RuntimeError("unreachable")
+
+    def send_now(self, message: str, to: str, from_number: Optional[str] = None) -> List[str]:
+        """Envía (bloqueante) todos los trozos en orden; devuelve sus SIDs."""
+        from_number = from_number or self.from_number
+        return [self._post(part, to, from_number) for part in split_message(message)]
+
+    def _deliver(self, message: str, to: str, from_number: Optional[str], enqueued: float) -> None:
+        try:
+            self.send_now(message, to, from_number)
+        except Exception:
+            self.failed += 1
+            log.exception("No se pudo enviar el mensaje a %s", to)
+        else:
+            self.delivery.observe(time.monotonic() - enqueued)
+
+    def send(self, message: str, to: str, from_number: Optional[str] = None) -> bool:
+        """Encola el envío (en orden para 'to'); False si la cola está llena."""
+        return self.pool.submit(to, self._deliver, message, to, from_number, time.monotonic())
+
+    def join(self) -> None:
+        self.pool.join()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sent": self.sent,
+            "retries": self.retries,
+            "failed": self.failed,
+            "delivery": self.delivery.snapshot(),
+            "requests": self.requests.snapshot(),
+            "queue": self.pool.stats(),
+        }
+
+
+_default: Optional[TwilioSender] = None
+_default_lock = threading.Lock()
+
+
+def default_sender() -> TwilioSender:
+    """Sender del proceso configurado por entorno (se crea en el primer envío)."""
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = TwilioSender(
+                    os.getenv("TWILIO_ACCOUNT_SID"),
+                    os.getenv("TWILIO_AUTH_TOKEN"),
+                    os.getenv("TWILIO_WHATSAPP_FROM"),
+                    rate=float(os.getenv("TWILIO_MPS", 10)),
+                    burst=float(os.getenv("TWILIO_BURST", 10)),
+                    workers=int(os.getenv("OUTBOUND_WORKERS", 8)),
+                )
+    return _default
@@ -0,0 +1,198 @@
+"""
+paging.py
+Respuestas largas por páginas (listados de agentes y notas, búsquedas).
+
+- Cada listado es un generador de (línea, cursor): el cursor dice dónde seguir
+  después de esa línea. Los generadores leen del almacenamiento por tandas
+  chicas (keyset / slice), así una página solo lee lo que muestra y no se arma
+  nunca el texto completo.
+- paginate() corta por cantidad (PAGE_ITEMS) y por bytes UTF-8 (PAGE_BYTES,
+  por defecto el máximo de un mensaje de WhatsApp) y, si queda algo, termina
+  con la pista para pedir la página siguiente con «más».
+- show(nombre, *args, page=N) muestra la página N y guarda (nombre, args,
+  cursor) en un archivo del remitente: pager.json en su shard, o
+  PAGER_DIR/<clave>.json sin shards. more() sigue exactamente desde ahí,
+  aunque el «más» caiga en otro worker de gunicorn. Sin remitente (CLI) el
+  estado queda en memoria del proceso. Vence a los PAGER_TTL segundos.
+- La página N sale de avanzar N-1 páginas con los mismos cortes (cantidad y
+  bytes): «listar notas 3» es lo mismo que dos «más». Cuesta proporcional a N.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from services import shards
+from services.context import current_sender
+from services.metrics import timed
+from services.storage import atomic_write_text, read_json
+
+# límite de Body de Twilio (services/outbound.MAX_BODY); en bytes cubre también los caracteres
+PAGE_BYTES = int(os.getenv("PAGE_BYTES", 1600))
+PAGE_ITEMS = int(os.getenv("PAGE_ITEMS", 20))
+PAGER_DIR = Path(os.getenv("PAGER_DIR") or Path(__file__).parent / "pager")
+PAGER_TTL = float(os.getenv("PAGER_TTL", 24 * 3600))
+# «listar agentes 99999999» no recorre millones de líneas para llegar ahí
+MAX_PAGE = 1000
+MORE = "más"
+NOTHING_MORE = "No hay nada más para mostrar."
+
+Line = Tuple[str, Any]
+
+
+class Page:
+    __slots__ = ("text", "cursor", "items", "number")
+
+    def __init__(self, text: str, cursor: Any, items: int, number: int):
+        self.text = text
+        self.cursor = cursor  # None: no hay página siguiente
+        self.items = items
+        self.number = number
+
+
+def _truncate(line: str, max_bytes: int) -> str:
+    raw = line.encode("utf-8")
+    if len(raw) <= max_bytes:
+        return line
+    return raw[:max(0, max_bytes - 3)].decode("utf-8", "ignore") + "…"
+
+
+def paginate(lines: Iterable[Line], header: Optional[str] = None, number: int = 1,
+             max_bytes: int = PAGE_BYTES, max_items: int = PAGE_ITEMS) -> Page:
+    """Toma líneas del generador hasta llenar la página (y una más para saber si sigue)."""
+    footer = f"\n… escribe «{MORE}» para ver la página {number + 1}"
+    budget = max_bytes - len(footer.encode("utf-8"))
+    out: List[str] = [header] if header else []
+    used = len(header.encode("utf-8")) if header else 0
+    cursor, count, pending = None, 0, False
+    for line, after in lines:
+        sep = 1 if out else 0
+        size = len(line.encode("utf-8")) + sep
+        if count >= max_items or (count and used + size > budget):
+            pending = True
+            break
+        if used + size > budget:
+            # una sola línea más larga que la página: se recorta para avanzar igual
+            line = _truncate(line, budget - used - sep)
+            size = len(line.encode("utf-8")) + sep
+        out.append(line)
+        used += size
+        cursor = after
+        count += 1
+    text = "\n".join(out) + (footer if pending else "")
+    return Page(text, cursor if pending else None, count, number)
+
+
+# -------- listados registrados --------
+
+class _Pager:
+    __slots__ = ("lines", "empty", "header")
+
+    def __init__(self, lines: Callable[..., Iterator[Line]], empty, header):
+        self.lines = lines
+        self.empty = empty
+        self.header = header
+
+
+_pagers: Dict[str, _Pager] = {}
+
+
+def register_pager(name: str, lines: Callable[..., Iterator[Line]], empty, header=None) -> None:
+    """
+    lines(cursor, *args) -> (línea, cursor siguiente)...: con cursor None
+    empieza desde el principio. empty / header: texto o fn(*args) -> texto.
+    """
+    _pagers[name] = _Pager(lines, empty, header)
+
+
+def _text(value, args) -> Optional[str]:
+    return value(*args) if callable(value) else value
+
+
+@timed("paging.render")
+def render(name: str, *args, page: int = 1, cursor: Any = None, number: int = 1) -> Page:
+    """Página 'page' (o la que sigue a 'cursor') del listado, sin guardar estado."""
+    pager = _pagers[name]
+    header = _text(pager.header, args)
+    if cursor is None:
+        # las páginas anteriores se recorren con los mismos cortes que «más»
+        number = 1
+        for _ in range(max(1, page) - 1):
+            cursor = paginate(pager.lines(cursor, *args), header, number=number).cursor
+            if cursor is None:
+                return Page(NOTHING_MORE, None, 0, number + 1)
+            number += 1
+    result = paginate(pager.lines(cursor, *args), header, number=number)
+    if result.items == 0:
+        result.text = _text(pager.empty, args) if number == 1 else NOTHING_MORE
+    return result
+
+
+# continuación sin remitente (CLI, main.py)
+_local_state: Optional[list] = None
+_local_lock = threading.Lock()
+
+
+def _state_path(sender: str) -> Path:
+    shard = shards.current_shard()
+    if shard is not None:
+        return shard.path / "pager.json"
+    return PAGER_DIR / f"{shards.shard_key(sender)}.json"
+
+
+def _save(state: Optional[list]) -> None:
+    global _local_state
+    sender = current_sender.get()
+    if not sender:
+        with _local_lock:
+            _local_state = state
+        return
+    path = _state_path(sender)
+    if state is None:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    atomic_write_text(path, json.dumps({"ts": time.time(), "state": state}, ensure_ascii=False))
+
+
+def _load() -> Optional[list]:
+    sender = current_sender.get()
+    if not sender:
+        return _local_state
+    raw = read_json(_state_path(sender), None)
+    if not raw or time.time() - raw.get("ts", 0) > PAGER_TTL:
+        return None
+    return raw["state"]
+
+
+def show(name: str, *args, page: int = 1) -> str:
+    """Página N del listado; si queda más, «más» continúa desde donde terminó."""
+    result = render(name, *args, page=page)
+    _save([name, list(args), result.cursor, result.number] if result.cursor is not None else None)
+    return result.text
+
+
+def more() -> str:
+    state = _load()
+    if not state:
+        return NOTHING_MORE
+    name, args, cursor, number = state
+    if name not in _pagers:
+        _save(None)
+        return NOTHING_MORE
+    result = render(name, *args, cursor=cursor, number=number + 1)
+    _save([name, args, result.cursor, result.number] if result.cursor is not None else None)
+    return result.text
+
+
+def parse_page(text: str) -> int:
+    """'3', 'página 3', 'pag 3 de 10' -> 3 (el primer número, entre 1 y MAX_PAGE); si no hay -> 1."""
+    m = re.search(r"\d+", text or "")
+    return min(max(int(m.group(0)), 1), MAX_PAGE) if m else 1
@@ -0,0 +1,176 @@
+"""
+pipeline.py
+Procesamiento en segundo plano de los mensajes entrantes de WhatsApp.
+
+El webhook solo parsea el form de Twilio y encola; un pool acotado de
+workers corre el router / búsqueda / audio y responde con send_whatsapp_reply.
+
+- Orden por remitente: cada 'From' cae siempre en la misma cola/worker.
+- Backpressure: si la cola está llena, submit() devuelve False (el webhook
+  contesta 503 y Twilio reintenta).
+- Si handle falla, el remitente recibe ERROR_REPLY: su entrada ya quedó en
+  el log de ingest y el reintento de Twilio se descarta, así que sin esa
+  respuesta el mensaje se perdería sin aviso.
+- Métricas: p50/p99 de espera en cola y de procesamiento.
+- Cada tarea corre con el contexto (remitente, request id) de quien la encoló.
+"""
+
+import contextvars
+import logging
+import queue
+import threading
+import time
+import zlib
+from typing import Any, Callable, Dict, Optional
+
+from services.context import current_request_id, sender_context
+from services.metrics import LatencyStats, request_trace, timed
+
+log = logging.getLogger(__name__)
+
+ERROR_REPLY = "⚠️ Hubo un error procesando tu mensaje. Intenta de nuevo en un momento."
+
+
+class KeyedWorkerPool:
+    """Workers con una cola acotada cada uno; la misma clave siempre va al mismo worker."""
+
+    def __init__(self, workers: int = 4, queue_size: int = 100, name: str = "worker"):
+        self.name = name
+        self._queues = [queue.Queue(maxsize=queue_size) for _ in range(max(1, workers))]
+        self._threads = []
+        self._start_lock = threading.Lock()
+        self.queue_wait = LatencyStats()
+        self.processing = LatencyStats()
+        self.rejected = 0
+        self.errors = 0
+
+    def _ensure_started(self) -> None:
+        # los threads se crean en el primer submit (después del fork de gunicorn)
+        if self._threads:
+            return
+        with self._start_lock:
+            if self._threads:
+                return
+            for i, q in enumerate(self._queues):
+                t = threading.Thread(target=self._loop, args=(q,), name=f"{self.name}-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def submit(self, key: str, fn: Callable, *args) -> bool:
+        self._ensure_started()
+        q = self._queues[zlib.crc32(key.encode("utf-8")) % len(self._queues)]
+        try:
+            q.put_nowait((time.monotonic(), contextvars.copy_context(), fn, args))
+        except queue.Full:
+            self.rejected += 1
+            return False
+        return True
+
+    def _loop(self, q: queue.Queue) -> None:
+        while True:
+            item = q.get()
+            if item is None:
+                q.task_done()
+                return
+            enqueued, ctx, fn, args = item
+            start = time.monotonic()
+            self.queue_wait.observe(start - enqueued)
+            try:
+                ctx.run(fn, *args)
+            except Exception:
+                self.errors += 1
+                log.exception("Error procesando tarea en %s (request %s)", self.name, ctx.get(current_request_id))
+            finally:
+                self.processing.observe(time.monotonic() - start)
+                q.task_done()
+
+    def join(self) -> None:
+        """Espera a que se vacíen todas las colas (útil en tests)."""
+        for q in self._queues:
+            q.join()
+
+    def shutdown(self) -> None:
+        for q in self._queues:
+            q.put(None)
+        for t in self._threads:
+            t.join()
+        self._threads = []
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": sum(q.qsize() for q in self._queues),
+            "rejected": self.rejected,
+            "errors": self.errors,
+            "queue_wait": self.queue_wait.snapshot(),
+            "processing": self.processing.snapshot(),
+        }
+
+
+def parse_twilio_form(form) -> Dict[str, Any]:
+    """Campos relevantes del webhook de Twilio."""
+    has_media = int(form.get("NumMedia", "0") or 0) > 0
+    return {
+        "sid": form.get("MessageSid", ""),
+        "from": form.get("From", ""),
+        "body": (form.get("Body") or "").strip(),
+        "media_url": form.get("MediaUrl0") if has_media else None,
+        "media_type": form.get("MediaContentType0") if has_media else None,
+    }
+
+
+def process_message(msg: Dict[str, Any]) -> Optional[str]:
+    """Audio -> texto, luego comandos del router o búsqueda inteligente."""
+    text = msg.get("body", "")
+    if msg.get("media_url") and (msg.get("media_type") or "").startswith("audio"):
+        from services.audio import transcribe_twilio_media
+        text = transcribe_twilio_media(msg["media_url"])
+        if not text:
+            return "No pude entender el audio 🎧"
+    if not text:
+        return None
+    from agents.router import current_tier, handle_text_command
+    from modules.web_search_module import handle_smart_query
+    return handle_text_command(text) or handle_smart_query(text, max_results=current_tier().search_results)
+
+
+def _send_reply(message: str, to_number: str) -> None:
+    from modules.whatsapp_module import send_whatsapp_reply
+    send_whatsapp_reply(message, to_number)
+
+
+class WhatsAppPipeline:
+    """
+    handle(msg) -> respuesta (o None); send(respuesta, to_number) la entrega.
+    Ambos se pueden reemplazar (p. ej. con un cliente Twilio falso en tests).
+    """
+
+    def __init__(self, handle: Callable = process_message, send: Callable = _send_reply,
+                 workers: int = 4, queue_size: int = 100):
+        self.handle = handle
+        self.send = send
+        self.pool = KeyedWorkerPool(workers, queue_size, name="whatsapp")
+
+    def submit(self, msg: Dict[str, Any]) -> bool:
+        return self.pool.submit(msg.get("from", ""), self._run, msg)
+
+    def _run(self, msg: Dict[str, Any]) -> None:
+        # el envío también queda dentro: la cola de salida hereda el request id
+        with request_trace(msg.get("sid") or None), sender_context(msg.get("from")):
+            try:
+                with timed("pipeline.handle"):
+                    reply = self.handle(msg)
+            except Exception:
+                self.pool.errors += 1
+                log.exception("Error procesando el mensaje %s", msg.get("sid"))
+                reply = ERROR_REPLY
+            if msg.get("from"):
+                # contexto reciente del remitente (y mantiene viva su sesión)
+                from services.sessions import default_sessions
+                session = default_sessions().get_or_create(msg["from"])
+                session.add_context("user", msg.get("body", ""))
+                session.add_context("bot", reply or "")
+            if reply:
+                self.send(reply, msg["from"])
+
+    def stats(self) -> Dict[str, Any]:
+        return self.pool.stats()
@@ -0,0 +1,129 @@
+"""
+profiler.py
+Perfilador por muestreo de los pedidos más lentos (opcional, PROFILE_SLOW=1).
+
+- Mientras un mensaje está en curso (metrics.request_trace) su thread queda
+  registrado; un thread aparte toma su stack cada PROFILE_INTERVAL segundos
+  con sys._current_frames() (sin instrumentar cada llamada).
+- Al terminar, si está entre los PROFILE_KEEP más lentos, se guardan sus
+  etapas (spans) y sus stacks en formato "folded" (a;b;c N), listos para
+  flamegraph.pl / speedscope.
+- report() los devuelve (ruta /debug/slow de app.py) y dump(path) los escribe.
+
+Apagado (por defecto) no hay thread ni costo: default_profiler() es None.
+"""
+
+import heapq
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", 0.005))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", 10))
+# profundidad máxima de cada stack muestreado
+MAX_DEPTH = 64
+
+
+def _folded(frame) -> str:
+    names = []
+    while frame is not None and len(names) < MAX_DEPTH:
+        code = frame.f_code
+        names.append(f"{Path(code.co_filename).stem}.{code.co_name}:{frame.f_lineno}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class SlowRequestProfiler:
+    def __init__(self, interval: float = PROFILE_INTERVAL, keep: int = PROFILE_KEEP):
+        self.interval = interval
+        self.keep = keep
+        self._active: Dict[int, Tuple[str, Counter]] = {}  # thread id -> (request id, stacks)
+        self._slowest: List[tuple] = []  # heap de (segundos, seq, registro)
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._sampler = None
+        self.samples = 0
+
+    def _ensure_sampler(self) -> None:
+        # el thread se crea en el primer pedido (después del fork de gunicorn)
+        if self._sampler is not None:
+            return
+        with self._lock:
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._loop, name="slow-profiler", daemon=True)
+                self._sampler.start()
+
+    def _loop(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            if not self._active:
+                continue
+            frames = sys._current_frames()
+            with self._lock:
+                active = list(self._active.items())
+            for tid, (_, stacks) in active:
+                frame = frames.get(tid)
+                if frame is not None:
+                    stacks[_folded(frame)] += 1
+                    self.samples += 1
+
+    def begin(self, request_id: str) -> Tuple[int, str, Counter]:
+        self._ensure_sampler()
+        tid = threading.get_ident()
+        stacks: Counter = Counter()
+        with self._lock:
+            self._active[tid] = (request_id, stacks)
+        return tid, request_id, stacks
+
+    def end(self, probe: Tuple[int, str, Counter], seconds: float, spans: List[Tuple[str, float]]) -> None:
+        tid, request_id, stacks = probe
+        with self._lock:
+            self._active.pop(tid, None)
+            if len(self._slowest) >= self.keep and seconds <= self._slowest[0][0]:
+                return
+            record = {"request_id": request_id, "seconds": round(seconds, 6), "at": time.time(),
+                      "spans": spans, "stacks": stacks}
+            item = (seconds, next(self._seq), record)
+            if len(self._slowest) < self.keep:
+                heapq.heappush(self._slowest, item)
+            else:
+                heapq.heapreplace(self._slowest, item)
+
+    def report(self, top_stacks: int = 20) -> List[Dict[str, Any]]:
+        """Pedidos más lentos primero, con sus etapas y stacks más frecuentes."""
+        with self._lock:
+            items = sorted(self._slowest, reverse=True)
+        out = []
+        for seconds, _, r in items:
+            out.append({
+                "request_id": r["request_id"],
+                "seconds": r["seconds"],
+                "at": r["at"],
+                "spans": [{"stage": s, "ms": round(t * 1000, 3)} for s, t in r["spans"]],
+                "stacks": [f"{stack} {n}" for stack, n in r["stacks"].most_common(top_stacks)],
+            })
+        return out
+
+    def dump(self, path: Path) -> None:
+        Path(path).write_text(json.dumps(self.report(top_stacks=1000), ensure_ascii=False, indent=2),
+                              encoding="utf-8")
+
+
+_default: Optional[SlowRequestProfiler] = None
+_default_lock = threading.Lock()
+
+
+def default_profiler() -> Optional[SlowRequestProfiler]:
+    """Perfilador del proceso, o None si PROFILE_SLOW no está activo."""
+    global _default
+    if _default is None and os.getenv("PROFILE_SLOW", "0") == "1":
+        with _default_lock:
+            if _default is None:
+                _default = SlowRequestProfiler()
+    return _default
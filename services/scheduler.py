@@ -0,0 +1,356 @@
+"""
+scheduler.py
+Planificador de tareas diarias por usuario, con zona horaria propia.
+
+- Un heap de (próxima ejecución, id): el loop duerme hasta la próxima tarea
+  (o hasta que se agregue una), sin sondear cada minuto.
+- Las tareas se ejecutan en un pool de workers (KeyedWorkerPool por usuario);
+  el loop nunca se bloquea con el trabajo de una tarea.
+- Persistencia: las tareas viven en un JSON (JOBS_PATH) en el disco local.
+  Lo comparten los procesos de una misma máquina (los workers de gunicorn de
+  un dyno), no distintas máquinas: en Heroku cada dyno tiene su propio disco.
+  La web agrega/cancela con lectura-modificación-escritura bajo lock y el loop
+  recarga cuando el archivo cambia. La próxima ejecución de las tareas
+  vencidas se guarda antes de encolarlas (una escritura por tanda): si el
+  proceso muere a mitad del envío, al volver no se reenvía. La última
+  ejecución correcta se guarda como mucho cada 'save_interval' s (una caída
+  en ese intervalo solo alarga la ventana del próximo resumen).
+- El loop corre dentro de la web, junto a las tareas y las notas que lee:
+  run_as_leader() deja que lo ejecute un solo worker (lock '<JOBS_PATH>.leader');
+  los demás esperan y toman el relevo si ese worker muere.
+- 'clock' es inyectable (FakeClock) para simular días en segundos.
+
+Handlers: register(kind, fn) con fn(job, now). Ver modules/automation_module.py.
+Sin gunicorn (una sola máquina), también como proceso aparte:
+    python -m modules.automation_module
+"""
+
+import atexit
+import heapq
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, time as dtime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from zoneinfo import ZoneInfo
+
+from services.pipeline import KeyedWorkerPool
+from services.storage import atomic_write_text, file_lock, file_version, read_json, try_hold_lock
+
+log = logging.getLogger(__name__)
+
+JOBS_PATH = Path(os.getenv("SCHEDULER_JOBS_PATH") or Path(__file__).parent / "jobs.json")
+DEFAULT_TZ = os.getenv("SCHEDULER_TZ", "UTC")
+# reintento si la cola de workers está llena
+RETRY_DELAY = 60.0
+# cada cuánto un worker que no es líder vuelve a intentar serlo
+LEADER_RETRY = 30.0
+
+
+class FakeClock:
+    """Reloj manual para simulaciones: now() devuelve lo que se fije con set/advance."""
+
+    def __init__(self, start: float = 0.0):
+        self.now = start
+
+    def __call__(self) -> float:
+        return self.now
+
+    def set(self, t: float) -> None:
+        self.now = t
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+class Job:
+    __slots__ = ("id", "user", "kind", "hour", "minute", "tz", "next_run", "last_run", "created")
+
+    def __init__(self, id: str, user: str, kind: str, hour: int, minute: int, tz: str,
+                 next_run: float = 0.0, last_run: Optional[float] = None, created: float = 0.0):
+        self.id = id
+        self.user = user
+        self.kind = kind
+        self.hour = hour
+        self.minute = minute
+        self.tz = tz
+        self.next_run = next_run
+        self.last_run = last_run
+        self.created = created
+
+    def next_after(self, t: float) -> float:
+        """Próximo HH:MM local (en self.tz) estrictamente posterior a t (epoch)."""
+        tz = ZoneInfo(self.tz)
+        day = datetime.fromtimestamp(t, tz).date()
+        for _ in range(3):
+            # combine + tz resuelve horarios de verano (horas inexistentes o repetidas)
+            cand = datetime.combine(day, dtime(self.hour, self.minute), tzinfo=tz).timestamp()
+            if cand > t:
+                return cand
+            day += timedelta(days=1)
+        return cand
+
+    def to_raw(self) -> Dict[str, Any]:
+        return {"user": self.user, "kind": self.kind, "hour": self.hour, "minute": self.minute, "tz": self.tz,
+                "next_run": self.next_run, "last_run": self.last_run, "created": self.created}
+
+    @classmethod
+    def from_raw(cls, job_id: str, raw: Dict[str, Any]) -> "Job":
+        return cls(job_id, raw["user"], raw["kind"], raw["hour"], raw["minute"], raw.get("tz", DEFAULT_TZ),
+                   raw.get("next_run", 0.0), raw.get("last_run"), raw.get("created", 0.0))
+
+
+class Scheduler:
+    def __init__(self, path: Optional[Path] = None, clock: Callable[[], float] = time.time,
+                 workers: int = 4, queue_size: int = 10000, save_interval: float = 5.0,
+                 poll_interval: float = 30.0):
+        self.path = Path(path) if path else None
+        self.clock = clock
+        self.save_interval = save_interval
+        self.poll_interval = poll_interval
+        self.pool = KeyedWorkerPool(workers, queue_size, name="scheduler")
+        self.handlers: Dict[str, Callable] = {}
+        self._jobs: Dict[str, Job] = {}
+        self._heap: List[tuple] = []  # (next_run, seq, job_id); entradas viejas se ignoran al salir
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._stamp = None
+        self._updates: Dict[str, tuple] = {}  # id -> (next_run, last_run) sin guardar
+        self._saved_at = 0.0
+        self._stopped = False
+        self._leader_fd: Optional[int] = None
+        self.runs = self.failures = self.retries = 0
+        if self.path:
+            with file_lock(self.path, shared=True):
+                self._reload_locked()
+
+    def register(self, kind: str, fn: Callable) -> None:
+        self.handlers[kind] = fn
+
+    # ---- tareas ----
+
+    def _push(self, job: Job) -> None:
+        heapq.heappush(self._heap, (job.next_run, next(self._seq), job.id))
+
+    def _reload_locked(self) -> None:
+        """Relee el archivo si cambió (con el lock de archivo tomado)."""
+        stamp = file_version(self.path)
+        if stamp == self._stamp:
+            return
+        with self._cond:
+            self._jobs = {jid: Job.from_raw(jid, raw) for jid, raw in read_json(self.path, {}).items()}
+            # lo que este proceso ya ejecutó y aún no guardó manda sobre el archivo
+            for jid, (next_run, last_run) in self._updates.items():
+                job = self._jobs.get(jid)
+                if job is not None:
+                    job.next_run, job.last_run = next_run, last_run
+            self._heap = [(j.next_run, next(self._seq), j.id) for j in self._jobs.values()]
+            heapq.heapify(self._heap)
+            self._stamp = stamp
+            self._cond.notify()
+
+    def _save_locked(self) -> None:
+        with self._cond:
+            data = {jid: j.to_raw() for jid, j in self._jobs.items()}
+            self._updates = {}
+        atomic_write_text(self.path, json.dumps(data))
+        self._stamp = file_version(self.path)
+        self._saved_at = self.clock()
+
+    def add_daily(self, user: str, hour: int, minute: int = 0, tz: str = DEFAULT_TZ,
+                  kind: str = "resumen", job_id: Optional[str] = None) -> Job:
+        """Agrega (o reemplaza) la tarea diaria HH:MM de 'user' en su zona horaria."""
+        return self.add_daily_many([(user, hour, minute, tz)], kind, [job_id])[0]
+
+    def add_daily_many(self, entries: Iterable[tuple], kind: str = "resumen",
+                       job_ids: Optional[List[Optional[str]]] = None) -> List[Job]:
+        """Como add_daily para muchas (user, hora, minuto, tz) con una sola escritura."""
+        now = self.clock()
+        jobs = []
+        for i, (user, hour, minute, tz) in enumerate(entries):
+            ZoneInfo(tz)  # valida la zona antes de guardar
+            job_id = job_ids[i] if job_ids else None
+            job = Job(job_id or f"{kind}:{user}", user, kind, int(hour), int(minute), tz, created=now)
+            job.next_run = job.next_after(now)
+            jobs.append(job)
+        if self.path:
+            with file_lock(self.path):
+                self._reload_locked()
+                for job in jobs:
+                    self._put(job)
+                self._save_locked()
+        else:
+            for job in jobs:
+                self._put(job)
+        return jobs
+
+    def _put(self, job: Job) -> None:
+        with self._cond:
+            old = self._jobs.get(job.id)
+            if old is not None:
+                # reprogramar no reinicia el resumen incremental
+                job.last_run, job.created = old.last_run, old.created
+            self._jobs[job.id] = job
+            self._push(job)
+            self._cond.notify()
+
+    def remove(self, job_id: str) -> bool:
+        if self.path:
+            with file_lock(self.path):
+                self._reload_locked()
+                with self._cond:
+                    found = self._jobs.pop(job_id, None) is not None
+                    self._updates.pop(job_id, None)
+                if found:
+                    self._save_locked()
+                return found
+        with self._cond:
+            return self._jobs.pop(job_id, None) is not None
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    def next_due(self) -> Optional[float]:
+        """Epoch de la próxima tarea (descarta entradas viejas del heap)."""
+        with self._cond:
+            while self._heap:
+                t, _, jid = self._heap[0]
+                job = self._jobs.get(jid)
+                if job is not None and job.next_run == t:
+                    return t
+                heapq.heappop(self._heap)
+        return None
+
+    # ---- ejecución ----
+
+    def run_pending(self) -> int:
+        """Encola en el pool todas las tareas vencidas y las reprograma. Devuelve cuántas."""
+        now = self.clock()
+        due = []
+        with self._cond:
+            while self._heap and self._heap[0][0] <= now:
+                t, _, jid = heapq.heappop(self._heap)
+                job = self._jobs.get(jid)
+                if job is None or job.next_run != t:
+                    continue
+                # si hubo caída, corre una vez y sigue con el próximo horario (sin ponerse al día)
+                job.next_run = job.next_after(now)
+                self._updates[jid] = (job.next_run, job.last_run)
+                self._push(job)
+                due.append(job)
+        if not due:
+            return 0
+        # en disco antes de enviar nada: una caída a mitad no repite los envíos
+        self.maybe_save(force=True)
+        n = 0
+        for job in due:
+            if self.pool.submit(job.user, self._execute, job, now):
+                n += 1
+                continue
+            with self._cond:
+                current = self._jobs.get(job.id, job)  # pudo recargarse del archivo al guardar
+                current.next_run = now + RETRY_DELAY
+                self.retries += 1
+                self._updates[job.id] = (current.next_run, current.last_run)
+                self._push(current)
+        return n
+
+    def _execute(self, job: Job, now: float) -> None:
+        fn = self.handlers.get(job.kind)
+        if fn is None:
+            log.warning("Tarea %s sin handler para '%s'", job.id, job.kind)
+            return
+        try:
+            fn(job, now)
+        except Exception:
+            self.failures += 1
+            log.exception("Falló la tarea %s", job.id)
+            return
+        with self._cond:
+            # 'last_run' solo avanza si salió bien: el próximo resumen cubre lo que faltó
+            current = self._jobs.get(job.id, job)  # pudo recargarse del archivo mientras corría
+            current.last_run = now
+            self._updates[job.id] = (current.next_run, now)
+            self.runs += 1
+
+    def maybe_save(self, force: bool = False) -> None:
+        if not self.path or not self._updates:
+            return
+        if not force and self.clock() - self._saved_at < self.save_interval:
+            return
+        with file_lock(self.path):
+            self._reload_locked()
+            self._save_locked()
+
+    def run_forever(self) -> None:
+        """Loop del proceso planificador: duerme hasta la próxima tarea o un cambio."""
+        if self.path:
+            atexit.register(self.maybe_save, True)
+        while not self._stopped:
+            if self.path:
+                with file_lock(self.path, shared=True):
+                    self._reload_locked()
+            self.run_pending()
+            self.maybe_save()
+            due = self.next_due()
+            timeout = self.poll_interval if due is None else max(0.0, min(due - self.clock(), self.poll_interval))
+            with self._cond:
+                if not self._stopped:
+                    self._cond.wait(timeout)
+
+    def run_as_leader(self, retry: float = LEADER_RETRY) -> None:
+        """
+        run_forever() en un solo proceso de la máquina: espera a tomar el lock de
+        líder (lo suelta el sistema si el proceso muere) y recién ahí corre el loop.
+        """
+        lock = self.path.with_name(self.path.name + ".leader") if self.path else None
+        while lock is not None and not self._stopped:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._leader_fd = try_hold_lock(lock)
+            if self._leader_fd is not None:
+                break
+            with self._cond:
+                if not self._stopped:
+                    self._cond.wait(retry)
+        self.run_forever()
+
+    def start(self, leader: bool = False) -> threading.Thread:
+        """Loop en un thread; con leader=True solo en el worker que gane el lock (run_as_leader)."""
+        t = threading.Thread(target=self.run_as_leader if leader else self.run_forever, name="scheduler", daemon=True)
+        t.start()
+        return t
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        self.pool.join()
+        self.maybe_save(force=True)
+        if self._leader_fd is not None:
+            os.close(self._leader_fd)
+            self._leader_fd = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"jobs": len(self._jobs), "runs": self.runs, "failures": self.failures,
+                "retries": self.retries, "leader": self._leader_fd is not None, "pool": self.pool.stats()}
+
+
+_default: Optional[Scheduler] = None
+_default_lock = threading.Lock()
+
+
+def default_scheduler() -> Scheduler:
+    """Planificador sobre JOBS_PATH (todos agregan/cancelan; el loop lo corre el worker líder)."""
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = Scheduler(JOBS_PATH, workers=int(os.getenv("SCHEDULER_WORKERS", 4)))
+    return _default
@@ -0,0 +1,106 @@
+"""
+search_engine.py
+Fan-out de búsquedas a varios backends en paralelo con deadline.
+
+- register(name, fn, kind)   -> fn(query, max_results, timeout) -> [hit, ...]  (hit = dict con "url")
+- search(query, kinds, ...)  -> {kind: [hits]} mezclados en orden de registro y sin duplicados
+- Los backends que no terminan antes del deadline se ignoran (resultados parciales).
+  Cada llamada recibe en 'timeout' los segundos que le quedan hasta el deadline
+  (para su cliente HTTP), así un backend colgado no retiene un worker del pool;
+  las que ni empezaron al vencer el deadline se cancelan.
+- stats()                    -> latencia p50/p99, errores y timeouts por backend
+"""
+
+import logging
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from services.metrics import LatencyStats
+
+log = logging.getLogger(__name__)
+
+
+class _Backend:
+    def __init__(self, name: str, fn: Callable, kind: str):
+        self.name = name
+        self.fn = fn
+        self.kind = kind
+        self.latency = LatencyStats()
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+
+
+class SearchEngine:
+    def __init__(self, deadline: float = 4.0, max_workers: int = 8,
+                 dedupe_key: Callable[[Dict[str, Any]], str] = lambda hit: hit["url"]):
+        self.deadline = deadline
+        self.dedupe_key = dedupe_key
+        self._backends: Dict[str, _Backend] = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="search")
+        self._lock = threading.Lock()
+
+    def register(self, name: str, fn: Callable, kind: str = "text") -> None:
+        self._backends[name] = _Backend(name, fn, kind)
+
+    def unregister(self, name: str) -> None:
+        self._backends.pop(name, None)
+
+    def _call(self, b: _Backend, query: str, max_results: int, end: float) -> List[Dict[str, Any]]:
+        start = time.monotonic()
+        if start >= end:
+            return []  # esperó en la cola hasta pasado el deadline
+        try:
+            return list(b.fn(query, max_results, timeout=end - start) or [])
+        except Exception:
+            with self._lock:
+                b.errors += 1
+            log.warning("Backend de búsqueda %s falló", b.name, exc_info=True)
+            return []
+        finally:
+            b.latency.observe(time.monotonic() - start)
+
+    def search(self, query: str, kinds: Iterable[str] = ("text",), max_results: int = 10,
+               deadline: Optional[float] = None) -> Dict[str, List[Dict[str, Any]]]:
+        kinds = tuple(kinds)
+        backends = [b for b in self._backends.values() if b.kind in kinds]
+        deadline = self.deadline if deadline is None else deadline
+        end = time.monotonic() + deadline
+        futures = {}
+        for b in backends:
+            with self._lock:
+                b.calls += 1
+            futures[self._executor.submit(self._call, b, query, max_results, end)] = b
+        done, pending = wait(futures, timeout=deadline)
+        for f in pending:
+            f.cancel()
+            with self._lock:
+                futures[f].timeouts += 1
+
+        out: Dict[str, List[Dict[str, Any]]] = {k: [] for k in kinds}
+        seen = {k: set() for k in kinds}
+        for f, b in futures.items():  # orden de registro = prioridad
+            if f not in done:
+                continue
+            for hit in f.result():
+                key = self.dedupe_key(hit)
+                if key in seen[b.kind]:
+                    continue
+                seen[b.kind].add(key)
+                out[b.kind].append(hit)
+        return out
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            name: {
+                "kind": b.kind,
+                "calls": b.calls,
+                "errors": b.errors,
+                "timeouts": b.timeouts,
+                "latency": b.latency.snapshot(),
+            }
+            for name, b in self._backends.items()
+        }
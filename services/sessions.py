@@ -0,0 +1,209 @@
+"""
+sessions.py
+Sesiones de conversación por remitente (el 'From' de Twilio), en memoria.
+
+- get(sender) / get_or_create(sender) -> O(1) (dict ordenado como LRU)
+- Cada sesión guarda el agente por defecto del remitente, sus últimos
+  mensajes (CONTEXT_SIZE, textos recortados a CONTEXT_CHARS).
+- Memoria acotada: como mucho max_sessions sesiones (se expulsa la menos
+  reciente) y las inactivas más de 'ttl' segundos se descartan.
+- Cada 'snapshot_interval' segundos un thread escribe las sesiones vivas a
+  disco (escritura atómica, mezclando con lo que dejaron los otros workers),
+  y al arrancar se recargan las que no vencieron.
+
+El registro de agentes sigue siendo la fuente de verdad de remitente -> agente
+(RegistryStore.find_owned); la sesión solo evita buscarlo en cada mensaje.
+"""
+
+import atexit
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from services.storage import JsonFile
+
+SESSIONS_PATH = Path(os.getenv("SESSIONS_PATH") or Path(__file__).parent / "sessions.json")
+CONTEXT_SIZE = 10
+CONTEXT_CHARS = 500
+
+
+class Session:
+    __slots__ = ("sender", "agent_id", "context", "last_seen")
+
+    def __init__(self, sender: str, agent_id: Optional[str] = None, last_seen: float = 0.0):
+        self.sender = sender
+        self.agent_id = agent_id
+        self.context = deque(maxlen=CONTEXT_SIZE)  # (rol, texto)
+        self.last_seen = last_seen
+
+    def add_context(self, role: str, text: str) -> None:
+        if text:
+            self.context.append((role, text[:CONTEXT_CHARS]))
+
+    def to_raw(self) -> Dict[str, Any]:
+        return {"agent_id": self.agent_id, "context": list(self.context), "last_seen": self.last_seen}
+
+    @classmethod
+    def from_raw(cls, sender: str, raw: Dict[str, Any]) -> "Session":
+        s = cls(sender, raw.get("agent_id"), raw.get("last_seen", 0.0))
+        s.context.extend(tuple(c) for c in raw.get("context", []))
+        return s
+
+
+class SessionStore:
+    def __init__(self, ttl: float = 1800.0, max_sessions: int = 10000, path: Optional[Path] = None,
+                 snapshot_interval: float = 30.0, clock: Callable[[], float] = time.time):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.path = Path(path) if path else None
+        self._file = JsonFile(self.path) if self.path else None
+        self.snapshot_interval = snapshot_interval
+        self.clock = clock
+        self._data: "OrderedDict[str, Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._snapshotter = None
+        self.hits = self.misses = self.expired = self.evictions = self.snapshots = 0
+        if self.path:
+            self.load()
+            atexit.register(self.snapshot)
+
+    # ---- acceso ----
+
+    def get(self, sender: str) -> Optional[Session]:
+        now = self.clock()
+        with self._lock:
+            s = self._data.get(sender)
+            if s is None:
+                self.misses += 1
+                return None
+            if now - s.last_seen > self.ttl:
+                del self._data[sender]
+                self.expired += 1
+                self.misses += 1
+                return None
+            s.last_seen = now
+            self._data.move_to_end(sender)
+            self.hits += 1
+            return s
+
+    def get_or_create(self, sender: str) -> Session:
+        s = self.get(sender)
+        if s is not None:
+            return s
+        with self._lock:
+            s = self._data.get(sender)
+            if s is None:
+                s = self._data[sender] = Session(sender, last_seen=self.clock())
+                while len(self._data) > self.max_sessions:
+                    self._data.popitem(last=False)
+                    self.evictions += 1
+        self._ensure_snapshotter()
+        return s
+
+    def drop(self, sender: str) -> None:
+        with self._lock:
+            self._data.pop(sender, None)
+
+    def sweep(self) -> int:
+        """Descarta las sesiones vencidas (las más viejas están al principio)."""
+        cutoff = self.clock() - self.ttl
+        n = 0
+        with self._lock:
+            while self._data:
+                sender, s = next(iter(self._data.items()))
+                if s.last_seen >= cutoff:
+                    break
+                del self._data[sender]
+                n += 1
+            self.expired += n
+        return n
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    # ---- snapshot ----
+
+    def _ensure_snapshotter(self) -> None:
+        # el thread se crea en el primer uso (después del fork de gunicorn)
+        if self._snapshotter is not None or not self.path:
+            return
+        with self._lock:
+            if self._snapshotter is not None:
+                return
+            self._snapshotter = threading.Thread(target=self._snapshot_loop, name="sessions-snapshot", daemon=True)
+            self._snapshotter.start()
+
+    def _snapshot_loop(self) -> None:
+        while True:
+            time.sleep(self.snapshot_interval)
+            try:
+                self.sweep()
+                self.snapshot()
+            except OSError:
+                pass  # se reintenta en la próxima vuelta
+
+    def snapshot(self) -> None:
+        """Escribe las sesiones vivas, conservando las más recientes de otros workers."""
+        if not self.path:
+            return
+        with self._lock:
+            mine = {sender: s.to_raw() for sender, s in self._data.items()}
+        if not mine:
+            return
+        cutoff = self.clock() - self.ttl
+
+        def merge(data):
+            for sender, raw in mine.items():
+                if raw["last_seen"] >= data.get(sender, {}).get("last_seen", 0.0):
+                    data[sender] = raw
+            live = sorted(((k, v) for k, v in data.items() if v.get("last_seen", 0.0) >= cutoff),
+                          key=lambda kv: kv[1]["last_seen"])[-self.max_sessions:]
+            data.clear()
+            data.update(live)
+
+        self._file.update(merge)
+        self.snapshots += 1
+
+    def load(self) -> None:
+        cutoff = self.clock() - self.ttl
+        data, _ = self._file.read()
+        with self._lock:
+            for sender, raw in sorted(data.items(), key=lambda kv: kv[1].get("last_seen", 0.0)):
+                if raw.get("last_seen", 0.0) >= cutoff:
+                    self._data[sender] = Session.from_raw(sender, raw)
+            while len(self._data) > self.max_sessions:
+                self._data.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "sessions": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "expired": self.expired,
+            "evictions": self.evictions,
+            "snapshots": self.snapshots,
+        }
+
+
+_default: Optional[SessionStore] = None
+_default_lock = threading.Lock()
+
+
+def default_sessions() -> SessionStore:
+    """Sesiones del proceso (se crean y recargan en el primer uso)."""
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = SessionStore(
+                    ttl=float(os.getenv("SESSION_TTL", 1800)),
+                    max_sessions=int(os.getenv("SESSION_MAX", 10000)),
+                    path=SESSIONS_PATH,
+                    snapshot_interval=float(os.getenv("SESSION_SNAPSHOT_INTERVAL", 30)),
+                )
+    return _default
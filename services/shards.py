@@ -0,0 +1,282 @@
+"""
+shards.py
+Datos por remitente: cada número de WhatsApp tiene su propio directorio con
+sus notas (notes.db) y su registro de agentes (registry.json + registry.log).
+
+    shards/<cubeta>/<clave>/
+        owner          -> el 'From' dueño del shard (para rebalancear)
+        notes.db       -> services/note_store.NoteStore
+        registry.json  -> agents/registry_store.RegistryStore
+
+- cubeta = crc32(From) % SHARD_BUCKETS y clave = sha1(From): el directorio
+  sale del número, sin tabla de asignación que consultar ni mantener.
+- Cada shard tiene sus propios índices y locks de archivo: escrituras de
+  remitentes distintos no compiten y cada lectura recorre solo los datos del
+  que pregunta.
+- resolve(nombre, fallback) devuelve el almacén del remitente en curso
+  (services/context.current_sender); sin remitente (CLI, main.py) o con
+  SHARDS=0, el almacén único de siempre. Así router, MemoryClient y
+  memory_module no cambian de firma.
+- Viene apagado (SHARDS=0): con datos en los archivos únicos, encenderlo sin
+  migrar antes los dejaría fuera de vista. Primero 'migrate', después SHARDS=1.
+- Los shards abiertos se guardan en un LRU (OPEN_SHARDS); al expulsar uno
+  se sueltan sus conexiones e índices en memoria y se reabre desde disco.
+  Con muchos remitentes activos por worker conviene subirlo, teniendo en
+  cuenta que cada shard con conexión abierta ocupa unos 3 descriptores.
+
+Migración de los archivos únicos (deja copias .bak-<fecha> de lo que vacía) y
+rebalanceo de cubetas, con los workers parados:
+    python -m services.shards migrate [--notes-owner whatsapp:+34...]
+    python -m services.shards rebalance --buckets 256
+    python -m services.shards stats
+"""
+
+import argparse
+import hashlib
+import os
+import shutil
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from services.context import current_sender
+from services.storage import atomic_write_text
+
+SHARDS_DIR = Path(os.getenv("SHARDS_DIR") or Path(__file__).parent / "shards")
+SHARD_BUCKETS = int(os.getenv("SHARD_BUCKETS", 64))
+OPEN_SHARDS = int(os.getenv("OPEN_SHARDS", 128))
+ENABLED = os.getenv("SHARDS", "0").lower() not in ("0", "false", "no", "")
+
+OWNER_FILE = "owner"
+
+# nombre -> fábrica(directorio del shard) -> almacén; cada módulo registra el suyo
+_factories: Dict[str, Callable[[Path], Any]] = {}
+
+
+def register_store(name: str, factory: Callable[[Path], Any]) -> None:
+    _factories[name] = factory
+
+
+def shard_key(sender: str) -> str:
+    return hashlib.sha1(sender.encode("utf-8")).hexdigest()[:20]
+
+
+def bucket_of(sender: str, buckets: int = SHARD_BUCKETS) -> int:
+    return zlib.crc32(sender.encode("utf-8")) % buckets
+
+
+def shard_path(root: Path, sender: str, buckets: int = SHARD_BUCKETS) -> Path:
+    return Path(root) / f"{bucket_of(sender, buckets):03d}" / shard_key(sender)
+
+
+class Shard:
+    __slots__ = ("sender", "path", "_stores", "_lock")
+
+    def __init__(self, sender: str, path: Path):
+        self.sender = sender
+        self.path = path
+        self._stores: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def store(self, name: str):
+        s = self._stores.get(name)
+        if s is None:
+            with self._lock:
+                s = self._stores.get(name)
+                if s is None:
+                    s = self._stores[name] = _factories[name](self.path)
+        return s
+
+
+class ShardMap:
+    def __init__(self, root: Path = SHARDS_DIR, buckets: int = SHARD_BUCKETS, capacity: int = OPEN_SHARDS):
+        self.root = Path(root)
+        self.buckets = buckets
+        self.capacity = capacity
+        self._open: "OrderedDict[str, Shard]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.opened = self.evictions = 0
+
+    def get(self, sender: str) -> Shard:
+        with self._lock:
+            shard = self._open.get(sender)
+            if shard is not None:
+                self._open.move_to_end(sender)
+                self.hits += 1
+                return shard
+        # crear el directorio fuera del lock (toca disco)
+        path = shard_path(self.root, sender, self.buckets)
+        owner = path / OWNER_FILE
+        if not owner.exists():
+            path.mkdir(parents=True, exist_ok=True)
+            atomic_write_text(owner, sender)
+        with self._lock:
+            shard = self._open.get(sender)
+            if shard is None:
+                shard = self._open[sender] = Shard(sender, path)
+                self.opened += 1
+                while len(self._open) > self.capacity:
+                    # quien lo esté usando conserva su referencia; al soltarla se cierran las conexiones
+                    self._open.popitem(last=False)
+                    self.evictions += 1
+            return shard
+
+    def __iter__(self) -> Iterator[Path]:
+        """Directorios de shard en disco (abiertos o no)."""
+        if not self.root.exists():
+            return
+        for bucket in sorted(self.root.iterdir()):
+            if bucket.is_dir():
+                for path in sorted(bucket.iterdir()):
+                    if (path / OWNER_FILE).exists():
+                        yield path
+
+    def stats(self) -> Dict[str, Any]:
+        return {"enabled": ENABLED, "open": len(self._open), "capacity": self.capacity,
+                "buckets": self.buckets, "hits": self.hits, "opened": self.opened,
+                "evictions": self.evictions}
+
+
+_default: Optional[ShardMap] = None
+_default_lock = threading.Lock()
+
+
+def default_shards() -> ShardMap:
+    """Shards del proceso (se abren en el primer uso)."""
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = ShardMap()
+    return _default
+
+
+def current_shard() -> Optional[Shard]:
+    """Shard del remitente en curso; None sin remitente o con SHARDS=0."""
+    sender = current_sender.get()
+    if not sender or not ENABLED:
+        return None
+    return default_shards().get(sender)
+
+
+def resolve(name: str, fallback: Callable[[], Any]):
+    """Almacén 'name' del remitente en curso, o fallback() (el almacén único)."""
+    shard = current_shard()
+    return fallback() if shard is None else shard.store(name)
+
+
+# -------- migración / rebalanceo --------
+
+def migrate(shards: ShardMap, registry, notes, notes_owner: Optional[str] = None) -> Dict[str, int]:
+    """
+    Reparte los archivos únicos: cada agente con dueño ("owner") pasa al shard
+    de ese remitente; los que no tienen dueño quedan donde están. Las notas no
+    guardan remitente: con notes_owner se mueven todas a su shard, si no se
+    dejan en la base única (las sigue viendo la CLI). Se puede repetir: los
+    agentes ya copiados no se duplican.
+
+    Antes de sacar nada de los archivos únicos se copian al lado
+    (registry.json.bak-<fecha>, notes.db.bak-<fecha>); sus rutas van en "backups".
+    """
+    by_owner: Dict[str, list] = {}
+    for aid, agent in registry.items():
+        if agent.get("owner"):
+            by_owner.setdefault(agent["owner"], []).append((aid, agent))
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    backups = []
+    if by_owner:
+        for path in (registry.snapshot, registry.log):
+            if path.exists():
+                backups.append(path.with_name(f"{path.name}.bak-{stamp}"))
+                shutil.copy2(path, backups[-1])
+    if notes_owner:
+        backups.append(notes.backup(notes.path.with_name(f"{notes.path.name}.bak-{stamp}")))
+    agents = 0
+    for owner, items in by_owner.items():
+        target = shards.get(owner).store("registry")
+        target.import_agents(items)
+        target.compact()
+        agents += len(items)
+    registry.remove_agents([aid for items in by_owner.values() for aid, _ in items])
+
+    moved = 0
+    if notes_owner:
+        target = shards.get(notes_owner).store("notes")
+        after = None
+        while True:
+            batch = notes.list_notes(limit=1000, after_id=after)
+            for n in batch:
+                target.add(n["text"], n["tags"], ts=n["timestamp"], source="migrate")
+                after = n["id"]
+            moved += len(batch)
+            if len(batch) < 1000:
+                break
+        notes.clear()
+    return {"senders": len(by_owner), "agents": agents, "notes": moved, "backups": [str(p) for p in backups]}
+
+
+def rebalance(root: Path, buckets: int) -> int:
+    """Mueve cada shard a la cubeta que le toca con 'buckets' cubetas. Devuelve cuántos movió."""
+    root = Path(root)
+    moved = 0
+    for path in list(ShardMap(root, buckets)):
+        sender = (path / OWNER_FILE).read_text(encoding="utf-8")
+        target = shard_path(root, sender, buckets)
+        if target == path:
+            continue
+        target.parent.mkdir(parents=True, exist_ok=True)
+        if target.exists():
+            raise RuntimeError(f"{target} ya existe (¿dos copias del shard de {sender}?)")
+        os.replace(path, target)
+        moved += 1
+    for bucket in root.iterdir():
+        if bucket.is_dir() and not any(bucket.iterdir()):
+            bucket.rmdir()
+    return moved
+
+
+def _dir_bytes(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.iterdir() if f.is_file())
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Shards por remitente (notas y agentes)")
+    ap.add_argument("--root", default=str(SHARDS_DIR))
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    m = sub.add_parser("migrate", help="reparte registry.json y notes.db por remitente")
+    m.add_argument("--notes-owner", help="remitente dueño de las notas existentes")
+    r = sub.add_parser("rebalance", help="cambia el número de cubetas")
+    r.add_argument("--buckets", type=int, required=True)
+    sub.add_parser("stats", help="shards y tamaño por cubeta")
+    args = ap.parse_args()
+
+    if args.cmd == "migrate":
+        from agents import router
+        from services.note_store import default_store
+        res = migrate(ShardMap(Path(args.root)), router.store, default_store(), args.notes_owner)
+        print(f"{res['agents']} agentes de {res['senders']} remitentes y {res['notes']} notas movidos a {args.root}")
+        for path in res["backups"]:
+            print(f"  copia de seguridad: {path}")
+        print("Para usarlos: SHARDS=1")
+    elif args.cmd == "rebalance":
+        n = rebalance(Path(args.root), args.buckets)
+        print(f"{n} shards movidos; ahora con SHARD_BUCKETS={args.buckets}")
+    else:
+        per_bucket: Dict[str, list] = {}
+        for path in ShardMap(Path(args.root)):
+            per_bucket.setdefault(path.parent.name, []).append(_dir_bytes(path))
+        total = sum(len(v) for v in per_bucket.values())
+        print(f"{total} shards en {len(per_bucket)} cubetas ({args.root})")
+        if per_bucket:
+            sizes = sorted(len(v) for v in per_bucket.values())
+            print(f"  shards por cubeta: min {sizes[0]}, max {sizes[-1]}; "
+                  f"{sum(map(sum, per_bucket.values())) / 1e6:.1f} MB en total")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,371 @@
+"""
+storage.py
+Utilidades compartidas de almacenamiento en archivos.
+
+- file_lock(path, shared=False)  -> lock advisory (fcntl.flock) sobre '<path>.lock'
+- try_hold_lock(path)            -> lock exclusivo sin esperar, tomado hasta que el proceso
+                                    muere (elección de un líder entre workers)
+- atomic_write_text(path, text)  -> escribe a un temporal y hace rename atómico
+- read_json(path, default)       -> carga JSON tolerando archivo vacío/inexistente
+- read_json_versioned / write_json_if
+                                 -> concurrencia optimista: se escribe solo si el
+                                    archivo no cambió desde que se leyó (VersionConflict).
+                                    La versión es una generación que va dentro del
+                                    JSON ({"__gen__": N, "data": ...}) y sube en cada
+                                    escritura: no se repite como (inode, mtime, tamaño).
+- file_version(path)             -> (inode, mtime_ns, tamaño): pista barata de cambio
+                                    para archivos sin generación
+- GroupCommit(path)              -> un fsync compartido para los appends que llegan juntos
+- JsonFile(path)                 -> lectura-modificación-escritura de un JSON entre
+                                    procesos: lectura cacheada por versión y updates
+                                    agrupados (un lock, una escritura y un fsync por lote)
+
+STORAGE_COMMIT_WINDOW (segundos, 0.002 por defecto) es cuánto espera el primero
+de un lote a que lleguen más cuando hay otros escritores en curso.
+"""
+
+import fcntl
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+COMMIT_WINDOW = float(os.getenv("STORAGE_COMMIT_WINDOW", 0.002))
+# STORAGE_FSYNC=0: los appends con GroupCommit no esperan al disco (desarrollo / benchmarks)
+FSYNC = os.getenv("STORAGE_FSYNC", "1") != "0"
+
+
+def lock_path_for(path: Path) -> Path:
+    path = Path(path)
+    return path.with_name(path.name + ".lock")
+
+
+@contextmanager
+def file_lock(path: Path, shared: bool = False) -> Iterator[None]:
+    """
+    Lock advisory entre procesos (p. ej. varios workers de gunicorn).
+    Usa un archivo '.lock' aparte para no interferir con renames del archivo real.
+    """
+    lp = lock_path_for(path)
+    fd = os.open(lp, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        yield
+    finally:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+
+def try_hold_lock(path: Path) -> Optional[int]:
+    """
+    Toma el lock exclusivo de 'path' sin esperar y lo deja tomado: devuelve el fd
+    (cerrarlo lo suelta; si el proceso muere lo suelta el sistema), o None si
+    otro proceso ya lo tiene.
+    """
+    fd = os.open(lock_path_for(path), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        return None
+    return fd
+
+
+def atomic_write_text(path: Path, text: str) -> None:
+    """Escribe 'text' en un temporal del mismo directorio y lo renombra encima de 'path'."""
+    path = Path(path)
+    fd, tmp = tempfile.mkstemp(prefix=path.name + ".", suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def read_json(path: Path, default: Any) -> Any:
+    """Carga JSON; si el archivo no existe o está vacío devuelve 'default'."""
+    try:
+        raw = Path(path).read_text(encoding="utf-8")
+    except FileNotFoundError:
+        return default
+    if not raw.strip():
+        return default
+    return json.loads(raw)
+
+
+# ---- versiones (concurrencia optimista) ----
+
+GEN_KEY = "__gen__"
+# la generación va al principio: para compararla basta leer unos bytes
+_GEN_RE = re.compile(rb'\{"__gen__": (\d+), "data": ')
+
+
+class VersionConflict(Exception):
+    """El archivo cambió desde que se leyó (otro proceso o thread escribió antes)."""
+
+
+def file_version(path: Path) -> Optional[Tuple[int, int, int]]:
+    """
+    (inode, mtime_ns, tamaño), o None si no existe. Solo una pista: un inode
+    reusado con el mismo mtime y tamaño da la misma tupla para otro contenido
+    (ABA). Para escribir condicionado, la generación de read_generation.
+    """
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+def read_generation(path: Path) -> Optional[int]:
+    """Generación del archivo leyendo solo su comienzo; None si no existe, 0 si no tiene."""
+    try:
+        with open(path, "rb") as f:
+            head = f.read(64)
+    except FileNotFoundError:
+        return None
+    m = _GEN_RE.match(head)
+    return int(m.group(1)) if m else 0
+
+
+def _load_versioned(path: Path, default: Any) -> Tuple[Any, Optional[int]]:
+    try:
+        raw = Path(path).read_text(encoding="utf-8")
+    except FileNotFoundError:
+        return default, None
+    if not raw.strip():
+        return default, 0
+    obj = json.loads(raw)
+    if isinstance(obj, dict) and GEN_KEY in obj and "data" in obj:
+        return obj["data"], obj[GEN_KEY]
+    return obj, 0  # formato anterior, sin generación
+
+
+def _write_versioned(path: Path, data: Any, gen: int) -> None:
+    atomic_write_text(path, json.dumps({GEN_KEY: gen, "data": data}, ensure_ascii=False))
+
+
+def read_json_versioned(path: Path, default: Any) -> Tuple[Any, Optional[int]]:
+    """(datos, generación) leídos con lock compartido, para un write_json_if posterior."""
+    with file_lock(path, shared=True):
+        return _load_versioned(path, default)
+
+
+def write_json_if(path: Path, data: Any, version: Optional[int]) -> int:
+    """
+    Escribe solo si el archivo sigue en 'version' (la de read_json_versioned);
+    si no, VersionConflict y el que llama relee y reintenta. Devuelve la versión nueva.
+    El cálculo de 'data' queda fuera del lock exclusivo.
+    """
+    with file_lock(path):
+        current = read_generation(path)
+        if current != version:
+            raise VersionConflict(str(path))
+        gen = (current or 0) + 1
+        _write_versioned(path, data, gen)
+        return gen
+
+
+# ---- group commit ----
+
+def fsync_path(path: Path) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class GroupCommit:
+    """
+    Un fsync compartido por todas las escrituras (appends) de un archivo que
+    llegan juntas dentro del proceso:
+
+        with file_lock(path):
+            f.write(...)
+            commit.written()
+        commit.sync()          # fuera del lock: otros pueden escribir mientras
+
+    El primero que llega a sync() hace el fsync para todos los que escribieron
+    hasta ese momento; los demás esperan. Si hay otros escritores en curso,
+    antes espera 'window' segundos para sumar los que estén por llegar (como
+    commit_delay de PostgreSQL); solo, no espera.
+    """
+
+    def __init__(self, path: Path, window: float = COMMIT_WINDOW):
+        self.path = Path(path)
+        self.window = window
+        self._cond = threading.Condition()
+        self._written = 0
+        self._synced = 0
+        self._leader = False
+        self._in_flight = 0
+        self.writes = self.syncs = 0
+
+    def written(self) -> None:
+        """Anota una escritura (llamar con el lock del archivo tomado)."""
+        if not FSYNC:
+            return
+        with self._cond:
+            self._written += 1
+            self._in_flight += 1
+            self.writes += 1
+
+    def sync(self) -> None:
+        """Espera a que todo lo escrito hasta ahora por este proceso esté en disco."""
+        if not FSYNC:
+            return
+        with self._cond:
+            target = self._written
+            try:
+                while self._synced < target:
+                    if not self._leader:
+                        self._leader = True
+                        self._cond.release()
+                        try:
+                            self._flush()
+                        finally:
+                            self._cond.acquire()
+                            self._leader = False
+                            self._cond.notify_all()
+                    else:
+                        self._cond.wait()
+            finally:
+                self._in_flight = max(0, self._in_flight - 1)
+
+    def _flush(self) -> None:
+        # sin el lock de la condición: el resto sigue escribiendo y anotando
+        if self.window and self._in_flight > 1:
+            time.sleep(self.window)
+        with self._cond:
+            upto = self._written
+        fsync_path(self.path)
+        with self._cond:
+            self._synced = max(self._synced, upto)
+            self.syncs += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {"writes": self.writes, "syncs": self.syncs}
+
+
+class _Update:
+    __slots__ = ("fn", "result", "error", "done")
+
+    def __init__(self, fn: Callable[[Any], Any]):
+        self.fn = fn
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.done = False
+
+
+class JsonFile:
+    """
+    Archivo JSON compartido entre procesos (lectura-modificación-escritura).
+
+    - read() -> (datos, versión): relee y parsea solo si la generación cambió
+      (no modificar lo devuelto).
+    - update(fn): fn(datos) modifica los datos en sitio; update devuelve lo que
+      devuelva fn. Las llamadas que llegan mientras otra escribe se aplican
+      juntas, en orden: un lock exclusivo, una lectura, una escritura atómica
+      y un fsync para todo el lote (con cola, se espera 'window' para sumar más).
+    - replace_if(datos, versión): escritura optimista (ver write_json_if).
+    """
+
+    def __init__(self, path: Path, default: Callable[[], Any] = dict, window: float = COMMIT_WINDOW):
+        self.path = Path(path)
+        self.default = default
+        self.window = window
+        self._cond = threading.Condition()
+        self._queue: List[_Update] = []
+        self._leader = False
+        self._data: Any = None
+        self._version: Optional[int] = None
+        self.updates = self.writes = self.conflicts = 0
+
+    def read(self) -> Tuple[Any, Optional[int]]:
+        version = read_generation(self.path)
+        with self._cond:
+            if version is not None and version == self._version:
+                return self._data, version
+        data, version = read_json_versioned(self.path, self.default())
+        with self._cond:
+            self._data, self._version = data, version
+        return data, version
+
+    def replace_if(self, data: Any, version: Optional[int]) -> int:
+        try:
+            new_version = write_json_if(self.path, data, version)
+        except VersionConflict:
+            self.conflicts += 1
+            raise
+        with self._cond:
+            self._data, self._version = data, new_version
+        return new_version
+
+    def update(self, fn: Callable[[Any], Any]) -> Any:
+        op = _Update(fn)
+        with self._cond:
+            self._queue.append(op)
+            self.updates += 1
+            while not op.done:
+                if self._leader:
+                    self._cond.wait()
+                    continue
+                self._leader = True
+                self._cond.release()
+                try:
+                    self._commit_batch()
+                finally:
+                    self._cond.acquire()
+                    self._leader = False
+                    self._cond.notify_all()
+        if op.error is not None:
+            raise op.error
+        return op.result
+
+    def _commit_batch(self) -> None:
+        with self._cond:
+            waiting = len(self._queue)
+        if self.window and waiting > 1:
+            # hay otros escritores en curso: espera a sumar los que estén por llegar
+            time.sleep(self.window)
+        with self._cond:
+            batch, self._queue = self._queue, []
+        try:
+            with file_lock(self.path):
+                data, gen = _load_versioned(self.path, self.default())
+                for op in batch:
+                    try:
+                        op.result = op.fn(data)
+                    except Exception as e:
+                        op.error = e
+                version = (gen or 0) + 1
+                _write_versioned(self.path, data, version)
+        except BaseException as e:
+            for op in batch:
+                if op.error is None:
+                    op.error = e
+            with self._cond:
+                for op in batch:
+                    op.done = True
+            raise
+        with self._cond:
+            self._data, self._version = data, version
+            self.writes += 1
+            for op in batch:
+                op.done = True
+
+    def stats(self) -> Dict[str, int]:
+        return {"updates": self.updates, "writes": self.writes, "conflicts": self.conflicts}
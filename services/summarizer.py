@@ -0,0 +1,91 @@
+"""
+summarizer.py
+Resumen extractivo de snippets: elige las oraciones más representativas.
+
+- Regex precompiladas; cada oración se tokeniza una sola vez.
+- Vectores TF-IDF dispersos (arrays de NumPy) y puntaje por centralidad:
+  similitud coseno de cada oración con el centroide de todas.
+- Top-k con heap y descarte de casi-duplicados por coseno.
+"""
+
+import heapq
+import re
+from typing import Dict, List
+
+import numpy as np
+
+_WS_RE = re.compile(r"\s+")
+_SENT_RE = re.compile(r"(?<=[.!?])\s+")
+_TOKEN_RE = re.compile(r"[a-záéíóúüñ0-9]{3,}")
+
+
+class Summarizer:
+    def __init__(self, min_len: int = 30, max_len: int = 220, dup_threshold: float = 0.8):
+        self.min_len = min_len
+        self.max_len = max_len
+        self.dup_threshold = dup_threshold
+
+    def sentences(self, snippets: List[str]) -> List[str]:
+        text = _WS_RE.sub(" ", " ".join(s for s in snippets if s)).strip()
+        if not text:
+            return []
+        return [p for p in _SENT_RE.split(text) if self.min_len <= len(p) <= self.max_len]
+
+    def summarize(self, snippets: List[str], max_items: int = 5) -> List[str]:
+        sents = self.sentences(snippets)
+        if not sents or max_items <= 0:
+            return []
+
+        # tokenización única -> pares (oración, término)
+        vocab: Dict[str, int] = {}
+        rows: List[int] = []
+        cols: List[int] = []
+        for i, s in enumerate(sents):
+            for tok in _TOKEN_RE.findall(s.lower()):
+                rows.append(i)
+                cols.append(vocab.setdefault(tok, len(vocab)))
+        n, v = len(sents), len(vocab)
+        if not v:
+            return sents[:max_items]
+
+        # matriz dispersa en formato coordenado, ordenada por oración
+        keys, tf = np.unique(np.asarray(rows, np.int64) * v + np.asarray(cols, np.int64), return_counts=True)
+        r, c = keys // v, keys % v
+        df = np.bincount(c, minlength=v)
+        idf = np.log((1.0 + n) / (1.0 + df)) + 1.0
+        w = tf * idf[c]
+        norms = np.sqrt(np.bincount(r, weights=w * w, minlength=n))
+        norms[norms == 0] = 1.0
+        w = w / norms[r]
+
+        # centralidad: producto con el centroide, en lote
+        centroid = np.bincount(c, weights=w, minlength=v) / n
+        scores = np.bincount(r, weights=w * centroid[c], minlength=n)
+        indptr = np.searchsorted(r, np.arange(n + 1))
+
+        heap = [(-scores[i], i) for i in range(n)]
+        heapq.heapify(heap)
+        chosen: List[int] = []
+        chosen_vecs: List[Dict[int, float]] = []
+        while heap and len(chosen) < max_items:
+            _, i = heapq.heappop(heap)
+            lo, hi = indptr[i], indptr[i + 1]
+            vec = dict(zip(c[lo:hi].tolist(), w[lo:hi].tolist()))
+            if any(_dot(vec, other) >= self.dup_threshold for other in chosen_vecs):
+                continue
+            chosen.append(i)
+            chosen_vecs.append(vec)
+        return [sents[i] for i in chosen]
+
+
+def _dot(a: Dict[int, float], b: Dict[int, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(x * b.get(k, 0.0) for k, x in a.items())
+
+
+_default = Summarizer()
+
+
+def summarize(snippets: List[str], max_items: int = 5) -> List[str]:
+    return _default.summarize(snippets, max_items)
@@ -0,0 +1,234 @@
+"""
+vector_index.py
+Búsqueda semántica de notas con un índice de vectores en disco (NumPy memmap).
+
+- HashingEmbedder: embeddings locales sin modelo (feature hashing de palabras y
+  trigramas sin acentos). Funciona offline; acerca variantes y palabras parecidas
+  ('cumpleaños' ~ 'cumple', 'mamá' ~ 'mama'), no traduce.
+- SentenceTransformerEmbedder: si está instalado sentence-transformers y se define
+  EMBEDDING_MODEL (p. ej. un modelo multilingüe), entiende sinónimos e idiomas.
+- VectorIndex: filas float32 añadidas en lote a un archivo; la búsqueda recorre el
+  memmap por bloques (coseno vectorizado + top-k), sin crear objetos por vector.
+  Por encima de ANN_THRESHOLD filas filtra antes con LSH (hiperplanos aleatorios,
+  16 bits por fila) y solo puntúa exacto a los candidatos.
+- semantic_search / hybrid_search sobre un NoteStore: el índice se pone al día
+  solo (notas con id mayor al último indexado) antes de cada consulta.
+"""
+
+import json
+import os
+import re
+import threading
+import unicodedata
+import zlib
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from services.metrics import timed
+from services.storage import atomic_write_text, file_lock, read_json
+
+ANN_THRESHOLD = int(os.getenv("VECTOR_ANN_THRESHOLD", 200_000))
+# fracción de filas que LSH deja como candidatas (se puntúan exacto)
+ANN_CANDIDATES = float(os.getenv("VECTOR_ANN_CANDIDATES", 0.02))
+CHUNK_ROWS = 65536
+SYNC_BATCH = 1000
+# similitud mínima para considerar una nota relacionada
+MIN_SCORE = float(os.getenv("VECTOR_MIN_SCORE", 0.15))
+
+_WORD_RE = re.compile(r"\w+")
+# bits en 1 de cada uint16 (para distancia de Hamming de los códigos LSH)
+_POPCOUNT = np.array([bin(i).count("1") for i in range(1 << 16)], dtype=np.uint8)
+
+
+def _fold(text: str) -> str:
+    text = unicodedata.normalize("NFKD", (text or "").lower())
+    return "".join(ch for ch in text if not unicodedata.combining(ch))
+
+
+class HashingEmbedder:
+    name = "hashing"
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+
+    def _features(self, text: str):
+        for w in _WORD_RE.findall(_fold(text)):
+            yield w, 1.0
+            if len(w) >= 4:
+                padded = f" {w} "
+                for i in range(len(padded) - 2):
+                    yield padded[i:i + 3], 0.5
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, t in enumerate(texts):
+            row = out[i]
+            for f, w in self._features(t):
+                h = zlib.crc32(f.encode("utf-8"))
+                row[h % self.dim] += w if h & 0x80000000 else -w
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return out / norms
+
+
+class SentenceTransformerEmbedder:
+    name = "st"
+
+    def __init__(self, model: str):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model)
+        self.name = f"st:{model}"
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        return self.model.encode(list(texts), normalize_embeddings=True).astype(np.float32)
+
+
+def default_embedder():
+    model = os.getenv("EMBEDDING_MODEL")
+    if model:
+        return SentenceTransformerEmbedder(model)
+    return HashingEmbedder(int(os.getenv("EMBEDDING_DIM", 256)))
+
+
+class VectorIndex:
+    """Archivos: <base>.vec (float32), <base>.vecids (int64), <base>.veclsh (uint16), <base>.vecmeta."""
+
+    NBITS = 16
+
+    def __init__(self, base: Path, embedder, ann_threshold: int = ANN_THRESHOLD):
+        base = Path(base)
+        self.embedder = embedder
+        self.dim = embedder.dim
+        self.ann_threshold = ann_threshold
+        self.vec_path = base.with_suffix(".vec")
+        self.ids_path = base.with_suffix(".vecids")
+        self.lsh_path = base.with_suffix(".veclsh")
+        self.meta_path = base.with_suffix(".vecmeta")
+        self.planes = np.random.default_rng(12345).standard_normal((self.dim, self.NBITS)).astype(np.float32)
+        self._check_meta()
+
+    def _check_meta(self) -> None:
+        meta = {"embedder": self.embedder.name, "dim": self.dim}
+        with file_lock(self.vec_path):
+            if read_json(self.meta_path, None) != meta:
+                # otro embedder/dimensión: el índice se reconstruye desde cero
+                for p in (self.vec_path, self.ids_path, self.lsh_path):
+                    p.unlink(missing_ok=True)
+                atomic_write_text(self.meta_path, json.dumps(meta))
+
+    def __len__(self) -> int:
+        def rows(path, width):
+            try:
+                return os.path.getsize(path) // width
+            except FileNotFoundError:
+                return 0
+        return min(rows(self.vec_path, self.dim * 4), rows(self.ids_path, 8), rows(self.lsh_path, 2))
+
+    def _codes(self, x: np.ndarray) -> np.ndarray:
+        bits = (x @ self.planes) > 0
+        return (bits * (1 << np.arange(self.NBITS))).sum(axis=1).astype(np.uint16)
+
+    def add(self, ids: Sequence[int], vectors: np.ndarray) -> None:
+        """Inserta un lote (append a los tres archivos; ids al final = fila completa)."""
+        if not len(ids):
+            return
+        x = np.ascontiguousarray(vectors, dtype=np.float32)
+        with file_lock(self.vec_path):
+            n = len(self)
+            # descarta restos de una escritura interrumpida
+            for path, width in ((self.vec_path, self.dim * 4), (self.lsh_path, 2), (self.ids_path, 8)):
+                if path.exists() and os.path.getsize(path) != n * width:
+                    os.truncate(path, n * width)
+            with open(self.vec_path, "ab") as f:
+                f.write(x.tobytes())
+            with open(self.lsh_path, "ab") as f:
+                f.write(self._codes(x).tobytes())
+            with open(self.ids_path, "ab") as f:
+                f.write(np.asarray(ids, dtype=np.int64).tobytes())
+
+    def last_id(self) -> int:
+        n = len(self)
+        if not n:
+            return 0
+        return int(np.memmap(self.ids_path, dtype=np.int64, mode="r", shape=(n,))[n - 1])
+
+    def search(self, query: np.ndarray, k: int = 10) -> List[Tuple[int, float]]:
+        n = len(self)
+        if not n or k <= 0:
+            return []
+        q = np.asarray(query, dtype=np.float32).reshape(-1)
+        vecs = np.memmap(self.vec_path, dtype=np.float32, mode="r", shape=(n, self.dim))
+        ids = np.memmap(self.ids_path, dtype=np.int64, mode="r", shape=(n,))
+
+        if n >= self.ann_threshold:
+            codes = np.memmap(self.lsh_path, dtype=np.uint16, mode="r", shape=(n,))
+            dist = _POPCOUNT[codes ^ self._codes(q[None, :])[0]]
+            # las ~ANN_CANDIDATES filas con menor distancia de Hamming
+            want = min(n, max(20 * k, int(n * ANN_CANDIDATES)))
+            rows = np.sort(np.argpartition(dist, want - 1)[:want])
+            scores = vecs[rows] @ q
+            top = np.argsort(-scores)[:k]
+            return [(int(ids[rows[i]]), float(scores[i])) for i in top]
+
+        best_rows = np.empty(0, dtype=np.int64)
+        best_scores = np.empty(0, dtype=np.float32)
+        for start in range(0, n, CHUNK_ROWS):
+            scores = vecs[start:start + CHUNK_ROWS] @ q
+            if len(scores) > k:
+                part = np.argpartition(-scores, k)[:k]
+            else:
+                part = np.arange(len(scores))
+            best_rows = np.concatenate([best_rows, part + start])
+            best_scores = np.concatenate([best_scores, scores[part]])
+        top = np.argsort(-best_scores)[:k]
+        return [(int(ids[best_rows[i]]), float(best_scores[i])) for i in top]
+
+    def sync(self, store) -> None:
+        """Indexa en lotes las notas nuevas del NoteStore."""
+        last = self.last_id()
+        while True:
+            notes = store.list_notes(limit=SYNC_BATCH, after_id=last)
+            if not notes:
+                return
+            texts = [n["text"] + " " + " ".join(n["tags"]) for n in notes]
+            self.add([n["id"] for n in notes], self.embedder.embed(texts))
+            last = notes[-1]["id"]
+
+
+_indexes: Dict[Path, VectorIndex] = {}
+_indexes_lock = threading.Lock()
+_sync_lock = threading.Lock()
+
+
+def index_for(store) -> VectorIndex:
+    """Índice vectorial asociado a un NoteStore (junto a su archivo .db)."""
+    with _indexes_lock:
+        idx = _indexes.get(store.path)
+        if idx is None:
+            idx = _indexes[store.path] = VectorIndex(store.path, default_embedder())
+        return idx
+
+
+@timed("memory.semantic")
+def semantic_search(store, query: str, limit: int = 10, min_score: float = MIN_SCORE) -> List[dict]:
+    idx = index_for(store)
+    with _sync_lock:
+        idx.sync(store)
+    hits = idx.search(idx.embedder.embed([query])[0], limit)
+    return store.get_many([i for i, score in hits if score >= min_score])
+
+
+def hybrid_search(store, query: str, limit: int = 10, k: int = 60) -> List[dict]:
+    """Fusión por ranking recíproco (RRF) de la búsqueda por palabras y la semántica."""
+    keyword = store.search(query, limit=limit * 2)
+    semantic = semantic_search(store, query, limit * 2)
+    scores: Dict[int, float] = {}
+    notes: Dict[int, dict] = {}
+    for ranked in (keyword, semantic):
+        for rank, n in enumerate(ranked):
+            scores[n["id"]] = scores.get(n["id"], 0.0) + 1.0 / (k + rank + 1)
+            notes[n["id"]] = n
+    return [notes[i] for i in sorted(scores, key=scores.get, reverse=True)[:limit]]
@@ -0,0 +1,31 @@
+"""
+Fixtures comunes: cada test corre con registro, historia, notas, shards,
+sesiones, páginas en curso, presupuesto y log de entrada en su propio
+directorio temporal, y sin LLM configurado.
+"""
+
+import pytest
+
+
+@pytest.fixture
+def isolated(tmp_path, monkeypatch):
+    from agents import base_agent, router
+    from agents.agent_cache import AgentCache
+    from agents.registry_store import RegistryStore
+    from services import ingest, llm, note_store, paging, sessions, shards
+    from services.budget import BudgetGuard
+
+    monkeypatch.delenv("LLM_BASE_URL", raising=False)
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    monkeypatch.setattr(llm, "_default", None)
+    monkeypatch.setattr(router, "store", RegistryStore(tmp_path / "registry.json"))
+    monkeypatch.setattr(router, "budget", BudgetGuard(monthly_limit=1e9))
+    monkeypatch.setattr(llm, "_budget", router.budget)
+    monkeypatch.setattr(router, "agent_cache", AgentCache())
+    monkeypatch.setattr(base_agent, "HISTORY_DIR", tmp_path / "history")
+    monkeypatch.setattr(note_store, "_default", note_store.NoteStore(tmp_path / "notes.db"))
+    monkeypatch.setattr(shards, "_default", shards.ShardMap(tmp_path / "shards"))
+    monkeypatch.setattr(ingest, "_default", ingest.IngestLog(tmp_path / "ingest"))
+    monkeypatch.setattr(sessions, "_default", sessions.SessionStore())
+    monkeypatch.setattr(paging, "PAGER_DIR", tmp_path / "pager")
+    return tmp_path
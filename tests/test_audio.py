@@ -0,0 +1,154 @@
+import io
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+from pydub import AudioSegment
+from pydub.generators import Sine
+
+from services import audio
+
+
+@pytest.fixture(autouse=True)
+def fresh_audio(monkeypatch):
+    monkeypatch.setattr(audio, "_instances", {})
+    monkeypatch.setattr(audio, "_pools", {})
+    monkeypatch.setenv("STT_BACKEND", "stub")
+    yield
+    for pool in audio._pools.values():
+        pool.shutdown(wait=True)
+
+
+def _speech(pattern):
+    """pattern: [(ms, con_voz)] -> tonos y silencios en 16 kHz mono."""
+    out = AudioSegment.silent(0, frame_rate=audio.SAMPLE_RATE)
+    for ms, voiced in pattern:
+        if voiced:
+            out += Sine(440, sample_rate=audio.SAMPLE_RATE).to_audio_segment(ms, volume=-6)
+        else:
+            out += AudioSegment.silent(ms, frame_rate=audio.SAMPLE_RATE)
+    return audio._normalize(out)
+
+
+def _wav(seconds, rate=44100, channels=2):
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(channels)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(b"\0\0" * channels * int(rate * seconds))
+    return buf.getvalue()
+
+
+class FakeResponse:
+    def __init__(self, body, ctype):
+        self.body = body
+        self.headers = {"Content-Type": ctype}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        for i in range(0, len(self.body), chunk_size):
+            yield self.body[i:i + chunk_size]
+
+
+class FakeHTTP:
+    def __init__(self, body, ctype="audio/x-wav; codec=pcm"):
+        self.body, self.ctype = body, ctype
+
+    def get(self, url, stream, timeout):
+        assert stream
+        return FakeResponse(self.body, self.ctype)
+
+
+def test_download_spools_to_disk_only_when_large(monkeypatch):
+    body = _wav(1.0)
+    monkeypatch.setattr(audio, "_http", lambda: FakeHTTP(body))
+    monkeypatch.setattr(audio, "SPOOL_MAX_BYTES", len(body) * 2)
+    buf, fmt = audio._download_media("https://api.twilio.com/x")
+    with buf:
+        assert fmt == "wav" and not buf._rolled and buf.read() == body
+    monkeypatch.setattr(audio, "SPOOL_MAX_BYTES", 1024)
+    buf, _ = audio._download_media("https://api.twilio.com/x")
+    with buf:
+        assert buf._rolled and buf.read() == body
+    # de punta a punta: 44.1 kHz estéreo -> 16 kHz mono -> stub
+    assert audio.transcribe_twilio_media("https://api.twilio.com/x") == "[1.0s]"
+
+
+def test_normalizes_once():
+    pcm = audio._to_pcm16k(io.BytesIO(_wav(0.5)), "wav")
+    assert (pcm.frame_rate, pcm.channels, pcm.sample_width) == (audio.SAMPLE_RATE, 1, audio.SAMPLE_WIDTH)
+    assert audio._normalize(pcm) is pcm
+    assert audio.transcribe_audio(AudioSegment.from_file(io.BytesIO(_wav(0.5)), format="wav")) == "[0.5s]"
+
+
+def test_splits_in_silences():
+    clip = _speech([(900, True), (600, False), (900, True), (600, False), (900, True)])
+    assert audio.split_on_silence_chunks(clip, max_chunk_ms=5000) == [clip]
+    chunks = audio.split_on_silence_chunks(clip, max_chunk_ms=2000)
+    assert len(chunks) == 3
+    assert sum(len(c) for c in chunks) == len(clip)
+    # cada corte cae en un silencio (mitad del tramo 900-1500 y 2400-3000)
+    assert 900 < len(chunks[0]) < 1500
+    # un tramo con voz sin silencios más largo que el máximo: corte duro
+    long_voice = _speech([(2500, True), (600, False), (500, True)])
+    assert max(len(c) for c in audio.split_on_silence_chunks(long_voice, max_chunk_ms=1000)) <= 1000
+
+
+def test_backend_choice(monkeypatch):
+    assert isinstance(audio.get_recognizer(), audio.StubRecognizer)
+    assert audio.get_recognizer() is audio.get_recognizer("stub")
+    assert isinstance(audio.get_recognizer("google"), audio.GoogleRecognizer)
+    with pytest.raises(KeyError):
+        audio.get_recognizer("no-existe")
+
+    class Echo(audio.Recognizer):
+        name = "echo"
+
+        def transcribe(self, pcm, sample_rate):
+            return "hola"
+
+    monkeypatch.setitem(audio.RECOGNIZERS, "echo", Echo)
+    assert audio.transcribe_audio(_speech([(500, True)]), backend="echo") == "hola"
+    assert audio.recognizer_stats()["echo"]["calls"] == 1
+
+
+def _short_chunks(monkeypatch):
+    split = audio.split_on_silence_chunks
+    monkeypatch.setattr(audio, "split_on_silence_chunks", lambda a: split(a, max_chunk_ms=1200))
+
+
+def test_chunks_run_in_process_pool(monkeypatch):
+    _short_chunks(monkeypatch)
+    monkeypatch.setattr(audio, "STT_WORKERS", 2)
+    clip = _speech([(600, True), (500, False), (600, True), (500, False), (600, True)])
+    # StubRecognizer es cpu_bound: va a procesos; el texto se une en orden
+    out = audio.transcribe_audio(clip)
+    assert isinstance(audio._pools[True], audio.ProcessPoolExecutor)
+    assert len(out.split()) == 3
+
+
+def test_falls_back_to_threads_without_processes(monkeypatch):
+    class BrokenPool:
+        def submit(self, *args):
+            raise BrokenProcessPool("sin procesos")
+
+        def shutdown(self, wait=True, cancel_futures=False):
+            pass
+
+    _short_chunks(monkeypatch)
+    audio._pools[True] = BrokenPool()
+    clip = _speech([(600, True), (500, False), (600, True)])
+    assert len(audio.transcribe_audio(clip).split()) == 2
+    # desde ahora los cpu_bound usan el pool de threads
+    assert audio._pools[True] is audio._pools[False]
+    assert isinstance(audio._pools[False], ThreadPoolExecutor)
@@ -0,0 +1,60 @@
+import threading
+
+import pytest
+
+from services import budget as budget_mod
+from services.budget import BudgetGuard
+
+
+def test_flush_writes_outside_lock(tmp_path, monkeypatch):
+    b = BudgetGuard(monthly_limit=10, ledger_dir=tmp_path, flush_interval=3600)
+    b.add_usage(1.0)
+    writing, release = threading.Event(), threading.Event()
+    real_fsync = budget_mod.os.fsync
+
+    def slow_fsync(fd):
+        writing.set()
+        release.wait(5)
+        real_fsync(fd)
+
+    monkeypatch.setattr(budget_mod.os, "fsync", slow_fsync)
+    t = threading.Thread(target=b.flush)
+    t.start()
+    assert writing.wait(5)
+    # con el disco "colgado" los mensajes siguen: anotar y consultar no esperan
+    done = threading.Event()
+    threading.Thread(target=lambda: (b.add_usage(2.0), b.check_mode(), done.set())).start()
+    assert done.wait(1)
+    assert b.current_usage == pytest.approx(3.0)  # el lote en vuelo sigue contando
+    release.set()
+    t.join()
+    assert b.current_usage == pytest.approx(3.0)
+    b.flush()
+    assert b.spend() == pytest.approx(3.0)
+    assert len((tmp_path / next(p.name for p in tmp_path.glob("ledger-*.jsonl"))).read_text().splitlines()) == 2
+
+
+def test_failed_flush_requeues(tmp_path, monkeypatch):
+    b = BudgetGuard(monthly_limit=10, ledger_dir=tmp_path, flush_interval=3600)
+    b.add_usage(1.0, op="a")
+
+    def fail(path):
+        raise OSError("disco lleno")
+
+    monkeypatch.setattr(budget_mod, "file_lock", fail)
+    with pytest.raises(OSError):
+        b.flush()
+    b.add_usage(2.0, op="b")
+    assert b.current_usage == pytest.approx(3.0)
+    monkeypatch.undo()
+    b.flush()
+    assert [r["op"] for r in b.records()] == ["a", "b"]
+
+
+def test_without_ledger_buffer_is_capped(monkeypatch):
+    monkeypatch.setattr(budget_mod, "MEMORY_RECORDS", 5)
+    b = BudgetGuard(monthly_limit=100)
+    for _ in range(20):
+        b.add_usage(1.0)
+    assert b.current_usage == pytest.approx(20.0)
+    assert len(list(b.records())) == 5
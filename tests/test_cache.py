@@ -0,0 +1,87 @@
+import threading
+import time
+
+import pytest
+
+from services.cache import TTLCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_ttl_expiry():
+    clock = Clock()
+    cache = TTLCache(clock=clock)
+    cache.set("hora", "12:00", ttl=60)
+    clock.now += 59
+    assert cache.get("hora") == "12:00"
+    clock.now += 1
+    assert cache.get("hora") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_lru_eviction():
+    cache = TTLCache(maxsize=2, clock=Clock())
+    cache.set("a", 1, 60)
+    cache.set("b", 2, 60)
+    cache.get("a")  # 'b' queda como la menos reciente
+    cache.set("c", 3, 60)
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, None, 3)
+    assert cache.stats()["evictions"] == 1
+
+
+def test_concurrent_misses_compute_once():
+    cache = TTLCache()
+    started, release = threading.Event(), threading.Event()
+    calls, results = [], []
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "respuesta"
+
+    def ask():
+        results.append(cache.get_or_compute("q", 60, slow))
+
+    leader = threading.Thread(target=ask)
+    leader.start()
+    started.wait(5)
+    waiters = [threading.Thread(target=ask) for _ in range(5)]
+    for t in waiters:
+        t.start()
+    deadline = time.time() + 5
+    while cache.stats()["coalesced"] < 5 and time.time() < deadline:
+        time.sleep(0.005)
+    release.set()
+    for t in [leader] + waiters:
+        t.join()
+    assert calls == [1] and results == ["respuesta"] * 6
+    assert cache.get_or_compute("q", 60, slow) == "respuesta"
+    assert cache.stats() == {"size": 1, "hits": 1, "misses": 1, "coalesced": 5, "evictions": 0}
+
+
+def test_none_and_errors_are_not_cached():
+    cache = TTLCache()
+    assert cache.get_or_compute("q", 60, lambda: None) is None
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute("q", 60, lambda: (_ for _ in ()).throw(RuntimeError("caído")))
+    assert cache.get_or_compute("q", 60, lambda: "ok") == "ok"
+    assert cache.stats()["misses"] == 3
+
+
+def test_persistence_merges_workers(tmp_path):
+    clock = Clock()
+    path = tmp_path / "cache.json"
+    w1, w2 = TTLCache(path=path, clock=clock), TTLCache(path=path, clock=clock)
+    w1.set("a", "uno", 60)
+    w2.set("b", "dos", 60)
+    fresh = TTLCache(path=path, clock=clock)
+    assert (fresh.get("a"), fresh.get("b")) == ("uno", "dos")
+    clock.now += 61
+    assert TTLCache(path=path, clock=clock).stats()["size"] == 0
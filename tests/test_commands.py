@@ -0,0 +1,72 @@
+from agents.commands import CommandTable
+
+
+def _table():
+    t = CommandTable()
+    t.register("buscar", lambda rest: f"buscar:{rest}")
+    t.register("buscar en memoria:", lambda rest: f"memoria:{rest}")
+    t.register("crear agente:", lambda name, desc, kind="base": f"{name}/{desc}/{kind}",
+               fields=(2, 3), usage="Uso: crear agente: <nombre> | <descripcion>")
+    t.register("más", lambda rest: "más")
+    return t
+
+
+def test_longest_prefix_wins():
+    t = _table()
+    assert t.dispatch("buscar en memoria: Factura") == "memoria:Factura"
+    assert t.dispatch("buscar recetas") == "buscar:recetas"
+
+
+def test_partial_longer_prefix_falls_back_to_shorter():
+    # "buscar en mem" empieza como el prefijo largo pero no lo completa
+    cmd, rest = _table().match("buscar en mem algo")
+    assert cmd.prefix == "buscar" and rest == " en mem algo"
+
+
+def test_case_insensitive_keeps_rest():
+    t = _table()
+    assert t.dispatch("  BUSCAR EN MEMORIA: Ana  ") == "memoria:Ana"
+    assert t.dispatch("MÁS") == "más"
+
+
+def test_fields_and_usage():
+    t = _table()
+    assert t.dispatch("crear agente: solo nombre") == "Uso: crear agente: <nombre> | <descripcion>"
+    assert t.dispatch("crear agente: a | b") == "a/b/base"
+    assert t.dispatch("crear agente: a | b | memory") == "a/b/memory"
+    # más de 'max' campos: no se pegan en el último, se responde el uso
+    assert t.dispatch("crear agente: a | b | c | d") == "Uso: crear agente: <nombre> | <descripcion>"
+
+
+def test_no_match_and_recompile():
+    t = _table()
+    assert t.dispatch("hola") is None
+    assert t.match("hola") == (None, "hola")
+    t.register("hola", lambda rest: "saludo")
+    assert t.dispatch("hola") == "saludo"
+    assert CommandTable().dispatch("buscar x") is None
+
+
+def test_many_commands_share_prefixes():
+    t = CommandTable()
+    for i in range(300):
+        t.register(f"cmd {i:03d}:", lambda rest, i=i: f"{i}:{rest}")
+    assert t.dispatch("cmd 042: x") == "42:x"
+    assert t.dispatch("cmd 299:") == "299:"
+    assert t.dispatch("cmd 300: x") is None
+
+
+def test_router_table_prefixes():
+    from agents import router
+    cases = {
+        "listar notas 3": ("listar notas", " 3"),
+        "listar agentes": ("listar agentes", ""),
+        "buscar en memoria: x": ("buscar en memoria:", " x"),
+        "buscar: x": ("buscar:", " x"),
+        "Más": ("más", ""),
+        "mas": ("mas", ""),
+    }
+    for text, (prefix, rest) in cases.items():
+        cmd, got = router.commands.match(text)
+        assert (cmd.prefix, got) == (prefix, rest), text
+    assert router.commands.match("hola jarvis")[0] is None
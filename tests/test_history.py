@@ -0,0 +1,50 @@
+import json
+from datetime import datetime, timedelta
+
+from agents import base_agent, router
+
+
+def _legacy_registry(path, n):
+    """Un agente 'base' con n entradas de historia distintas en el formato antiguo."""
+    t0 = datetime(2024, 1, 1)
+    history = [{"t": (t0 + timedelta(seconds=i)).isoformat(), "entry": {"i": i}} for i in range(n)]
+    agent = {"name": "A", "description": "d", "type": "base", "created_at": t0.isoformat(), "history": history}
+    path.write_text(json.dumps({"agent-1": agent}))
+
+
+def _segment(tmp_path):
+    path = tmp_path / "history" / "agent-1.jsonl"
+    return [json.loads(line) for line in path.read_text().splitlines()] if path.exists() else []
+
+
+def test_legacy_overflow_is_spilled_once(isolated):
+    _legacy_registry(isolated / "registry.json", 100)
+    router.run_agent("agent-1", "uno")
+    router.run_agent("agent-1", "dos")
+
+    segment = _segment(isolated)
+    assert len(segment) == 52
+    assert len({json.dumps(e) for e in segment}) == 52
+
+    a, _ = router.store.get_versioned("agent-1")
+    inst = router._instantiate("agent-1", a)
+    entries = list(inst.iter_history())
+    assert len(entries) == 102
+    assert [e.entry for e in entries[:100]] == [{"i": i} for i in range(100)]
+    assert [e.entry["task"] for e in entries[100:]] == ["uno", "dos"]
+
+
+def test_load_history_without_auto_spill_keeps_tail_only(isolated):
+    agent = base_agent.BaseAgent("A", "d")
+    agent.auto_spill = False
+    agent.load_history([[float(i), {"i": i}] for i in range(base_agent.HISTORY_LIMIT + 10)])
+    assert len(agent.history) == base_agent.HISTORY_LIMIT
+    assert agent.history[0].entry == {"i": 10}
+    assert not (isolated / "history").exists()
+
+
+def test_auto_spill_moves_overflow_to_segment(isolated):
+    agent = base_agent.BaseAgent("A", "d")
+    for i in range(base_agent.HISTORY_LIMIT + 3):
+        agent.add_history({"i": i})
+    assert [e.entry for e in agent.iter_history()] == [{"i": i} for i in range(base_agent.HISTORY_LIMIT + 3)]
@@ -0,0 +1,48 @@
+from services.ingest import IngestLog, SidIndex
+from services.scheduler import FakeClock
+
+DAY = 86400.0
+
+
+def _log(d, clock, retention):
+    return IngestLog(d, index=SidIndex(clock=clock), clock=clock, retention_days=retention)
+
+
+def _days(d):
+    return sorted(p.stem[len("ingest-"):] for p in d.glob("ingest-*.jsonl"))
+
+
+def test_retention_deletes_old_days_and_keeps_dedupe(tmp_path):
+    clock = FakeClock(1_700_000_000.0)
+    log = _log(tmp_path, clock, retention=5)
+    for i in range(20):
+        assert log.append({"sid": f"SM{i}", "from": "whatsapp:+1", "body": str(i)})
+        clock.advance(DAY)
+    assert len(_days(tmp_path)) == 5
+    # los locks de los días borrados también se van
+    assert {p.name[:-len(".lock")] for p in tmp_path.glob("*.lock")} <= {p.name for p in tmp_path.glob("*.jsonl")}
+    assert [r["sid"] for r in log.records()] == [f"SM{i}" for i in range(15, 20)]
+
+    # un worker nuevo rehace el índice con lo retenido: el reintento reciente se rechaza
+    other = _log(tmp_path, clock, retention=5)
+    assert not other.append({"sid": "SM19", "from": "whatsapp:+1", "body": "19"})
+    assert other.stats()["duplicates"] == 1
+
+
+def test_retention_never_below_dedupe_window(tmp_path):
+    clock = FakeClock(1_700_000_000.0)
+    log = _log(tmp_path, clock, retention=1)
+    log.append({"sid": "SM0", "from": "x", "body": "a"})
+    clock.advance(DAY)
+    log.append({"sid": "SM1", "from": "x", "body": "b"})
+    assert len(_days(tmp_path)) == 2
+    assert not log.append({"sid": "SM0", "from": "x", "body": "a"})
+
+
+def test_retention_zero_keeps_everything(tmp_path):
+    clock = FakeClock(1_700_000_000.0)
+    log = _log(tmp_path, clock, retention=0)
+    for i in range(10):
+        log.append({"sid": f"SM{i}", "from": "x", "body": "a"})
+        clock.advance(DAY)
+    assert len(_days(tmp_path)) == 10
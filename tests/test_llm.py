@@ -0,0 +1,52 @@
+from services import llm
+from services.budget import BudgetGuard
+
+
+def test_budget_bound_even_if_client_created_first(isolated, monkeypatch):
+    monkeypatch.setenv("LLM_BASE_URL", "http://127.0.0.1:9")
+    monkeypatch.setattr(llm, "_budget", None)
+    client = llm.default_llm()  # p. ej. el health check antes del primer agente
+    assert client.budget is None
+    budget = BudgetGuard(monthly_limit=1e9)
+    llm.attach_budget(budget)
+    assert llm.default_llm() is client
+    assert client.budget is budget
+
+
+def test_client_created_after_attach_uses_budget(isolated, monkeypatch):
+    monkeypatch.setenv("LLM_BASE_URL", "http://127.0.0.1:9")
+    budget = BudgetGuard(monthly_limit=1e9)
+    llm.attach_budget(budget)
+    assert llm.default_llm().budget is budget
+
+
+def test_web_cache_keyed_by_depth(monkeypatch):
+    from modules import web_search_module as ws
+    from services.cache import TTLCache
+    monkeypatch.setattr(ws, "_cache", TTLCache(maxsize=16))
+    calls = []
+    monkeypatch.setattr(ws, "_web_answer", lambda q, n: calls.append(n) or f"{n} resultados")
+    assert ws.web_answer("python", max_results=3) == "3 resultados"
+    assert ws.web_answer("python", max_results=10) == "10 resultados"
+    assert ws.web_answer("Python ", max_results=3) == "3 resultados"
+    assert calls == [3, 10]
+
+
+def test_llm_error_falls_back_to_echo(isolated, monkeypatch):
+    from agents import router
+    from services import llm
+
+    client = llm.LLMClient(base_url="http://llm.invalid", budget=router.budget, batch_window=0)
+
+    def down(path, payload):
+        client.errors += 1
+        raise llm.LLMError("LLM 502: bad gateway")
+
+    monkeypatch.setattr(client, "_post", down)
+    monkeypatch.setattr(llm, "_default", client)
+    aid = router.create_agent("Asistente", "ayuda", agent_type="base")
+    out = router.run_agent(aid, "hola")
+    assert out == "Asistente recibió la tarea: hola (modelo no disponible ahora)"
+    assert client.errors >= 1
+    # la instancia y su historia siguen en pie: otra tarea también responde
+    assert router.run_agent(aid, "otra").startswith("Asistente recibió la tarea: otra")
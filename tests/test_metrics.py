@@ -0,0 +1,50 @@
+import re
+
+from services.metrics import Registry
+
+
+def _samples(text, name):
+    out = []
+    for line in text.splitlines():
+        m = re.match(rf'{name}(?:\{{(.*)\}})? (\S+)$', line)
+        if m:
+            out.append((m.group(1) or "", float(m.group(2))))
+    return out
+
+
+def test_histogram_buckets_are_cumulative():
+    reg = Registry()
+    h = reg.histogram("t_seconds", "prueba", ("stage",), buckets=(0.1, 0.5, 1.0))
+    for v in (0.05, 0.1, 0.3, 0.7, 2.0, 5.0):
+        h.observe(v, "a")
+    h.observe(0.2, "b")
+    text = reg.render()
+    assert "# TYPE t_seconds histogram" in text
+    buckets = [(labels, v) for labels, v in _samples(text, "t_seconds_bucket") if 'stage="a"' in labels]
+    assert [lb.split("le=")[1] for lb, _ in buckets] == ['"0.1"', '"0.5"', '"1"', '"+Inf"']
+    counts = [v for _, v in buckets]
+    # acumulativos: nunca bajan y +Inf es el total
+    assert counts == [2, 3, 4, 6] and counts == sorted(counts)
+    assert _samples(text, "t_seconds_count") == [('stage="a"', 6), ('stage="b"', 1)]
+    assert _samples(text, "t_seconds_sum")[0][1] == sum((0.05, 0.1, 0.3, 0.7, 2.0, 5.0))
+
+
+def test_gauges_with_labels_and_broken_ones():
+    reg = Registry()
+    reg.gauge("t_queue", lambda: 3, "cola")
+    reg.gauge("t_calls", lambda: {"ddg_news": 2, "ddg_text": 5}, "por backend", labels=("backend",))
+    reg.gauge("t_broken", lambda: 1 / 0, "roto")
+    text = reg.render()
+    assert _samples(text, "t_queue") == [("", 3)]
+    assert _samples(text, "t_calls") == [('backend="ddg_news"', 2), ('backend="ddg_text"', 5)]
+    assert "t_broken" not in text
+
+
+def test_metrics_route_exports_stats(isolated):
+    from app import app
+    text = app.test_client().get("/metrics").get_data(as_text=True)
+    assert _samples(text, "jarvis_search_calls")
+    assert all(labels.startswith('backend="') for labels, _ in _samples(text, "jarvis_search_timeouts"))
+    for name in ("jarvis_search_cache_hits", "jarvis_agent_cache_misses", "jarvis_pipeline_queued"):
+        assert len(_samples(text, name)) == 1
+    assert "# TYPE jarvis_stt_rtf gauge" in text
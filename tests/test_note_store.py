@@ -0,0 +1,113 @@
+import json
+import threading
+
+import pytest
+
+from services import note_store as ns
+from services.note_store import NoteStore
+
+
+def _texts(notes):
+    return sorted(n["text"] for n in notes)
+
+
+def _store(tmp_path):
+    store = NoteStore(tmp_path / "notes.db")
+    for text, tags in (("reunión con el cliente", ["trabajo"]), ("reunir las facturas", []),
+                       ("comunión de Ana", ["familia"]), ("llamar al cliente", [])):
+        store.add(text, tags)
+    return store
+
+
+def test_index_search_matches_prefixes(tmp_path):
+    store = _store(tmp_path)
+    assert _texts(store.search("reun")) == sorted(["reunión con el cliente", "reunir las facturas"])
+    assert _texts(store.search("REUNIÓN")) == ["reunión con el cliente"]
+    assert _texts(store.search("trab")) == ["reunión con el cliente"]
+
+
+def test_index_search_requires_all_words(tmp_path):
+    store = _store(tmp_path)
+    assert _texts(store.search("reun cliente")) == ["reunión con el cliente"]
+    assert _texts(store.search("cliente")) == ["llamar al cliente", "reunión con el cliente"]
+
+
+def test_falls_back_to_substring(tmp_path):
+    store = _store(tmp_path)
+    # "unión" está dentro de palabras: FTS no lo encuentra, el substring sí
+    found = store.search("unión")
+    assert _texts(found) == _texts(store.search("unión", mode="substring"))
+    assert _texts(found) == ["comunión de Ana", "reunión con el cliente"]
+    # las páginas siguientes siguen con el mismo modo
+    assert [n["text"] for n in store.search("unión", limit=1, offset=1)] == [found[1]["text"]]
+    assert store.search("unión", limit=1, offset=2) == []
+
+
+def _legacy(tmp_path, n=5):
+    path = tmp_path / "memory_store.json"
+    path.write_text(json.dumps({"notes": [{"text": f"nota {i}", "tags": ["vieja"]} for i in range(n)]}),
+                    encoding="utf-8")
+    return path
+
+
+def test_legacy_import_runs_once_across_stores(tmp_path):
+    legacy = _legacy(tmp_path)
+    stale_index = tmp_path / ns.LEGACY_INDEX
+    stale_index.write_text("{}")
+    db = tmp_path / "notes.db"
+    stores = [NoteStore(db) for _ in range(4)]
+    totals = []
+    threads = [threading.Thread(target=lambda s=s: totals.append(s.import_legacy([legacy]))) for s in stores]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(totals) == [0, 0, 0, 5]
+    assert stores[0].count() == 5
+    assert not legacy.exists() and legacy.with_name("memory_store.json.imported").exists()
+    assert not stale_index.exists()
+
+
+def test_legacy_import_is_atomic(tmp_path, monkeypatch):
+    legacy = _legacy(tmp_path)
+    store = NoteStore(tmp_path / "notes.db")
+    real_insert = NoteStore._insert
+    calls = []
+
+    def flaky(self, *args):
+        calls.append(1)
+        if len(calls) == 3:
+            raise RuntimeError("crash")
+        return real_insert(self, *args)
+
+    monkeypatch.setattr(NoteStore, "_insert", flaky)
+    with pytest.raises(RuntimeError):
+        store.import_legacy([legacy])
+    # nada a medias y el archivo sigue ahí para reintentar
+    assert store.count() == 0 and legacy.exists()
+    monkeypatch.setattr(NoteStore, "_insert", real_insert)
+    assert store.import_legacy([legacy]) == 5
+    assert store.count() == 5
+
+
+def test_legacy_import_after_commit_only_renames(tmp_path, monkeypatch):
+    legacy = _legacy(tmp_path)
+    store = NoteStore(tmp_path / "notes.db")
+    real_rename = type(legacy).rename
+    # se cae entre el commit y el rename
+    monkeypatch.setattr(type(legacy), "rename", lambda self, target: (_ for _ in ()).throw(OSError("crash")))
+    with pytest.raises(OSError):
+        store.import_legacy([legacy])
+    monkeypatch.setattr(type(legacy), "rename", real_rename)
+    assert store.import_legacy([legacy]) == 0
+    assert store.count() == 5 and not legacy.exists()
+
+
+def test_default_store_imports_legacy_on_open(tmp_path, monkeypatch):
+    legacy = _legacy(tmp_path, n=2)
+    monkeypatch.setattr(ns, "DB_PATH", tmp_path / "notes.db")
+    monkeypatch.setattr(ns, "LEGACY_STORES", [legacy])
+    store = NoteStore(ns.DB_PATH)
+    assert store.count() == 2
+    # otra apertura (otro worker) no vuelve a importar
+    assert NoteStore(ns.DB_PATH).count() == 2
@@ -0,0 +1,60 @@
+import pytest
+import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError, ProtocolError
+
+from services.outbound import TwilioSender
+
+
+class FakeSession:
+    """Devuelve (o lanza) lo que se le indique, en orden; cuenta los POST."""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.posts = 0
+
+    def post(self, url, data=None, timeout=None):
+        self.posts += 1
+        out = self.outcomes.pop(0)
+        if isinstance(out, Exception):
+            raise out
+        resp = requests.Response()
+        resp.status_code, headers = out
+        resp.headers.update(headers)
+        resp._content = b'{"sid": "SM1"}'
+        return resp
+
+
+def _sender(session):
+    s = TwilioSender("AC", "tok", "whatsapp:+1", backoff=0.0)
+    s.session = session
+    return s
+
+
+def _refused():
+    return requests.ConnectionError(MaxRetryError(None, "/", NewConnectionError(None, "refused")))
+
+
+@pytest.mark.parametrize("first", [
+    _refused(),
+    requests.ConnectTimeout("connect"),
+    (429, {}),
+    (503, {"Retry-After": "0"}),
+])
+def test_retries_when_message_was_not_created(first):
+    session = FakeSession(first, (201, {}))
+    assert _sender(session).send_now("hola", "whatsapp:+2") == ["SM1"]
+    assert session.posts == 2
+
+
+@pytest.mark.parametrize("first", [
+    requests.ReadTimeout("read"),
+    requests.ConnectionError(ProtocolError("Connection aborted.", ConnectionResetError())),
+    (500, {}),
+    (502, {}),
+    (503, {}),
+])
+def test_no_retry_when_message_may_exist(first):
+    session = FakeSession(first, (201, {}))
+    with pytest.raises(requests.RequestException):
+        _sender(session).send_now("hola", "whatsapp:+2")
+    assert session.posts == 1
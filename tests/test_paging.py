@@ -0,0 +1,57 @@
+import pytest
+
+from services import paging, sessions, shards
+from services.context import sender_context
+
+
+@pytest.fixture
+def long_lines(isolated):
+    # líneas de tamaño variable: unas páginas se cortan por bytes, otras por cantidad
+    sizes = [10 if i % 7 else 400 for i in range(200)]
+
+    def lines(cursor):
+        for i in range(cursor or 0, len(sizes)):
+            yield f"{i:03d} " + "x" * sizes[i], i + 1
+
+    paging.register_pager("_test", lines, "vacío")
+    yield
+    del paging._pagers["_test"]
+
+
+def _numbers(text):
+    return [line[:3] for line in text.splitlines() if line[:3].isdigit()]
+
+
+@pytest.mark.parametrize("sharded", [False, True])
+def test_page_n_matches_more(long_lines, monkeypatch, sharded):
+    monkeypatch.setattr(shards, "ENABLED", sharded)
+    with sender_context("whatsapp:+1"):
+        pages = [paging.show("_test")]
+        while "«más»" in pages[-1]:
+            pages.append(paging.more())
+        assert len(pages) > 3
+        for n in (2, 3, len(pages)):
+            assert paging.show("_test", page=n) == pages[n - 1]
+        assert paging.show("_test", page=len(pages) + 1) == paging.NOTHING_MORE
+        seen = [x for p in pages for x in _numbers(p)]
+        assert seen == [f"{i:03d}" for i in range(200)]
+
+
+def test_more_survives_other_worker(long_lines, monkeypatch):
+    with sender_context("whatsapp:+1"):
+        first = paging.show("_test")
+        # otro worker: sesiones y estado en memoria propios
+        monkeypatch.setattr(sessions, "_default", sessions.SessionStore())
+        monkeypatch.setattr(paging, "_local_state", None)
+        second = paging.more()
+    assert _numbers(second)[0] == f"{int(_numbers(first)[-1]) + 1:03d}"
+    with sender_context("whatsapp:+2"):
+        assert paging.more() == paging.NOTHING_MORE
+
+
+def test_parse_page_takes_first_number():
+    assert paging.parse_page("") == 1
+    assert paging.parse_page("página 3") == 3
+    assert paging.parse_page("página 3 de 10") == 3
+    assert paging.parse_page("pag 0") == 1
+    assert paging.parse_page("99999999") == paging.MAX_PAGE
@@ -0,0 +1,82 @@
+import threading
+import time
+
+from services.pipeline import ERROR_REPLY, WhatsAppPipeline
+
+
+class FakeTwilio:
+    """send(respuesta, to) como send_whatsapp_reply, guardando lo enviado."""
+
+    def __init__(self):
+        self.sent = []
+        self._lock = threading.Lock()
+
+    def __call__(self, text, to):
+        with self._lock:
+            self.sent.append((to, text))
+
+    def to(self, number):
+        return [text for to, text in self.sent if to == number]
+
+
+def _msg(sender, body, n):
+    return {"sid": f"SM{sender}{n}", "from": sender, "body": body}
+
+
+def test_replies_in_order_per_sender(isolated):
+    twilio = FakeTwilio()
+
+    def handle(msg):
+        time.sleep(0.001 * (hash(msg["body"]) % 3))
+        return f"eco {msg['body']}"
+
+    pipeline = WhatsAppPipeline(handle=handle, send=twilio, workers=4)
+    senders = [f"whatsapp:+{i}" for i in range(6)]
+    for n in range(20):
+        for s in senders:
+            assert pipeline.submit(_msg(s, str(n), n))
+    pipeline.pool.join()
+    for s in senders:
+        assert twilio.to(s) == [f"eco {n}" for n in range(20)]
+
+
+def test_error_in_handle_sends_error_reply(isolated):
+    twilio = FakeTwilio()
+
+    def handle(msg):
+        if msg["body"] == "falla":
+            raise RuntimeError("boom")
+        return "ok"
+
+    pipeline = WhatsAppPipeline(handle=handle, send=twilio, workers=1)
+    pipeline.submit(_msg("whatsapp:+1", "falla", 0))
+    pipeline.submit(_msg("whatsapp:+1", "sigue", 1))
+    pipeline.pool.join()
+    assert twilio.to("whatsapp:+1") == [ERROR_REPLY, "ok"]
+    assert pipeline.stats()["errors"] == 1
+
+
+def test_webhook_answers_503_when_queue_is_full(isolated, monkeypatch):
+    import app as webapp
+
+    release = threading.Event()
+    twilio = FakeTwilio()
+    pipeline = WhatsAppPipeline(handle=lambda msg: release.wait(5) and "ok", send=twilio,
+                                workers=1, queue_size=1)
+    monkeypatch.setattr(webapp, "pipeline", pipeline)
+    client = webapp.app.test_client()
+
+    def post(sid):
+        return client.post("/whatsapp", data={"MessageSid": sid, "From": "whatsapp:+1", "Body": "hola"})
+
+    assert post("SM1").status_code == 200   # lo toma el worker
+    time.sleep(0.05)
+    assert post("SM2").status_code == 200   # queda en la cola
+    busy = post("SM3")
+    assert busy.status_code == 503 and busy.headers["Retry-After"] == "5"
+    # el reintento del 503 vuelve a entrar (no se toma como repetido)
+    release.set()
+    pipeline.pool.join()
+    assert post("SM3").status_code == 200
+    pipeline.pool.join()
+    assert twilio.to("whatsapp:+1") == ["ok", "ok", "ok"]
@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+from agents import registry_store
+from agents.registry_store import RegistryStore
+
+
+def _history(path, aid="a1"):
+    return RegistryStore(path).get(aid)["history"]
+
+
+def _crash_before_log_reset(monkeypatch):
+    """La compactación muere justo después de escribir el snapshot nuevo."""
+    real = registry_store.atomic_write_text
+
+    def write(path, text):
+        if str(path).endswith(".log"):
+            raise KeyboardInterrupt("crash")
+        real(path, text)
+
+    monkeypatch.setattr(registry_store, "atomic_write_text", write)
+    return lambda: monkeypatch.setattr(registry_store, "atomic_write_text", real)
+
+
+def test_interrupted_compaction_does_not_replay_log(tmp_path, monkeypatch):
+    path = tmp_path / "registry.json"
+    store = RegistryStore(path)
+    store.create("a1", {"name": "n", "type": "memory", "history": []})
+    store.compact()
+    store.append_history("a1", ["uno", "dos"])
+
+    restore = _crash_before_log_reset(monkeypatch)
+    with pytest.raises(KeyboardInterrupt):
+        store.compact()
+    restore()
+
+    assert _history(path) == ["uno", "dos"]
+    # el siguiente que escribe arranca un log de la generación del snapshot
+    other = RegistryStore(path)
+    other.append_history("a1", ["tres"])
+    assert _history(path) == ["uno", "dos", "tres"]
+    other.compact()
+    assert _history(path) == ["uno", "dos", "tres"]
+
+
+def test_legacy_log_without_generation(tmp_path, monkeypatch):
+    path = tmp_path / "registry.json"
+    path.write_text(json.dumps({"a1": {"name": "n", "type": "memory", "history": ["uno"]}}))
+    path.with_suffix(".log").write_text(
+        json.dumps({"op": "history", "id": "a1", "entries": ["dos"], "keep": None}) + "\n")
+    assert _history(path) == ["uno", "dos"]
+
+    restore = _crash_before_log_reset(monkeypatch)
+    with pytest.raises(KeyboardInterrupt):
+        RegistryStore(path).compact()
+    restore()
+    assert _history(path) == ["uno", "dos"]
+    assert "__log__" not in dict(RegistryStore(path).items())
+
+
+def test_compaction_visible_to_other_process(tmp_path):
+    path = tmp_path / "registry.json"
+    a, b = RegistryStore(path), RegistryStore(path)
+    a.create("a1", {"name": "n", "type": "memory", "history": []})
+    a.append_history("a1", ["uno"])
+    assert b.get("a1")["history"] == ["uno"]
+    a.compact()
+    a.append_history("a1", ["dos"])
+    assert b.get("a1")["history"] == ["uno", "dos"]
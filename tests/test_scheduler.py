@@ -0,0 +1,74 @@
+import time
+
+from services.scheduler import FakeClock, Scheduler
+
+
+def _wait(cond, timeout=5.0):
+    end = time.time() + timeout
+    while time.time() < end:
+        if cond():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_one_leader_per_jobs_file_and_takeover(tmp_path):
+    path = tmp_path / "jobs.json"
+    a = Scheduler(path, poll_interval=0.05)
+    b = Scheduler(path, poll_interval=0.05)
+    a.start(leader=True)
+    assert _wait(lambda: a.stats()["leader"])
+    b.start(leader=True)
+    time.sleep(0.2)
+    assert not b.stats()["leader"]
+
+    a.stop()
+    # el relevo espera LEADER_RETRY; se lo despierta como haría el timeout
+    with b._cond:
+        b._cond.notify()
+    assert _wait(lambda: b.stats()["leader"])
+    b.stop()
+
+
+def test_only_leader_runs_jobs_added_by_other_worker(tmp_path):
+    path = tmp_path / "jobs.json"
+    clock = FakeClock(0.0)
+    ran = []
+    leader = Scheduler(path, clock=clock, poll_interval=0.05)
+    follower = Scheduler(path, clock=clock, poll_interval=0.05)
+    for s in (leader, follower):
+        s.register("resumen", lambda job, now, s=s: ran.append((s, job.user)))
+    leader.start(leader=True)
+    assert _wait(lambda: leader.stats()["leader"])
+    follower.start(leader=True)
+    # otro worker de la web agrega la tarea en el archivo compartido
+    Scheduler(path, clock=clock).add_daily("whatsapp:+1", 20, 0)
+    clock.advance(86400)
+    assert _wait(lambda: ran)
+    time.sleep(0.2)
+    assert ran == [(leader, "whatsapp:+1")]
+    leader.stop()
+    follower.stop()
+
+
+def test_crash_after_send_does_not_resend(tmp_path):
+    path = tmp_path / "jobs.json"
+    clock = FakeClock(0.0)
+    sent = []
+    sched = Scheduler(path, clock=clock, save_interval=3600)
+    sched.register("resumen", lambda job, now: sent.append((job.user, now)))
+    job = sched.add_daily("whatsapp:+1", 20, 0)
+    first = job.next_run
+    clock.set(first)
+    assert sched.run_pending() == 1
+    sched.pool.join()
+    assert len(sent) == 1
+    # el proceso muere sin llegar al guardado periódico: otro lo retoma del archivo
+    restarted = Scheduler(path, clock=clock)
+    restarted.register("resumen", lambda job, now: sent.append((job.user, now)))
+    assert restarted.get(job.id).next_run == first + 86400
+    assert restarted.run_pending() == 0
+    clock.advance(86400)
+    assert restarted.run_pending() == 1
+    restarted.pool.join()
+    assert len(sent) == 2
@@ -0,0 +1,94 @@
+import sys
+import threading
+import time
+import types
+
+from services.search_engine import SearchEngine
+
+
+def test_deadline_cancels_queued_and_bounds_running():
+    engine = SearchEngine(deadline=0.2, max_workers=1)
+    release = threading.Event()
+    timeouts, late_calls = [], []
+
+    def slow(query, max_results, timeout):
+        timeouts.append(timeout)
+        release.wait(5)
+        return [{"url": "https://lento.example"}]
+
+    def queued(query, max_results, timeout):
+        late_calls.append(query)
+        return [{"url": "https://tarde.example"}]
+
+    engine.register("lento", slow)
+    engine.register("en_cola", queued)
+    start = time.monotonic()
+    assert engine.search("q") == {"text": []}
+    assert time.monotonic() - start < 1.0
+    release.set()
+    time.sleep(0.1)
+    # el que esperaba en la cola se canceló: nunca corrió
+    assert late_calls == []
+    assert 0 < timeouts[0] <= 0.2
+    stats = engine.stats()
+    assert stats["lento"]["timeouts"] == 1 and stats["en_cola"]["timeouts"] == 1
+
+
+def test_web_answer_fans_out_to_all_text_backends(monkeypatch):
+    from benchmarks.fixtures import FakeDDGS
+    from modules import web_search_module as ws
+
+    mod = types.ModuleType("duckduckgo_search")
+    mod.DDGS = FakeDDGS
+    monkeypatch.setitem(sys.modules, "duckduckgo_search", mod)
+    # la pregunta general consulta web y noticias a la vez
+    assert [name for name, b in ws.engine._backends.items() if b.kind == "text"] == ["ddg_text", "ddg_news"]
+    engine = SearchEngine(deadline=2.0, dedupe_key=ws._url_key)
+    engine.register("ddg_text", ws._ddg_text)
+    engine.register("ddg_news", ws._ddg_news)
+    monkeypatch.setattr(ws, "engine", engine)
+
+    found = engine.search("python", max_results=4)["text"]
+    assert {h["url"].split("/")[2][:6] for h in found} == {"sitio0", "sitio1", "sitio2", "sitio3", "diario"}
+    assert ws._web_answer("python", max_results=4).startswith("🔎 python")
+    assert all(s["calls"] == 2 and s["errors"] == 0 for s in engine.stats().values())
+
+
+def test_slow_ddgs_backend_is_dropped_and_answer_cached(monkeypatch):
+    from benchmarks.fixtures import FakeDDGS
+    from services.cache import TTLCache
+    from modules import web_search_module as ws
+
+    release = threading.Event()
+    timeouts, news_calls = [], []
+
+    class SlowNewsDDGS(FakeDDGS):
+        def __init__(self, timeout=None, **kwargs):
+            timeouts.append(timeout)
+
+        def news(self, query, max_results=10, **kwargs):
+            news_calls.append(query)
+            release.wait(5)
+            return super().news(query, max_results, **kwargs)
+
+    mod = types.ModuleType("duckduckgo_search")
+    mod.DDGS = SlowNewsDDGS
+    monkeypatch.setitem(sys.modules, "duckduckgo_search", mod)
+    engine = SearchEngine(deadline=0.3, dedupe_key=ws._url_key)
+    engine.register("ddg_text", ws._ddg_text)
+    engine.register("ddg_news", ws._ddg_news)
+    monkeypatch.setattr(ws, "engine", engine)
+    monkeypatch.setattr(ws, "_cache", TTLCache())
+
+    start = time.monotonic()
+    answer = ws.web_answer("python", max_results=4)
+    assert time.monotonic() - start < 1.0
+    release.set()
+    # respuesta parcial solo con la web; las noticias llegaron tarde
+    assert "diario" not in answer and "sitio" in answer
+    assert engine.stats()["ddg_news"]["timeouts"] == 1
+    # DDGS recibe el tiempo que queda hasta el deadline, en segundos enteros
+    assert timeouts == [1, 1]
+    # la segunda vez sale de la caché: no vuelve a buscar
+    assert ws.web_answer("  Python ", max_results=4) == answer
+    assert news_calls == ["python"] and ws.cache_stats()["hits"] == 1
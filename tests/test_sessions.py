@@ -0,0 +1,84 @@
+import time
+
+from agents import router
+from services import sessions
+from services.context import sender_context
+from services.sessions import SessionStore
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_evicts_least_recent():
+    store = SessionStore(max_sessions=2, clock=Clock())
+    store.get_or_create("a")
+    store.get_or_create("b")
+    store.get("a")  # 'b' pasa a ser la menos reciente
+    store.get_or_create("c")
+    assert store.get("b") is None
+    assert store.get("a") is not None and store.get("c") is not None
+    assert store.stats()["evictions"] == 1
+
+
+def test_ttl_expires_on_get_and_sweep():
+    clock = Clock()
+    store = SessionStore(ttl=60, clock=clock)
+    store.get_or_create("a").agent_id = "x"
+    store.get_or_create("b")
+    clock.now += 30
+    assert store.get("a").agent_id == "x"  # el acceso renueva last_seen
+    clock.now += 45
+    assert store.sweep() == 1  # 'b' venció, 'a' no
+    assert store.get("b") is None
+    clock.now += 61
+    assert store.get("a") is None
+    assert store.stats()["expired"] == 2
+
+
+def test_snapshot_merges_and_reloads(tmp_path):
+    clock = Clock()
+    path = tmp_path / "sessions.json"
+    w1 = SessionStore(ttl=60, path=path, snapshot_interval=3600, clock=clock)
+    w2 = SessionStore(ttl=60, path=path, snapshot_interval=3600, clock=clock)
+    w1.get_or_create("a").agent_id = "A1"
+    clock.now += 1
+    w2.get_or_create("a").agent_id = "A2"  # más reciente: gana la de w2
+    w2.get_or_create("b").add_context("user", "hola")
+    w1.snapshot()
+    w2.snapshot()
+    w1.snapshot()  # la vieja de w1 no pisa la nueva
+
+    fresh = SessionStore(ttl=60, path=path, clock=clock)
+    assert fresh.get("a").agent_id == "A2"
+    assert list(fresh.get("b").context) == [("user", "hola")]
+    clock.now += 120
+    assert len(SessionStore(ttl=60, path=path, clock=clock)) == 0
+
+
+def test_snapshot_thread_writes_periodically(tmp_path):
+    store = SessionStore(path=tmp_path / "sessions.json", snapshot_interval=0.02)
+    assert store._snapshotter is None  # se crea con el primer uso
+    store.get_or_create("a").agent_id = "A"
+    deadline = time.time() + 5
+    while store.snapshots == 0 and time.time() < deadline:
+        time.sleep(0.01)
+    assert store.snapshots > 0
+    assert SessionStore(path=tmp_path / "sessions.json").get("a").agent_id == "A"
+
+
+def test_stale_session_agent_falls_back(isolated):
+    sender = "whatsapp:+1"
+    with sender_context(sender):
+        aid = router._default_memory_agent()
+        # sesión que apunta a un agente que ya no está (p. ej. snapshot viejo)
+        sessions.default_sessions().get(sender).agent_id = "no-existe"
+        assert router._default_memory_agent() == aid
+        router.registry().remove_agents([aid])
+        new_aid = router._default_memory_agent()
+        assert new_aid != aid and router.registry().get(new_aid)["owner"] == sender
+        assert router.handle_agent_task("recordar: comprar pan") != "Agente no encontrado."
@@ -0,0 +1,42 @@
+import os
+import sqlite3
+import subprocess
+import sys
+
+from agents import router
+from services import shards
+from services.note_store import current_store, default_store
+
+
+def test_disabled_by_default():
+    env = {k: v for k, v in os.environ.items() if k != "SHARDS"}
+    out = subprocess.run([sys.executable, "-c", "from services import shards; print(shards.ENABLED)"],
+                         env=env, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "False"
+
+
+def test_existing_data_visible_until_migrated(isolated, monkeypatch):
+    from services.context import sender_context
+    monkeypatch.setattr(shards, "ENABLED", False)
+    default_store().add("nota vieja", [])
+    with sender_context("whatsapp:+1"):
+        assert [n["text"] for n in current_store().list_notes()] == ["nota vieja"]
+
+
+def test_migrate_backs_up_before_clearing(isolated):
+    notes = default_store()
+    notes.add("uno", ["a"])
+    notes.add("dos", [])
+    router.store.create("ag1", {"name": "n", "description": "d", "type": "memory",
+                                "owner": "whatsapp:+1", "history": []})
+    res = shards.migrate(shards.default_shards(), router.store, notes, notes_owner="whatsapp:+1")
+
+    assert res["agents"] == 1 and res["notes"] == 2
+    assert notes.count() == 0
+    bak = [p for p in res["backups"] if ".db.bak-" in p]
+    assert len(bak) == 1
+    rows = sqlite3.connect(bak[0]).execute("SELECT text FROM notes ORDER BY id").fetchall()
+    assert [r[0] for r in rows] == ["uno", "dos"]
+    # sin compactar todavía el registro está solo en el log: también se copia
+    assert any("registry.log.bak-" in p for p in res["backups"])
+    assert router.store.get("ag1") is None
@@ -0,0 +1,153 @@
+import json
+import os
+import threading
+
+import pytest
+
+from services import storage
+from services.storage import (GroupCommit, JsonFile, VersionConflict, read_json_versioned,
+                              try_hold_lock, write_json_if)
+
+
+def test_write_json_if_checks_version(tmp_path):
+    path = tmp_path / "data.json"
+    assert read_json_versioned(path, {}) == ({}, None)
+    v1 = write_json_if(path, {"a": 1}, None)  # crear: solo si no existe
+    with pytest.raises(VersionConflict):
+        write_json_if(path, {"a": 99}, None)
+
+    data, version = read_json_versioned(path, {})
+    assert (data, version) == ({"a": 1}, v1)
+    v2 = write_json_if(path, {"a": 2}, version)
+    assert v2 != v1
+    # el que leyó v1 ya no puede escribir encima
+    with pytest.raises(VersionConflict):
+        write_json_if(path, {"a": 3}, v1)
+    assert read_json_versioned(path, {}) == ({"a": 2}, v2)
+
+
+def test_write_json_if_same_size_rewrite_changes_version(tmp_path):
+    path = tmp_path / "data.json"
+    v1 = write_json_if(path, {"a": 1}, None)
+    v2 = write_json_if(path, {"a": 2}, v1)  # mismo tamaño: la versión cambia igual
+    with pytest.raises(VersionConflict):
+        write_json_if(path, {"a": 3}, v1)
+    assert write_json_if(path, {"a": 3}, v2)
+
+
+def test_generation_survives_aba(tmp_path, monkeypatch):
+    path = tmp_path / "data.json"
+    v1 = write_json_if(path, {"a": 1}, None)
+    # (inode, mtime, tamaño) reusados: la generación del contenido igual distingue
+    monkeypatch.setattr(storage, "file_version", lambda p: (1, 1, 1))
+    f = JsonFile(path)
+    assert f.read() == ({"a": 1}, v1)
+    v2 = write_json_if(path, {"a": 2}, v1)
+    with pytest.raises(VersionConflict):
+        write_json_if(path, {"a": 3}, v1)
+    assert f.read() == ({"a": 2}, v2) and v2 == v1 + 1
+    assert storage.read_generation(path) == v2
+
+
+def test_reads_files_without_generation(tmp_path):
+    path = tmp_path / "data.json"
+    path.write_text(json.dumps({"viejo": True}))  # formato anterior
+    assert read_json_versioned(path, {}) == ({"viejo": True}, 0)
+    f = JsonFile(path)
+    f.update(lambda d: d.update(nuevo=True))
+    assert f.read() == ({"viejo": True, "nuevo": True}, 1)
+    assert json.loads(path.read_text()) == {"__gen__": 1, "data": {"viejo": True, "nuevo": True}}
+
+
+def test_json_file_read_cache_and_external_writes(tmp_path):
+    path = tmp_path / "data.json"
+    f = JsonFile(path)
+    data, version = f.read()
+    assert (data, version) == ({}, None)
+    f.update(lambda d: d.setdefault("n", 1))
+    first, v1 = f.read()
+    assert f.read()[0] is first  # sin cambios no relee
+    write_json_if(path, {"n": 5}, v1)  # otro proceso escribe
+    assert f.read()[0] == {"n": 5}
+
+
+def test_json_file_replace_if_conflict(tmp_path):
+    f = JsonFile(tmp_path / "data.json")
+    _, v0 = f.read()
+    f.update(lambda d: d.update(x=1))
+    with pytest.raises(VersionConflict):
+        f.replace_if({"x": 2}, v0)
+    assert f.stats()["conflicts"] == 1
+    _, v1 = f.read()
+    f.replace_if({"x": 2}, v1)
+    assert f.read()[0] == {"x": 2}
+
+
+def test_json_file_concurrent_updates_are_not_lost(tmp_path):
+    path = tmp_path / "data.json"
+    files = [JsonFile(path), JsonFile(path)]  # como dos procesos sobre el mismo archivo
+
+    def bump(d):
+        d["n"] = d.get("n", 0) + 1
+        return d["n"]
+
+    def worker(i):
+        for _ in range(50):
+            files[i % 2].update(bump)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert read_json_versioned(path, {}) == ({"n": 400}, sum(f.stats()["writes"] for f in files))
+    assert sum(f.stats()["writes"] for f in files) <= 400
+
+
+def test_json_file_error_only_fails_its_caller(tmp_path):
+    f = JsonFile(tmp_path / "data.json")
+
+    def boom(d):
+        raise ValueError("no")
+
+    with pytest.raises(ValueError):
+        f.update(boom)
+    assert f.update(lambda d: d.setdefault("ok", True)) is True
+    assert f.read()[0] == {"ok": True}
+
+
+def test_group_commit_shares_fsync(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "FSYNC", True)
+    path = tmp_path / "log"
+    path.write_text("")
+    commit = GroupCommit(path, window=0.001)
+    calls = []
+    real = storage.fsync_path
+    monkeypatch.setattr(storage, "fsync_path", lambda p: (calls.append(p), real(p)))
+
+    def writer():
+        for _ in range(20):
+            with storage.file_lock(path), open(path, "a") as f:
+                f.write("x\n")
+                commit.written()
+            commit.sync()
+
+    threads = [threading.Thread(target=writer) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert commit.stats()["writes"] == 160
+    assert 1 <= commit.stats()["syncs"] == len(calls) <= 160
+    assert commit._synced == commit._written
+
+
+def test_try_hold_lock_is_exclusive(tmp_path):
+    path = tmp_path / "jobs.json"
+    fd = try_hold_lock(path)
+    assert fd is not None
+    assert try_hold_lock(path) is None
+    os.close(fd)
+    again = try_hold_lock(path)
+    assert again is not None
+    os.close(again)
@@ -0,0 +1,42 @@
+from services.summarizer import Summarizer, summarize
+
+CENTRAL = "El precio del petróleo subió hoy por la tensión en el mercado."
+SNIPPETS = [
+    "El precio del petróleo subió por la tensión en los mercados del mundo.",
+    "La tensión en el mercado del petróleo empujó el precio hacia arriba.",
+    "Un equipo local ganó el campeonato de fútbol juvenil el domingo.",
+    CENTRAL,
+]
+
+
+def test_ranks_central_sentences_first():
+    out = Summarizer(dup_threshold=1.01).summarize(SNIPPETS, max_items=4)
+    # la más parecida a todas primero; la que no tiene nada que ver, al final
+    assert out[0] == CENTRAL
+    assert out[-1].startswith("Un equipo local")
+    assert summarize(SNIPPETS, max_items=1) == [CENTRAL]
+
+
+def test_ties_keep_input_order():
+    # mismas palabras en otro orden: mismo puntaje, salen en el orden de entrada
+    sents = ["Gatos perros casas.", "Casas gatos perros.", "Perros casas gatos."]
+    assert Summarizer(min_len=10, dup_threshold=1.01).summarize(sents, max_items=3) == sents
+
+
+def test_drops_near_duplicates():
+    dup = [CENTRAL, CENTRAL.replace("hoy", "ayer"), "Un equipo local ganó el campeonato de fútbol juvenil el domingo."]
+    out = summarize(dup, max_items=3)
+    assert len(out) == 2
+    assert sum(s.startswith("El precio del petróleo") for s in out) == 1
+    # sin umbral de duplicados se quedan las tres
+    assert len(Summarizer(dup_threshold=1.01).summarize(dup, max_items=3)) == 3
+
+
+def test_degenerate_input():
+    assert summarize([]) == []
+    assert summarize(["", "   "]) == []
+    assert summarize(SNIPPETS, max_items=0) == []
+    assert summarize([CENTRAL]) == [CENTRAL]
+    # solo palabras cortas (sin términos): se devuelven en orden, sin puntaje
+    short = ["Yo sé lo que él y tú no ve ni oí de mí, es así.", "Tú y yo lo sé, él no ve ni oí a mí, es así."]
+    assert Summarizer(min_len=10).summarize(short, max_items=5) == short
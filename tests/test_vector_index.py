@@ -0,0 +1,59 @@
+import numpy as np
+
+from services import vector_index
+from services.note_store import NoteStore
+from services.vector_index import HashingEmbedder, VectorIndex
+
+
+def _unit(rows):
+    x = np.asarray(rows, dtype=np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def test_build_and_query_exact(tmp_path):
+    rng = np.random.default_rng(0)
+    vecs = _unit(rng.standard_normal((500, 8)))
+    idx = VectorIndex(tmp_path / "v", HashingEmbedder(dim=8))
+    idx.add(list(range(1, 251)), vecs[:250])
+    idx.add(list(range(251, 501)), vecs[250:])
+    assert len(idx) == 500 and idx.last_id() == 500
+
+    hits = idx.search(vecs[41], k=5)
+    assert hits[0][0] == 42 and abs(hits[0][1] - 1.0) < 1e-5
+    expected = np.argsort(-(vecs @ vecs[41]))[:5] + 1
+    assert [i for i, _ in hits] == expected.tolist()
+    assert idx.search(vecs[0], k=0) == []
+
+
+def test_ann_finds_the_same_vector(tmp_path):
+    rng = np.random.default_rng(1)
+    vecs = _unit(rng.standard_normal((2000, 16)))
+    idx = VectorIndex(tmp_path / "v", HashingEmbedder(dim=16), ann_threshold=100)
+    idx.add(list(range(1, 2001)), vecs)
+    for row in (0, 777, 1999):
+        assert idx.search(vecs[row], k=3)[0][0] == row + 1
+
+
+def test_recovers_from_torn_write_and_embedder_change(tmp_path):
+    idx = VectorIndex(tmp_path / "v", HashingEmbedder(dim=8))
+    idx.add([1, 2], _unit(np.eye(8)[:2]))
+    # una escritura cortada dejó medio vector colgando al final
+    with open(idx.vec_path, "ab") as f:
+        f.write(b"\0" * 12)
+    assert len(idx) == 2
+    idx.add([3], _unit(np.eye(8)[2:3]))
+    assert len(idx) == 3 and idx.search(np.eye(8)[2], k=1)[0][0] == 3
+    # otra dimensión: se reconstruye desde cero
+    assert len(VectorIndex(tmp_path / "v", HashingEmbedder(dim=16))) == 0
+
+
+def test_semantic_search_syncs_new_notes(tmp_path, monkeypatch):
+    monkeypatch.setattr(vector_index, "_indexes", {})
+    store = NoteStore(tmp_path / "notes.db")
+    store.add("cumpleaños de mamá el sábado", ["familia"])
+    store.add("pagar la factura de la luz")
+    found = vector_index.semantic_search(store, "cumple mama")
+    assert found and found[0]["text"] == "cumpleaños de mamá el sábado"
+    store.add("renovar el pasaporte")
+    assert vector_index.semantic_search(store, "pasaporte")[0]["text"] == "renovar el pasaporte"
+    assert vector_index.index_for(store).last_id() == 3